@@ -5,6 +5,7 @@ from dataclasses import dataclass
 from typing import Dict, List, Tuple
 
 from accounts.models import UserProfile
+from agent.cache import invalidate_profile_context
 
 RATING_TO_REWARD = {
     0: -1.0,  # lapse
@@ -63,6 +64,7 @@ def update_profile_from_review(
     profile.weights = weights
     profile.reviews += 1
     profile.save(update_fields=["weights", "reviews", "updated_at"])
+    invalidate_profile_context(profile.user_id)
     logger.info(
         "Updated profile from review:",
         {
@@ -98,6 +100,7 @@ def apply_weight_patch(
 
     profile.weights = weights
     profile.save(update_fields=["weights", "updated_at"])
+    invalidate_profile_context(profile.user_id)
     logger.info(
         "Applied weight patch: %s to profile %s new weights: %s",
         weights_patch,
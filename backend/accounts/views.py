@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView
 
+from agent.cache import invalidate_profile_context
 from .models import UserProfile
 from .serializers import UserProfileSerializer, UserProfileUpdateSerializer
 
@@ -276,5 +277,6 @@ def preferences(request):
     profile.preferences = new_prefs
     profile.weights = new_weights
     profile.save(update_fields=["preferences", "weights", "updated_at"])
+    invalidate_profile_context(request.user.id)
 
     return Response(UserProfileSerializer(profile).data, status=status.HTTP_200_OK)
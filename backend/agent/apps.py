@@ -10,6 +10,8 @@ class AgentConfig(AppConfig):
     name = "agent"
 
     def ready(self):
+            from . import signals
+
             # Do not block tests/CI/management commands
             if os.getenv("CI") == "true":
                 return
@@ -0,0 +1,199 @@
+"""
+Native async endpoints for backside generation.
+
+DRF's APIView is synchronous, and under ASGI Django serializes sync views onto a
+single thread. These views run the async graph (`async_app`) directly on the
+event loop, so one ASGI worker keeps many generations in flight while they wait
+on Gemini, Supabase and Tavily. Serve them with an ASGI server, e.g.:
+
+    uvicorn backend_project.asgi:application --workers 2
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, JsonResponse
+from rest_framework import exceptions, status
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from cards.models import Deck
+from common.breakers import CircuitOpenError
+
+from .cache import get_cached_response, output_passed, response_cache, store_cached_response
+from .deadline import request_deadline
+from .generation import backside_cache_key, build_initial_state
+from .llm_graph import async_app
+from .serializers import FlashcardRequestSerializer
+from .singleflight import acoalesce_generation, generation_outcome, singleflight_enabled
+from .streaming import astream_generation_events, sse_event, sse_response
+
+logger = logging.getLogger(__name__)
+
+
+def _async_api_view(view):
+    """Async views authenticate with JWT headers, so session CSRF does not apply."""
+    view.csrf_exempt = True
+    return view
+
+
+async def _authenticate(request: HttpRequest):
+    """Resolve the user from the Bearer token; returns (user, error_response)."""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except exceptions.AuthenticationFailed as exc:
+        return None, JsonResponse(
+            {"detail": str(exc.detail)}, status=status.HTTP_401_UNAUTHORIZED
+        )
+    if result is None:
+        return None, JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    return result[0], None
+
+
+async def _prepare_generation(
+    request: HttpRequest,
+) -> Tuple[Optional[Dict[str, Any]], Optional[JsonResponse]]:
+    """
+    Shared request handling for the async backside views: method, auth, payload
+    validation and deck ownership. Returns (context, error_response).
+    """
+    if request.method != "POST":
+        return None, JsonResponse(
+            {"detail": f'Method "{request.method}" not allowed.'},
+            status=status.HTTP_405_METHOD_NOT_ALLOWED,
+        )
+
+    user, error_response = await _authenticate(request)
+    if error_response is not None:
+        return None, error_response
+
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return None, JsonResponse(
+            {"error": "Request body must be JSON."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer = FlashcardRequestSerializer(data=payload)
+    if not serializer.is_valid():
+        return None, JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+
+    deck = await Deck.objects.filter(id=data["deck_id"], user=user).afirst()
+    if not deck:
+        return None, JsonResponse(
+            {"error": "Deck not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    cache_key = None
+    if response_cache.enabled or singleflight_enabled():
+        cache_key = await sync_to_async(backside_cache_key)(
+            user_id=user.id, deck_id=deck.id, front=data["front"]
+        )
+
+    deadline = request_deadline(request, data)
+    return {
+        "cache_key": cache_key,
+        "deadline": deadline,
+        "initial_state": build_initial_state(
+            front=data["front"],
+            deck_id=deck.id,
+            user_id=user.id,
+            deadline=deadline,
+        ),
+    }, None
+
+
+@_async_api_view
+async def flashcard_backside_async(request: HttpRequest):
+    """Async twin of FlashcardBacksideView (same payload, responses and cache)."""
+    context, error_response = await _prepare_generation(request)
+    if error_response is not None:
+        return error_response
+
+    cache_key = context["cache_key"]
+    if response_cache.enabled:
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            response = JsonResponse(cached, status=status.HTTP_200_OK)
+            response["X-Agent-Cache"] = "hit"
+            return response
+
+    async def run_graph():
+        final_state = await async_app.ainvoke(context["initial_state"])
+        return generation_outcome(final_state, final_state.get("final_json", {}))
+
+    try:
+        outcome, shared = await acoalesce_generation(
+            cache_key, context["deadline"], run_graph
+        )
+    except CircuitOpenError as e:
+        response = JsonResponse(
+            {"error": "Service Unavailable", "details": str(e)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+        response["Retry-After"] = str(max(1, round(e.retry_in)))
+        return response
+    except Exception as e:
+        return JsonResponse(
+            {"error": "Agent Failed", "details": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    if not outcome["is_safe"]:
+        return JsonResponse(
+            {"error": "Content Blocked", "reason": outcome["safety_reason"]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    final_json = outcome["final_json"]
+    if response_cache.enabled and not shared and output_passed(outcome):
+        store_cached_response(cache_key, final_json, deadline=context["deadline"])
+
+    response = JsonResponse(final_json, status=status.HTTP_200_OK)
+    if response_cache.enabled:
+        response["X-Agent-Cache"] = "miss"
+    if shared:
+        response["X-Agent-Coalesced"] = "true"
+    return response
+
+
+@_async_api_view
+async def flashcard_backside_async_stream(request: HttpRequest):
+    """Async twin of FlashcardBacksideStreamView (same SSE frames)."""
+    context, error_response = await _prepare_generation(request)
+    if error_response is not None:
+        return error_response
+
+    cache_key = context["cache_key"]
+    if response_cache.enabled:
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            response = sse_response(_single_frame(sse_event("done", cached)))
+            response["X-Agent-Cache"] = "hit"
+            return response
+
+    def on_complete(final_state):
+        if response_cache.enabled and output_passed(final_state):
+            store_cached_response(
+                cache_key, final_state["final_json"], deadline=context["deadline"]
+            )
+
+    response = sse_response(
+        astream_generation_events(
+            async_app, context["initial_state"], on_complete=on_complete
+        )
+    )
+    if response_cache.enabled:
+        response["X-Agent-Cache"] = "miss"
+    return response
+
+
+async def _single_frame(frame: str):
+    yield frame
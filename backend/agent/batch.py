@@ -0,0 +1,165 @@
+"""
+Batch backside generation.
+
+The deck lookup, profile load and style rendering (context_builder_node) run
+once per batch; every front then goes through the rest of the graph on a
+bounded thread pool. Items succeed or fail independently.
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import llm_graph
+from .cache import (
+    get_cached_response,
+    output_passed,
+    response_cache,
+    response_cache_key,
+    store_cached_response,
+)
+from .generation import build_initial_state
+from .llm_graph import PROMPT_VERSION, context_builder_node
+from .state import AgentState
+from .streaming import sse_event
+
+logger = logging.getLogger(__name__)
+
+
+def build_batch_context(*, deck_id: int, user_id: int) -> Dict[str, Any]:
+    """context_builder_node output shared by every item of a batch."""
+    return context_builder_node(
+        build_initial_state(front="", deck_id=deck_id, user_id=user_id)
+    )
+
+
+def _item_state(front: str, context: Dict[str, Any], *, deck_id: int, user_id: int) -> AgentState:
+    state = build_initial_state(front=front, deck_id=deck_id, user_id=user_id)
+    # Items must not share mutable context (generation_meta is updated per run)
+    state.update(copy.deepcopy(context))
+    return state
+
+
+def generate_batch_item(
+    index: int,
+    front: str,
+    *,
+    context: Dict[str, Any],
+    deck_id: int,
+    user_id: int,
+) -> Dict[str, Any]:
+    """Run one front through the graph; failures are reported, never raised."""
+    item = {"index": index, "front": front}
+
+    cache_key = None
+    if response_cache.enabled:
+        cache_key = response_cache_key(
+            user_id=user_id,
+            deck_id=deck_id,
+            front=front,
+            style_instructions=context["style_instructions"],
+            prompt_version=PROMPT_VERSION,
+        )
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            return {**item, "status": "ok", "cached": True, "result": cached}
+
+    try:
+        final_state = llm_graph.batch_app.invoke(
+            _item_state(front, context, deck_id=deck_id, user_id=user_id)
+        )
+    except Exception as e:
+        logger.warning("Batch item %s failed: %s", index, e)
+        return {**item, "status": "error", "error": "Agent Failed", "details": str(e)}
+
+    if not final_state["is_safe"]:
+        return {
+            **item,
+            "status": "blocked",
+            "error": "Content Blocked",
+            "reason": final_state["safety_reason"],
+        }
+
+    final_json = final_state["final_json"]
+    if cache_key is not None and output_passed(final_state):
+        store_cached_response(cache_key, final_json)
+    return {**item, "status": "ok", "cached": False, "result": final_json}
+
+
+def _run_pooled_item(*args, **kwargs) -> Dict[str, Any]:
+    try:
+        return generate_batch_item(*args, **kwargs)
+    finally:
+        # Pool threads live outside the request cycle; drop the connection each
+        # item opened (profile/deck reads, checkpoints) instead of leaking it
+        close_old_connections()
+
+
+def iter_batch_results(
+    fronts: List[str],
+    *,
+    deck_id: int,
+    user_id: int,
+    max_workers: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield per-item results in completion order."""
+    context = build_batch_context(deck_id=deck_id, user_id=user_id)
+    workers = max_workers or getattr(settings, "AGENT_BATCH_CONCURRENCY", 4)
+    pool = ThreadPoolExecutor(
+        max(1, min(workers, len(fronts))), thread_name_prefix="agent-batch"
+    )
+    try:
+        futures = [
+            pool.submit(
+                _run_pooled_item,
+                index,
+                front,
+                context=context,
+                deck_id=deck_id,
+                user_id=user_id,
+            )
+            for index, front in enumerate(fronts)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # A disconnected stream stops pending items instead of running them
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def summarize_batch(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    return {
+        "total": len(results),
+        "succeeded": sum(1 for r in results if r["status"] == "ok"),
+        "blocked": sum(1 for r in results if r["status"] == "blocked"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+    }
+
+
+def run_batch(fronts: List[str], *, deck_id: int, user_id: int) -> Dict[str, Any]:
+    """Generate every front and return results in request order."""
+    results = sorted(
+        iter_batch_results(fronts, deck_id=deck_id, user_id=user_id),
+        key=lambda r: r["index"],
+    )
+    return {"deck_id": deck_id, "results": results, "summary": summarize_batch(results)}
+
+
+def stream_batch_events(fronts: List[str], *, deck_id: int, user_id: int) -> Iterator[str]:
+    """SSE frames: one `item` per finished front, then `done` with the summary."""
+    results = []
+    try:
+        for result in iter_batch_results(fronts, deck_id=deck_id, user_id=user_id):
+            results.append(result)
+            yield sse_event("item", result)
+    except Exception as exc:
+        logger.warning("Streamed batch failed: %s", exc)
+        yield sse_event("error", {"error": "Batch Failed", "details": str(exc)})
+        return
+    yield sse_event("done", {"deck_id": deck_id, "summary": summarize_batch(results)})
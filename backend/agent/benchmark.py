@@ -9,6 +9,7 @@ Usage:
     python -m agent.benchmark
 """
 
+import asyncio
 import os
 import sys
 import time
@@ -115,6 +116,25 @@ def benchmark_prompting():
     return benchmark(run, "Prompt Building (1000x)", iterations=5)
 
 
+def benchmark_local_guardrail():
+    """Benchmark the local guardrail tier (no memo)."""
+    from agent.safety import classify_locally
+
+    fronts = [
+        "What is mitosis?",
+        "Define: photosynthesis",
+        "Why did the atomic bomb end the war?",
+        "Explain the difference between TCP and UDP",
+    ]
+
+    def run():
+        for _ in range(250):
+            for front in fronts:
+                classify_locally(front)
+
+    return benchmark(run, "Local Guardrail (1000x)", iterations=5)
+
+
 def benchmark_llm_simple():
     """Benchmark simple LLM call."""
     from agent.llm_graph import llm
@@ -141,6 +161,39 @@ def benchmark_llm_with_tools():
     return benchmark(run, "LLM with Tools", iterations=3)
 
 
+def benchmark_llm_routes():
+    """One representative call per AGENT_LLM_ROUTES route (model, timeout, fallback)."""
+    from agent import llm_graph
+    from agent.llm_routing import route_config
+
+    calls = {
+        "agent": (llm_graph.llm_with_tools, "Define: variable. Be brief."),
+        "guardrail": (
+            llm_graph.guardrail_llm,
+            'Reply with JSON {"allowed": true, "reason": "..."} for: What is mitosis?',
+        ),
+        "critic": (
+            llm_graph.critic_llm,
+            "Grade this flashcard back. Reply PERFECT or give feedback.\n"
+            "Front: What is DNA?\nBack: The molecule that carries genetic information.",
+        ),
+        "rapid": (llm_graph.rapid_llm, "Write a flashcard back for: What is osmosis?"),
+        "preference_tuning": (
+            llm_graph.preference_llm,
+            'Reply with JSON {"weights_patch": {}, "reason": "..."} for feedback: shorter.',
+        ),
+    }
+
+    results = []
+    for route, (model, prompt) in calls.items():
+        config = route_config(route)
+        label = f"LLM Route {route} ({config['model']})"
+        results.append(
+            benchmark(lambda m=model, p=prompt: m.invoke(p), label, iterations=3)
+        )
+    return results
+
+
 def benchmark_guardrail():
     """Benchmark guardrail check."""
     from agent.llm_graph import guardrail_node
@@ -155,6 +208,7 @@ def benchmark_guardrail():
 
 def benchmark_full_pipeline():
     """Benchmark full agent pipeline."""
+    from agent.checkpoints import generation_config, new_generation_id
     from agent.llm_graph import app
     from agent.state import AgentState
     from django.contrib.auth.models import User
@@ -183,11 +237,288 @@ def benchmark_full_pipeline():
             "generation_meta": {},
             "final_json": {},
         }
-        app.invoke(initial_state)
+        app.invoke(initial_state, generation_config(new_generation_id()))
 
     return benchmark(run, "Full Pipeline", iterations=3)
 
 
+def benchmark_speculative_pipeline():
+    """Benchmark full agent pipeline with the guardrail running speculatively."""
+    from agent.llm_graph import build_workflow
+    from django.contrib.auth.models import User
+    from cards.models import Deck
+
+    speculative_app = build_workflow(speculative_guardrail=True).compile()
+    user, _ = User.objects.get_or_create(
+        username="benchmark_user", defaults={"password": "test123"}
+    )
+    deck, _ = Deck.objects.get_or_create(user=user, name="Benchmark Deck")
+
+    def run():
+        speculative_app.invoke(
+            {
+                "messages": [HumanMessage(content="What is DNA?")],
+                "front": "What is DNA?",
+                "deck_id": deck.id,
+                "user_id": user.id,
+                "critique_count": 0,
+                "is_safe": True,
+                "safety_reason": "",
+                "draft_answer": "",
+                "user_preferences": {},
+                "user_weights": {},
+                "deck_context": "",
+                "style_instructions": "",
+                "features_used": [],
+                "generation_meta": {},
+                "final_json": {},
+            }
+        )
+
+    return benchmark(run, "Full Pipeline (speculative guardrail)", iterations=3)
+
+
+def _simulated_llm(latency: float):
+    """Stand-in chat model that waits `latency` seconds per call (sync or async)."""
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+
+    def reply(messages):
+        text = str(messages)
+        if "content safety filter" in text:
+            return AIMessage(content='{"allowed": true, "reason": "ok"}')
+        if "grading a flashcard" in text:
+            return AIMessage(content="PERFECT")
+        return AIMessage(content="FINAL ANSWER: Simulated backside.")
+
+    def call(messages):
+        time.sleep(latency)
+        return reply(messages)
+
+    async def acall(messages):
+        await asyncio.sleep(latency)
+        return reply(messages)
+
+    return RunnableLambda(call, afunc=acall)
+
+
+def benchmark_concurrency(concurrency: int = 20, latency: float = 0.2):
+    """
+    Generations per worker: a single-threaded sync worker (one request at a
+    time, like a gunicorn sync worker) against one event loop running the async
+    graph. The LLM is simulated so only the serving model is measured.
+    """
+    from unittest.mock import patch
+    from agent.generation import build_initial_state
+    from agent.llm_graph import build_workflow
+    from django.contrib.auth.models import User
+    from cards.models import Deck
+
+    user, _ = User.objects.get_or_create(
+        username="benchmark_user", defaults={"password": "test123"}
+    )
+    deck, _ = Deck.objects.get_or_create(user=user, name="Benchmark Deck")
+    fake_llm = _simulated_llm(latency)
+
+    def state():
+        return build_initial_state(front="What is DNA?", deck_id=deck.id, user_id=user.id)
+
+    with patch("agent.llm_graph.llm_with_tools", fake_llm), patch(
+        "agent.llm_graph.guardrail_llm", fake_llm
+    ), patch("agent.llm_graph.critic_llm", fake_llm):
+        sync_app = build_workflow().compile()
+        async_app = build_workflow(asynchronous=True).compile()
+
+        def run_sync():
+            for _ in range(concurrency):
+                sync_app.invoke(state())
+
+        async def gather_async():
+            await asyncio.gather(*(async_app.ainvoke(state()) for _ in range(concurrency)))
+
+        def run_async():
+            asyncio.run(gather_async())
+
+        results = [
+            benchmark(run_sync, f"Sync worker, {concurrency} generations", iterations=2),
+            benchmark(run_async, f"Async worker, {concurrency} generations", iterations=2),
+        ]
+
+    for result in results:
+        if result.times:
+            print(f"  {result.name}: {concurrency / result.mean:.1f} generations/s")
+    return results
+
+
+def benchmark_client_reuse(calls: int = 50):
+    """
+    Per-call overhead of search_deck_documents' client setup: building a
+    Supabase client and embedding model on every call (old behaviour) against
+    the process-wide pooled instances. The RPC goes to a local HTTP server so
+    connection setup is measured without network noise.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from django.test import override_settings
+    from uploads.services import document_ingestion as ingestion
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"[]")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    payload = {"query_embedding": [0.0] * 8, "match_count": 4, "filter": {"deck_id": 1}}
+
+    def fresh():
+        for _ in range(calls):
+            ingestion._create_embedding_model("benchmark-key", True)
+            client = ingestion._create_supabase_client(url, "key")
+            client.rpc("match_documents", payload).execute()
+
+    def shared():
+        for _ in range(calls):
+            ingestion._build_embedding_model()
+            ingestion._build_supabase_client().rpc("match_documents", payload).execute()
+
+    try:
+        with override_settings(SUPABASE_URL=url, SUPABASE_KEY="key", GEMINI_API_KEY="benchmark-key"):
+            results = [
+                benchmark(fresh, f"Fresh clients, {calls} searches", iterations=3),
+                benchmark(shared, f"Shared clients, {calls} searches", iterations=3),
+            ]
+    finally:
+        server.shutdown()
+        ingestion.supabase_clients.clear()
+        ingestion.embedding_models.clear()
+
+    for result in results:
+        if result.times:
+            print(f"  {result.name}: {result.mean / calls * 1000:.2f} ms/call")
+    return results
+
+
+def benchmark_local_vector_store(sizes=(1_000, 10_000, 50_000), dims: int = 3072, k: int = 4):
+    """Cosine top-k latency of the local memory-mapped vector store by deck size."""
+    import tempfile
+    import numpy as np
+    from uploads.services.vector_store import LocalVectorStore
+
+    rng = np.random.default_rng(0)
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalVectorStore(Path(root))
+        for deck_id, size in enumerate(sizes, start=1):
+            # Write in slices to bound memory (50k x 3072 float32 is ~600 MB)
+            for start in range(0, size, 5_000):
+                count = min(5_000, size - start)
+                vectors = rng.standard_normal((count, dims), dtype=np.float32)
+                store.add(
+                    deck_id,
+                    [
+                        {"id": str(start + i), "content": "", "metadata": {}, "embedding": vector}
+                        for i, vector in enumerate(vectors)
+                    ],
+                )
+            query = rng.standard_normal(dims, dtype=np.float32)
+            store.search(deck_id, query, k=k)  # map the file and load records
+            results.append(
+                benchmark(
+                    lambda d=deck_id: store.search(d, query, k=k),
+                    f"Local vector search, {size} chunks x {dims} dims",
+                    iterations=10,
+                )
+            )
+    return results
+
+
+def benchmark_lexical_index(sizes=(100, 1_000, 10_000)):
+    """BM25 index build (one upload) and query time by deck chunk count."""
+    import random
+    from uploads.services.lexical_index import BM25Index
+
+    rng = random.Random(0)
+    vocabulary = [f"term{i}" for i in range(5_000)] + ["relu", "backpropagation", "mitosis"]
+    results = []
+    for size in sizes:
+        records = [
+            {"id": str(i), "content": " ".join(rng.choices(vocabulary, k=150)), "metadata": {}}
+            for i in range(size)
+        ]
+
+        def build():
+            index = BM25Index()
+            index.add(records)
+            return index
+
+        index = build()
+        results.append(benchmark(build, f"BM25 build, {size} chunks", iterations=3))
+        results.append(
+            benchmark(
+                lambda i=index: i.search("what is relu backprop", k=4),
+                f"BM25 query, {size} chunks",
+                iterations=10,
+            )
+        )
+    return results
+
+
+def benchmark_circuit_breaker(calls: int = 30, outage_latency: float = 0.5):
+    """
+    Per-call latency of search_deck_documents during a Supabase outage where
+    each RPC hangs for `outage_latency` and then fails, with the breakers
+    disabled against enabled. Open breakers fail fast after MIN_CALLS calls.
+    """
+    from unittest.mock import MagicMock, patch
+    from django.test import override_settings
+    from common.breakers import reset_breakers
+    from agent.tools import search_deck_documents
+
+    def hung_rpc(*args):
+        time.sleep(outage_latency)
+        raise ConnectionError("upstream timeout")
+
+    client = MagicMock()
+    client.rpc.return_value.execute.side_effect = hung_rpc
+    embeddings = MagicMock()
+    embeddings.embed_query.return_value = [0.1, 0.2]
+
+    results = []
+    for enabled in (False, True):
+        reset_breakers()
+        times = []
+        with override_settings(AGENT_BREAKERS_ENABLED=enabled, AGENT_HYBRID_SEARCH=False), patch(
+            "uploads.services.document_ingestion._build_supabase_client", return_value=client
+        ), patch("agent.tools._build_embedding_model", return_value=embeddings):
+            for _ in range(calls):
+                start = time.perf_counter()
+                search_deck_documents.invoke({"query": "mitosis", "deck_id": 1})
+                times.append(time.perf_counter() - start)
+        label = "enabled" if enabled else "disabled"
+        result = BenchmarkResult(name=f"Deck search during outage, breakers {label}", times=times)
+        ordered = sorted(times)
+        print(
+            f"  {result.name}: p50 {result.median * 1000:.1f} ms, "
+            f"p99 {ordered[int(len(ordered) * 0.99) - 1] * 1000:.1f} ms, "
+            f"total {sum(times):.2f}s"
+        )
+        results.append(result)
+    reset_breakers()
+    return results
+
+
 def run_benchmarks():
     """Run all benchmarks."""
     print("=" * 60)
@@ -199,6 +530,17 @@ def run_benchmarks():
     # CPU-bound benchmarks
     print("\n[CPU-Bound Benchmarks]")
     results.append(benchmark_prompting())
+    results.append(benchmark_local_guardrail())
+
+    # Serving model (simulated LLM latency, no API key needed)
+    print("\n[Concurrency Benchmarks]")
+    results.extend(benchmark_concurrency())
+    results.extend(benchmark_client_reuse())
+    results.extend(benchmark_circuit_breaker())
+
+    print("\n[Vector Store Benchmarks]")
+    results.extend(benchmark_local_vector_store())
+    results.extend(benchmark_lexical_index())
 
     # Check if API keys are configured
     if not settings.GEMINI_API_KEY:
@@ -209,8 +551,10 @@ def run_benchmarks():
     print("\n[API-Bound Benchmarks]")
     results.append(benchmark_llm_simple())
     results.append(benchmark_llm_with_tools())
+    results.extend(benchmark_llm_routes())
     results.append(benchmark_guardrail())
     results.append(benchmark_full_pipeline())
+    results.append(benchmark_speculative_pipeline())
 
     # Print summary
     print("\n" + "=" * 60)
@@ -0,0 +1,198 @@
+"""In-process caches for the agent pipeline."""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+from common.cache import TTLCache
+
+from .deadline import may_reuse
+
+logger = logging.getLogger(__name__)
+
+
+# --- Per-deck version shared across processes ---
+# Response and profile-context entries record it; bumping it (deck renamed,
+# documents changed) makes every process treat older entries as misses. The
+# in-process purges next to each bump only free the memory early.
+
+
+def _deck_version_key(deck_id: int) -> str:
+    return f"agent:deck_context_version:{int(deck_id)}"
+
+
+def deck_context_version(deck_id: int) -> int:
+    return shared_cache.get(_deck_version_key(deck_id), 0)
+
+
+def bump_deck_version(deck_id: int) -> None:
+    key = _deck_version_key(deck_id)
+    if not shared_cache.add(key, 1, timeout=None):
+        try:
+            shared_cache.incr(key)
+        except ValueError:
+            # Expired or evicted between add and incr
+            shared_cache.set(key, 1, timeout=None)
+
+
+# --- Response cache for generated backsides ---
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.:;]+$")
+
+
+def normalize_front(text: str) -> str:
+    """
+    Canonical form of a card front for cache keys: unicode-normalized,
+    case-folded, whitespace collapsed, trailing punctuation dropped.
+    "What is  Mitosis?" and "what is mitosis" map to the same key.
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = " ".join(text.split())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def response_cache_key(
+    *,
+    user_id: int,
+    deck_id: int,
+    front: str,
+    style_instructions: str,
+    prompt_version: str,
+) -> Tuple[Any, ...]:
+    # Keys are tuples so deck invalidation can match on position 1 without parsing.
+    return (
+        int(user_id or 0),
+        int(deck_id),
+        _digest(normalize_front(front)),
+        _digest(style_instructions or ""),
+        prompt_version,
+        deck_context_version(deck_id),
+    )
+
+
+response_cache = TTLCache(
+    "response",
+    max_entries=getattr(settings, "AGENT_RESPONSE_CACHE_MAX_ENTRIES", 512),
+    ttl_seconds=getattr(settings, "AGENT_RESPONSE_CACHE_TTL_SECONDS", 3600),
+)
+
+
+def get_cached_response(key) -> Optional[Dict[str, Any]]:
+    """Return a private copy of a cached final_json, or None on a miss."""
+    cached = response_cache.get(key)
+    if cached is None:
+        logger.debug("Response cache miss (%s)", response_cache.stats())
+        return None
+    logger.debug("Response cache hit (%s)", response_cache.stats())
+    return copy.deepcopy(cached)
+
+
+def output_passed(state: Dict[str, Any]) -> bool:
+    """Whether a final graph state (or generation outcome) passed the output checks.
+
+    Every view stores responses only when this holds, so the JSON and stream
+    endpoints cache exactly the same answers.
+    """
+    return bool(state.get("output_passed", False))
+
+
+def store_cached_response(
+    key, final_json: Dict[str, Any], *, deadline: Optional[float] = None
+) -> bool:
+    """Cache a final_json unless it may be degraded by a deadline; True if stored."""
+    if not may_reuse(final_json, deadline):
+        return False
+    response_cache.set(key, copy.deepcopy(final_json))
+    return True
+
+
+def invalidate_deck_responses(deck_id: int) -> int:
+    """Forget every cached backside for a deck in every process (e.g. after new documents are ingested)."""
+    bump_deck_version(deck_id)
+    removed = response_cache.invalidate(lambda key: key[1] == int(deck_id))
+    if removed:
+        logger.info("Invalidated %s cached responses for deck %s", removed, deck_id)
+    return removed
+
+
+# --- Profile/style context per (user, deck) ---
+
+# Entries are per process, so each one records what it was built from and is
+# checked on read: the profile's updated_at (passed in by the caller, one cheap
+# query) and a per-deck version kept in the shared Django cache, which deck
+# renames and document ingestion bump in whichever process handles them.
+profile_context_cache = TTLCache(
+    "profile_context",
+    max_entries=getattr(settings, "AGENT_PROFILE_CACHE_MAX_ENTRIES", 2048),
+    ttl_seconds=getattr(settings, "AGENT_PROFILE_CACHE_TTL_SECONDS", 900),
+)
+
+
+def get_profile_context(user_id: int, deck_id: int, *, version=None) -> Optional[Dict[str, Any]]:
+    """
+    Return a private copy of a cached context_builder result, or None on a
+    miss. `version` is the profile's current updated_at; entries built from
+    another version, or before the deck last changed, are misses.
+    """
+    key = (int(user_id or 0), int(deck_id))
+    entry = profile_context_cache.get(key)
+    if entry is None:
+        return None
+    built_version, deck_version, context = entry
+    if built_version != version or deck_version != deck_context_version(deck_id):
+        profile_context_cache.delete(key)
+        return None
+    return copy.deepcopy(context)
+
+
+def store_profile_context(
+    user_id: int, deck_id: int, context: Dict[str, Any], *, version=None, deck_version: int = 0
+) -> None:
+    """
+    Cache a context built from the profile at `version` (its updated_at) and the
+    deck at `deck_version`, read before the build so a concurrent change makes
+    the entry a miss rather than pinning stale data.
+    """
+    profile_context_cache.set(
+        (int(user_id or 0), int(deck_id)), (version, deck_version, copy.deepcopy(context))
+    )
+
+
+def invalidate_profile_context(user_id: int) -> int:
+    """Forget a user's cached contexts in this process (other processes see the new updated_at)."""
+    removed = profile_context_cache.invalidate(lambda key: key[0] == int(user_id))
+    if removed:
+        logger.info("Invalidated %s cached profile contexts for user %s", removed, user_id)
+    return removed
+
+
+def invalidate_deck_profile_context(deck_id: int) -> int:
+    """Forget cached contexts for a deck in every process (e.g. after it was renamed)."""
+    bump_deck_version(deck_id)
+    return profile_context_cache.invalidate(lambda key: key[1] == int(deck_id))
+
+
+# --- Web search results ---
+
+web_search_cache = TTLCache(
+    "web_search",
+    max_entries=getattr(settings, "AGENT_WEB_SEARCH_CACHE_MAX_ENTRIES", 512),
+    ttl_seconds=getattr(settings, "AGENT_WEB_SEARCH_CACHE_TTL_SECONDS", 21600),
+)
+
+
+def web_search_key(query: str) -> str:
+    """Queries differing only in case, spacing or trailing punctuation share an entry."""
+    return _digest(normalize_front(query))
@@ -0,0 +1,269 @@
+"""
+LangGraph checkpointer backed by the Django database.
+
+Each generation runs on its own thread whose id is returned to the client as
+`generation_id`. Only the final state is written (durability "exit"), so a
+run costs one insert. A revision that passes the generation_id back resumes
+from that state: the deck context, style rules, prefetched material, tool
+results and guardrail verdict are reused instead of being rebuilt.
+
+Retention: checkpoints older than AGENT_CHECKPOINT_TTL_SECONDS are treated as
+missing on read and deleted by `manage.py prune_agent_checkpoints`; each
+thread also keeps at most AGENT_CHECKPOINT_MAX_PER_THREAD checkpoints.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from .models import GenerationCheckpoint, GenerationCheckpointWrite
+
+logger = logging.getLogger(__name__)
+
+# Only the final state is persisted; intermediate supersteps are not resumable.
+CHECKPOINT_DURABILITY = "exit"
+
+
+def _ttl() -> timedelta:
+    return timedelta(seconds=getattr(settings, "AGENT_CHECKPOINT_TTL_SECONDS", 7 * 86400))
+
+
+def _thread_config(thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]):
+    if not checkpoint_id:
+        return None
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+        }
+    }
+
+
+class DjangoCheckpointSaver(BaseCheckpointSaver[str]):
+    """Stores checkpoints in GenerationCheckpoint / GenerationCheckpointWrite rows."""
+
+    def _live(self):
+        return GenerationCheckpoint.objects.filter(created_at__gte=timezone.now() - _ttl())
+
+    def _to_tuple(self, row: GenerationCheckpoint) -> CheckpointTuple:
+        writes = GenerationCheckpointWrite.objects.filter(
+            thread_id=row.thread_id,
+            checkpoint_ns=row.checkpoint_ns,
+            checkpoint_id=row.checkpoint_id,
+        ).order_by("task_id", "idx")
+        return CheckpointTuple(
+            config=_thread_config(row.thread_id, row.checkpoint_ns, row.checkpoint_id),
+            checkpoint=self.serde.loads_typed((row.checkpoint_type, bytes(row.checkpoint))),
+            metadata=self.serde.loads_typed((row.metadata_type, bytes(row.metadata))),
+            parent_config=_thread_config(
+                row.thread_id, row.checkpoint_ns, row.parent_checkpoint_id
+            ),
+            pending_writes=[
+                (w.task_id, w.channel, self.serde.loads_typed((w.value_type, bytes(w.value))))
+                for w in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        rows = self._live().filter(
+            thread_id=configurable["thread_id"],
+            checkpoint_ns=configurable.get("checkpoint_ns", ""),
+        )
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            rows = rows.filter(checkpoint_id=checkpoint_id)
+        row = rows.order_by("-checkpoint_id").first()
+        return self._to_tuple(row) if row is not None else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        rows = self._live().order_by("-checkpoint_id")
+        if config:
+            configurable = config["configurable"]
+            rows = rows.filter(thread_id=configurable["thread_id"])
+            if "checkpoint_ns" in configurable:
+                rows = rows.filter(checkpoint_ns=configurable["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                rows = rows.filter(checkpoint_id=checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            rows = rows.filter(checkpoint_id__lt=before_id)
+
+        for row in rows.iterator():
+            item = self._to_tuple(row)
+            if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    return
+                limit -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        with transaction.atomic():
+            GenerationCheckpoint.objects.update_or_create(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                defaults={
+                    "parent_checkpoint_id": configurable.get("checkpoint_id"),
+                    "checkpoint_type": checkpoint_type,
+                    "checkpoint": checkpoint_blob,
+                    "metadata_type": metadata_type,
+                    "metadata": metadata_blob,
+                },
+            )
+            self._trim_thread(thread_id, checkpoint_ns)
+        return _thread_config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        key = {
+            "thread_id": configurable["thread_id"],
+            "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+            "checkpoint_id": configurable["checkpoint_id"],
+            "task_id": task_id,
+        }
+        with transaction.atomic():
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                value_type, value_blob = self.serde.dumps_typed(value)
+                values = {
+                    "task_path": task_path,
+                    "channel": channel,
+                    "value_type": value_type,
+                    "value": value_blob,
+                }
+                if idx >= 0:
+                    # Regular writes are idempotent per (task, idx)
+                    GenerationCheckpointWrite.objects.get_or_create(**key, idx=idx, defaults=values)
+                else:
+                    GenerationCheckpointWrite.objects.update_or_create(**key, idx=idx, defaults=values)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with transaction.atomic():
+            GenerationCheckpoint.objects.filter(thread_id=thread_id).delete()
+            GenerationCheckpointWrite.objects.filter(thread_id=thread_id).delete()
+
+    def _trim_thread(self, thread_id: str, checkpoint_ns: str) -> None:
+        keep = getattr(settings, "AGENT_CHECKPOINT_MAX_PER_THREAD", 5)
+        stale = list(
+            GenerationCheckpoint.objects.filter(thread_id=thread_id, checkpoint_ns=checkpoint_ns)
+            .order_by("-checkpoint_id")
+            .values_list("checkpoint_id", flat=True)[keep:]
+        )
+        if stale:
+            GenerationCheckpoint.objects.filter(
+                thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id__in=stale
+            ).delete()
+            GenerationCheckpointWrite.objects.filter(
+                thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id__in=stale
+            ).delete()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await sync_to_async(self.get_tuple)(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await sync_to_async(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )()
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await sync_to_async(self.put)(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        await sync_to_async(self.put_writes)(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await sync_to_async(self.delete_thread)(thread_id)
+
+
+checkpointer = DjangoCheckpointSaver()
+
+
+def new_generation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def generation_config(generation_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": generation_id}}
+
+
+def load_generation_state(generation_id: str, *, user_id: int, deck_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Final state of a stored generation, or None when it expired, belongs to
+    someone else, or was not a safe, completed run.
+    """
+    saved = checkpointer.get_tuple(generation_config(generation_id))
+    if saved is None:
+        return None
+    values = saved.checkpoint.get("channel_values", {})
+    if values.get("user_id") != user_id or int(values.get("deck_id", -1)) != deck_id:
+        return None
+    if not values.get("is_safe"):
+        return None
+    return values
+
+
+def prune_checkpoints(batch_size: int = 500) -> int:
+    """Delete checkpoints past the retention window; returns the number removed."""
+    cutoff = timezone.now() - _ttl()
+    expired = GenerationCheckpoint.objects.filter(created_at__lt=cutoff)
+    keys = list(expired.values_list("thread_id", "checkpoint_ns", "checkpoint_id"))
+    deleted, _ = expired.delete()
+    # Writes are only needed while their checkpoint exists
+    for start in range(0, len(keys), batch_size):
+        match = Q()
+        for thread_id, checkpoint_ns, checkpoint_id in keys[start : start + batch_size]:
+            match |= Q(thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id=checkpoint_id)
+        GenerationCheckpointWrite.objects.filter(match).delete()
+    logger.info("Pruned %d expired generation checkpoints", deleted)
+    return deleted
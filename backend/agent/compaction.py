@@ -0,0 +1,121 @@
+"""
+Message-history compaction for agent calls.
+
+`AgentState.messages` only grows (operator.add), so without compaction every
+tool dump and every critic round is resent to Gemini on each agent step.
+Before each agent call we:
+
+1. drop superseded drafts and critic feedback (only the latest of each is kept;
+   the user's revision request is never dropped)
+2. if still over the token budget, keep the tool outputs most relevant to the
+   front in full and truncate the rest
+
+The system prompt, the original front and the tool-call/tool-result pairing
+Gemini requires are always preserved.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+# Rough Gemini ratio; good enough for budgeting, no API call needed
+CHARS_PER_TOKEN = 4
+# Shortest excerpt kept from a truncated tool result
+MIN_TOOL_SNIPPET_CHARS = 200
+# Prefix of the critic's refine requests (see llm_graph._critic_update)
+CRITIC_FEEDBACK_PREFIX = "Refine the answer. Feedback:"
+
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(len(_content(m)) for m in messages) // CHARS_PER_TOKEN
+
+
+def _content(message: BaseMessage) -> str:
+    content = message.content
+    return content if isinstance(content, str) else str(content)
+
+
+def _is_critic_feedback(message: BaseMessage) -> bool:
+    # Only critic rounds supersede each other; the user's revision request
+    # ("User feedback: ...") states what the revision is for and is always kept
+    return isinstance(message, HumanMessage) and _content(message).startswith(
+        CRITIC_FEEDBACK_PREFIX
+    )
+
+
+def _is_draft(message: BaseMessage) -> bool:
+    return isinstance(message, AIMessage) and not getattr(message, "tool_calls", None)
+
+
+def _drop_superseded(messages: List[BaseMessage]) -> List[BaseMessage]:
+    last_draft = max((i for i, m in enumerate(messages) if _is_draft(m)), default=None)
+    # The first human message is the front, never a feedback request
+    last_feedback = max(
+        (i for i, m in enumerate(messages) if i > 0 and _is_critic_feedback(m)), default=None
+    )
+    return [
+        m
+        for i, m in enumerate(messages)
+        if not (_is_draft(m) and i != last_draft)
+        and not (i > 0 and _is_critic_feedback(m) and i != last_feedback)
+    ]
+
+
+def _relevance(text: str, query_terms: set) -> float:
+    terms = set(_WORD.findall(text.lower()))
+    if not terms or not query_terms:
+        return 0.0
+    return len(terms & query_terms) / len(query_terms)
+
+
+def _truncate(message: ToolMessage, max_chars: int) -> ToolMessage:
+    content = _content(message)
+    if len(content) <= max_chars:
+        return message
+    kept = content[:max_chars].rstrip()
+    note = f"\n[... {len(content) - len(kept)} characters of this result omitted]"
+    return message.model_copy(update={"content": kept + note})
+
+
+def compact_messages(
+    messages: Sequence[BaseMessage],
+    *,
+    front: str,
+    budget_tokens: int,
+    reserved_tokens: int = 0,
+) -> Tuple[List[BaseMessage], int, int]:
+    """
+    Compact the conversation for the next agent call.
+
+    `reserved_tokens` accounts for the system prompt. Returns
+    (messages, tokens_before, tokens_after); token counts include the reserve.
+    """
+    before = estimate_tokens(messages) + reserved_tokens
+    compacted = _drop_superseded(list(messages))
+    if estimate_tokens(compacted) + reserved_tokens <= budget_tokens:
+        return compacted, before, estimate_tokens(compacted) + reserved_tokens
+
+    tool_indexes = [i for i, m in enumerate(compacted) if isinstance(m, ToolMessage)]
+    fixed_tokens = reserved_tokens + estimate_tokens(
+        [m for m in compacted if not isinstance(m, ToolMessage)]
+    )
+    remaining_chars = max(0, budget_tokens - fixed_tokens) * CHARS_PER_TOKEN
+
+    # Most relevant first; recency breaks ties
+    query_terms = set(_WORD.findall(front.lower()))
+    ranked = sorted(
+        tool_indexes,
+        key=lambda i: (_relevance(_content(compacted[i]), query_terms), i),
+        reverse=True,
+    )
+    for i in ranked:
+        allowance = max(MIN_TOOL_SNIPPET_CHARS, remaining_chars)
+        compacted[i] = _truncate(compacted[i], allowance)
+        remaining_chars = max(0, remaining_chars - len(_content(compacted[i])))
+
+    return compacted, before, estimate_tokens(compacted) + reserved_tokens
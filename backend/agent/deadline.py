@@ -0,0 +1,89 @@
+"""
+Per-request deadlines for graph execution.
+
+Clients may send a time budget in milliseconds (`deadline_ms` body field or
+X-Agent-Deadline-Ms header). It is stored in the state as an absolute wall
+clock time, and nodes check it before optional work. A stage is skipped when
+less than its reserve in AGENT_DEADLINE_RESERVES remains:
+
+- web_search: web_search_tool calls are answered with a skip note
+- tools: the agent must answer without calling tools (caps the tool loop)
+- critic: the draft goes straight to the formatter
+
+Skipped stages are listed in generation_meta["skipped_stages"]. Deadline-bound
+answers may be degraded, so they are neither cached nor shared between
+requests (see `may_reuse`).
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_HEADER = "X-Agent-Deadline-Ms"
+
+DEFAULT_RESERVES = {"web_search": 8.0, "tools": 5.0, "critic": 3.0}
+
+
+def request_deadline(request, data: Mapping[str, Any]) -> Optional[float]:
+    """Absolute deadline (time.time() based) from the body or header, or None."""
+    budget_ms = data.get("deadline_ms")
+    if budget_ms is None:
+        header = request.headers.get(DEADLINE_HEADER)
+        if not header:
+            return None
+        try:
+            budget_ms = int(header)
+        except ValueError:
+            logger.warning("Ignoring invalid %s header: %r", DEADLINE_HEADER, header)
+            return None
+    if budget_ms <= 0:
+        return None
+    return time.time() + budget_ms / 1000
+
+
+def remaining_seconds(state: Mapping[str, Any]) -> Optional[float]:
+    deadline = state.get("deadline")
+    if not deadline:
+        return None
+    return deadline - time.time()
+
+
+def out_of_time(state: Mapping[str, Any], stage: str) -> bool:
+    """True when a deadline is set and less than the stage's reserve remains."""
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return False
+    reserves = getattr(settings, "AGENT_DEADLINE_RESERVES", DEFAULT_RESERVES)
+    reserve = reserves.get(stage, DEFAULT_RESERVES[stage])
+    if remaining < reserve:
+        logger.info("Deadline: skipping %s with %.2fs left", stage, remaining)
+        return True
+    return False
+
+
+def clamp_timeout(state: Mapping[str, Any], timeout: float) -> float:
+    """Shorten a timeout so it does not run past the deadline."""
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return timeout
+    return max(0.0, min(timeout, remaining))
+
+
+def may_reuse(final_json: Mapping[str, Any], deadline: Optional[float]) -> bool:
+    """False for answers that may be degraded: a deadline was set or a stage was skipped."""
+    if deadline:
+        return False
+    return not (final_json.get("generation_meta") or {}).get("skipped_stages")
+
+
+def mark_skipped(meta: Dict[str, Any], stage: str) -> Dict[str, Any]:
+    skipped = list(meta.get("skipped_stages", []))
+    if stage not in skipped:
+        skipped.append(stage)
+    return {**meta, "skipped_stages": skipped}
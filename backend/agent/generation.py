@@ -0,0 +1,94 @@
+"""Helpers shared by every entry point that runs the generation graph."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from .cache import response_cache_key
+from .llm_graph import PROMPT_VERSION, load_profile_context
+from .state import AgentState
+
+
+def build_initial_state(
+    *,
+    front: str,
+    deck_id: int,
+    user_id: int,
+    messages: Optional[List[BaseMessage]] = None,
+    generation_meta: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+) -> AgentState:
+    """Initial graph state for a backside generation; `messages` defaults to the front."""
+    return {
+        "messages": messages if messages is not None else [HumanMessage(content=front)],
+        "front": front,
+        "deck_id": deck_id,
+        "user_id": user_id,
+        "deadline": deadline,
+        "critique_count": 0,
+        # Defaults
+        "is_safe": True,
+        "safety_reason": "",
+        "draft_answer": "",
+        "user_preferences": "",
+        "user_weights": {},
+        "deck_context": "",
+        "style_instructions": "",
+        "style_rules": {},
+        "prefetched_context": "",
+        "features_used": [],
+        "generation_meta": generation_meta or {},
+        "final_json": {},
+    }
+
+
+def revision_request(feedback: str) -> HumanMessage:
+    return HumanMessage(
+        content=f"Please revise the backside based on this feedback. User feedback: {feedback}"
+    )
+
+
+def build_revision_input(
+    *,
+    stored: Dict[str, Any],
+    previous_back: str,
+    feedback: str,
+    generation_meta: Dict[str, Any],
+    deadline: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Update applied on top of a checkpointed generation for a revision run.
+    Deck context, style, prefetched material, earlier tool results and the
+    guardrail verdict carry over from `stored`; per-run fields are reset.
+    """
+    prior_meta = stored.get("generation_meta") or {}
+    return {
+        "messages": [AIMessage(content=previous_back), revision_request(feedback)],
+        "deadline": deadline,
+        "critique_count": 0,
+        "draft_answer": "",
+        "final_json": {},
+        "generation_meta": {
+            **generation_meta,
+            "rag_used": prior_meta.get("rag_used", False),
+            "sources": prior_meta.get("sources", []),
+            "resumed": True,
+        },
+    }
+
+
+def backside_cache_key(*, user_id: int, deck_id: int, front: str):
+    """
+    Response cache key for a generated backside. Uses the same style as
+    context_builder_node, so a preference change yields a fresh key.
+    """
+    style = load_profile_context(user_id, deck_id)["style_instructions"]
+    return response_cache_key(
+        user_id=user_id,
+        deck_id=deck_id,
+        front=front,
+        style_instructions=style,
+        prompt_version=PROMPT_VERSION,
+    )
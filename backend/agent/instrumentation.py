@@ -0,0 +1,282 @@
+"""
+Per-node latency, token and tool instrumentation for the generation graph.
+
+When AGENT_METRICS_ENABLED is set, build_workflow wraps every node with
+`instrument_node`. Each node run is timed, and LLM token usage and tool calls
+made inside it are collected via a LangChain callback hook. The results feed
+rolling per-node and per-tool histograms (`metrics.snapshot()`, served at
+agent/metrics/). With AGENT_METRICS_IN_META the per-run trace is collected
+in state["node_trace"] and returned in the response's generation_meta["trace"].
+
+Wrapping happens at graph build time, so a disabled build runs the original
+node functions with no extra work.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import math
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+from uuid import UUID
+
+from django.conf import settings
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+
+def metrics_enabled() -> bool:
+    return getattr(settings, "AGENT_METRICS_ENABLED", False)
+
+
+def trace_in_meta() -> bool:
+    return getattr(settings, "AGENT_METRICS_IN_META", False)
+
+
+class LatencyHistogram:
+    """Rolling window of samples (seconds) with nearest-rank percentiles."""
+
+    def __init__(self, window: int):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+    def summary(self) -> Dict[str, Any]:
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe per-node and per-tool histograms plus token counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms: Dict[str, LatencyHistogram] = {}
+            self._counters: Dict[str, Dict[str, int]] = {}
+
+    def observe(self, kind: str, name: str, seconds: float, **counters: int) -> None:
+        window = getattr(settings, "AGENT_METRICS_WINDOW", 1024)
+        key = f"{kind}:{name}"
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram(window)
+            histogram.observe(seconds)
+            totals = self._counters.setdefault(key, {})
+            for counter, value in counters.items():
+                totals[counter] = totals.get(counter, 0) + value
+
+    def snapshot(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"nodes": {}, "tools": {}}
+        with self._lock:
+            for key, histogram in self._histograms.items():
+                kind, name = key.split(":", 1)
+                result["nodes" if kind == "node" else "tools"][name] = {
+                    **histogram.summary(),
+                    **self._counters.get(key, {}),
+                }
+        return result
+
+
+metrics = MetricsRegistry()
+
+
+@dataclass
+class NodeSpan:
+    node: str
+    seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    llm_calls: int = 0
+    tool_calls: List[str] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_usage(self, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    def add_tool(self, name: str) -> None:
+        with self._lock:
+            self.tool_calls.append(name)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "node": self.node,
+            "ms": round(self.seconds * 1000, 2),
+            "llm_calls": self.llm_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "tool_calls": list(self.tool_calls),
+        }
+
+
+_current_span: ContextVar[Optional[NodeSpan]] = ContextVar("agent_node_span", default=None)
+
+
+def _usage_from_result(response: LLMResult) -> tuple:
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Attributes LLM token usage and tool timings to the running node span."""
+
+    def __init__(self):
+        self._tool_starts: Dict[UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        span = _current_span.get()
+        if span is not None:
+            span.add_usage(*_usage_from_result(response))
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        with self._lock:
+            self._tool_starts[run_id] = (name, time.perf_counter())
+
+    def _finish_tool(self, run_id: UUID, failed: bool) -> None:
+        with self._lock:
+            started = self._tool_starts.pop(run_id, None)
+        if started is None:
+            return
+        name, start = started
+        metrics.observe("tool", name, time.perf_counter() - start, calls=1, errors=int(failed))
+        span = _current_span.get()
+        if span is not None:
+            span.add_tool(name)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool(run_id, failed=False)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish_tool(run_id, failed=True)
+
+
+_usage_handler = UsageCallbackHandler()
+# LangChain adds the handler to every run started while this var is set
+_usage_handler_var: ContextVar[Optional[UsageCallbackHandler]] = ContextVar(
+    "agent_usage_handler", default=None
+)
+register_configure_hook(_usage_handler_var, inheritable=True)
+
+
+def summarize_trace(nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "nodes": nodes,
+        "total_ms": round(sum(n["ms"] for n in nodes), 2),
+        "input_tokens": sum(n["input_tokens"] for n in nodes),
+        "output_tokens": sum(n["output_tokens"] for n in nodes),
+        "tool_calls": sum(len(n["tool_calls"]) for n in nodes),
+        "agent_iterations": sum(1 for n in nodes if n["node"] in ("agent", "guarded_agent")),
+        "critic_rounds": sum(1 for n in nodes if n["node"] == "critic"),
+    }
+
+
+def _merge_trace(state: Dict[str, Any], update: Any, span: NodeSpan) -> Any:
+    if not isinstance(update, dict):
+        return update
+    entry = span.as_dict()
+    # node_trace has an append reducer, so parallel nodes can both report
+    merged = {**update, "node_trace": [entry]}
+    if "final_json" in update:
+        # formatter_node snapshots generation_meta into the response
+        nodes = list(state.get("node_trace") or []) + [entry]
+        meta = {
+            **(update["final_json"].get("generation_meta") or {}),
+            "trace": summarize_trace(nodes),
+        }
+        merged["final_json"] = {**update["final_json"], "generation_meta": meta}
+    return merged
+
+
+def _finish(name: str, span: NodeSpan, start: float) -> None:
+    span.seconds = time.perf_counter() - start
+    metrics.observe(
+        "node",
+        name,
+        span.seconds,
+        llm_calls=span.llm_calls,
+        input_tokens=span.input_tokens,
+        output_tokens=span.output_tokens,
+        tool_calls=len(span.tool_calls),
+    )
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """Wrap a graph node with timing and usage collection; identity when metrics are off."""
+    if not metrics_enabled():
+        return fn
+
+    attach = trace_in_meta()
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            span = NodeSpan(name)
+            span_token = _current_span.set(span)
+            handler_token = _usage_handler_var.set(_usage_handler)
+            start = time.perf_counter()
+            try:
+                update = await fn(state)
+            finally:
+                _finish(name, span, start)
+                _usage_handler_var.reset(handler_token)
+                _current_span.reset(span_token)
+            return _merge_trace(state, update, span) if attach else update
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        span = NodeSpan(name)
+        span_token = _current_span.set(span)
+        handler_token = _usage_handler_var.set(_usage_handler)
+        start = time.perf_counter()
+        try:
+            update = fn(state)
+        finally:
+            _finish(name, span, start)
+            _usage_handler_var.reset(handler_token)
+            _current_span.reset(span_token)
+        return _merge_trace(state, update, span) if attach else update
+
+    return wrapper
@@ -0,0 +1,197 @@
+"""
+Database-backed queue for backside generations.
+
+Web workers only insert a GenerationJob and return 202; processes started with
+`manage.py run_agent_worker` claim jobs and run the graph, so slow LLM calls
+no longer hold request workers. Clients poll agent/flashcard/backside/jobs/<id>/.
+
+- Priority: higher `priority` runs first, then oldest first.
+- Visibility timeout: a claimed job is locked for
+  AGENT_JOB_VISIBILITY_TIMEOUT_SECONDS. If its worker dies, the lock expires
+  and another worker picks it up (this counts as an attempt).
+- Retries: a failed run is retried after AGENT_JOB_RETRY_BACKOFF_SECONDS,
+  doubled per attempt, until max_attempts is used up. Guardrail blocks are
+  final and are not retried.
+
+Claims are a conditional UPDATE on (status, attempts), so two workers can
+never run the same attempt, on any database backend.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from . import llm_graph
+from .checkpoints import CHECKPOINT_DURABILITY, generation_config, new_generation_id
+from .generation import build_initial_state
+from .models import GenerationJob
+
+logger = logging.getLogger(__name__)
+
+# Candidates fetched per claim attempt (others may be taken concurrently)
+CLAIM_BATCH = 5
+
+
+def _visibility_timeout() -> timedelta:
+    return timedelta(seconds=getattr(settings, "AGENT_JOB_VISIBILITY_TIMEOUT_SECONDS", 300))
+
+
+def _retry_backoff(attempt: int) -> timedelta:
+    base = getattr(settings, "AGENT_JOB_RETRY_BACKOFF_SECONDS", 5)
+    return timedelta(seconds=base * 2 ** max(0, attempt - 1))
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def submit_job(*, user, deck, front: str, priority: int = 0) -> GenerationJob:
+    return GenerationJob.objects.create(
+        user=user,
+        deck=deck,
+        front=front,
+        priority=priority,
+        max_attempts=getattr(settings, "AGENT_JOB_MAX_ATTEMPTS", 3),
+        available_at=timezone.now(),
+    )
+
+
+def _claimable(now):
+    queued = Q(status=GenerationJob.QUEUED, available_at__lte=now)
+    abandoned = Q(status=GenerationJob.RUNNING, locked_until__lt=now)
+    return GenerationJob.objects.filter(queued | abandoned).order_by("-priority", "created_at")
+
+
+def claim_job(worker_id: str) -> Optional[GenerationJob]:
+    """Lock the next runnable job for this worker, or return None when idle."""
+    now = timezone.now()
+    candidates = _claimable(now).values_list("pk", "status", "attempts", "max_attempts")
+    for pk, job_status, attempts, max_attempts in candidates[:CLAIM_BATCH]:
+        current = GenerationJob.objects.filter(pk=pk, status=job_status, attempts=attempts)
+        if attempts >= max_attempts:
+            # Abandoned on its last attempt: give up instead of running it again
+            current.update(
+                status=GenerationJob.FAILED,
+                error="Worker did not finish the job before its visibility timeout.",
+                locked_until=None,
+                finished_at=now,
+            )
+            continue
+        claimed = current.update(
+            status=GenerationJob.RUNNING,
+            attempts=attempts + 1,
+            locked_by=worker_id,
+            locked_until=now + _visibility_timeout(),
+        )
+        if claimed:
+            return GenerationJob.objects.get(pk=pk)
+    return None
+
+
+def _finish(job: GenerationJob, **fields) -> bool:
+    """Record the outcome unless the job was reclaimed after its lock expired."""
+    updated = GenerationJob.objects.filter(
+        pk=job.pk, status=GenerationJob.RUNNING, attempts=job.attempts
+    ).update(locked_until=None, **fields)
+    if not updated:
+        logger.warning("Job %s was reclaimed by another worker; dropping result", job.pk)
+    return bool(updated)
+
+
+def run_job(job: GenerationJob) -> str:
+    """Run a claimed job through the graph and store the outcome; returns the new status."""
+    state = build_initial_state(front=job.front, deck_id=job.deck_id, user_id=job.user_id)
+    generation_id = new_generation_id()
+    try:
+        final_state = llm_graph.app.invoke(
+            state, generation_config(generation_id), durability=CHECKPOINT_DURABILITY
+        )
+    except Exception as e:
+        logger.warning("Job %s attempt %d failed: %s", job.pk, job.attempts, e)
+        if job.attempts < job.max_attempts:
+            _finish(
+                job,
+                status=GenerationJob.QUEUED,
+                error=str(e),
+                available_at=timezone.now() + _retry_backoff(job.attempts),
+            )
+            return GenerationJob.QUEUED
+        _finish(job, status=GenerationJob.FAILED, error=str(e), finished_at=timezone.now())
+        return GenerationJob.FAILED
+
+    if not final_state["is_safe"]:
+        _finish(
+            job,
+            status=GenerationJob.BLOCKED,
+            result={"error": "Content Blocked", "reason": final_state["safety_reason"]},
+            finished_at=timezone.now(),
+        )
+        return GenerationJob.BLOCKED
+
+    _finish(
+        job,
+        status=GenerationJob.SUCCEEDED,
+        result={**final_state["final_json"], "generation_id": generation_id},
+        error="",
+        finished_at=timezone.now(),
+    )
+    return GenerationJob.SUCCEEDED
+
+
+def work(
+    worker_id: str,
+    *,
+    stop: Optional[threading.Event] = None,
+    burst: bool = False,
+    poll_seconds: Optional[float] = None,
+) -> int:
+    """
+    Claim and run jobs until `stop` is set (or, with burst, until the queue is
+    empty). Returns the number of jobs processed.
+    """
+    stop = stop or threading.Event()
+    if poll_seconds is None:
+        poll_seconds = getattr(settings, "AGENT_JOB_POLL_SECONDS", 1.0)
+    processed = 0
+    while not stop.is_set():
+        # Long-lived worker: drop connections the database closed or that
+        # outlived CONN_MAX_AGE, as Django does around each request
+        close_old_connections()
+        job = claim_job(worker_id)
+        if job is None:
+            if burst:
+                break
+            stop.wait(poll_seconds)
+            continue
+        logger.info("Worker %s running job %s (attempt %d)", worker_id, job.pk, job.attempts)
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def job_payload(job: GenerationJob) -> Dict[str, Any]:
+    """Poll response body for a job."""
+    payload: Dict[str, Any] = {
+        "job_id": str(job.pk),
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat(),
+    }
+    if job.finished_at:
+        payload["finished_at"] = job.finished_at.isoformat()
+    if job.status in (GenerationJob.SUCCEEDED, GenerationJob.BLOCKED):
+        payload["result"] = job.result
+    if job.error and job.status in (GenerationJob.QUEUED, GenerationJob.FAILED):
+        payload["error"] = job.error
+    return payload
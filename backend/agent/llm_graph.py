@@ -1,84 +1,208 @@
+import asyncio
+import contextvars
 import json
 import logging
 import re
-from typing import Literal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Awaitable, Callable, Literal, Optional
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
 from langchain_core.output_parsers import JsonOutputParser
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, END, START
 
 from accounts.models import UserProfile
+from asgiref.sync import sync_to_async
 from cards.models import Deck
 from django.conf import settings
 from .state import AgentState
-from .tools import search_deck_documents, web_search_tool
-from .prompting import build_style_instructions
+from .tools import (
+    deck_search_available,
+    record_web_searches,
+    search_deck_documents,
+    web_search_available,
+    web_search_tool,
+)
+from .cache import deck_context_version, get_profile_context, store_profile_context
+from uploads.services.document_registry import deck_has_documents
+from .checkpoints import checkpointer
+from .compaction import CRITIC_FEEDBACK_PREFIX, compact_messages, estimate_tokens
+from .deadline import clamp_timeout, mark_skipped, out_of_time
+from .instrumentation import instrument_node
+from .llm_routing import build_route_llm
+from .precritic import PASS as PRECHECK_PASS
+from .precritic import record_llm_verdict, run_precheck, should_skip_llm
+from .prompting import build_style_instructions, build_style_rules
+from .safety import fast_verdict, remember_verdict
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever prompts change in a way that should invalidate cached answers.
+PROMPT_VERSION = "v1"
+
+# The agent prefixes its user-visible answer with this marker.
+FINAL_ANSWER_MARKER = "FINAL ANSWER:"
+TOOL_TIMEOUT_MARKER = "[Tool timed out"
+WEB_SEARCH_SKIPPED = "[Web search skipped: the request deadline is too close]"
+NO_DECK_DOCUMENTS = "[No matching documents found]"
+
 # --- Setup LLM ---
 tools = [search_deck_documents, web_search_tool]
 
-if getattr(settings, "GEMINI_API_KEY", ""):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        temperature=0.3,
-        google_api_key=settings.GEMINI_API_KEY,
-        convert_system_message_to_human=True,
-    )
-    llm_with_tools = llm.bind_tools(tools)
-else:
-    # CI / tests without keys: provide stubs (tests patch these anyway)
-    from unittest.mock import MagicMock
+# One model per route (AGENT_LLM_ROUTES); stubs that raise when no key is set
+llm = build_route_llm("agent", name="llm")
+llm_with_tools = build_route_llm(
+    "agent", bind=lambda model: model.bind_tools(tools), name="llm_with_tools"
+)
+# Tools stay declared (the history may hold tool calls) but cannot be called
+llm_answer_only = build_route_llm(
+    "agent",
+    bind=lambda model: model.bind_tools(tools, tool_choice="none"),
+    name="llm_answer_only",
+)
+# Subsets for decks without documents and for tools whose circuit breaker is open
+llm_web_only = build_route_llm(
+    "agent", bind=lambda model: model.bind_tools([web_search_tool]), name="llm_web_only"
+)
+llm_deck_only = build_route_llm(
+    "agent", bind=lambda model: model.bind_tools([search_deck_documents]), name="llm_deck_only"
+)
+guardrail_llm = build_route_llm("guardrail", name="guardrail_llm")
+critic_llm = build_route_llm("critic", name="critic_llm")
+rapid_llm = build_route_llm("rapid", name="rapid_llm")
+preference_llm = build_route_llm("preference_tuning", name="preference_llm")
+
+# Shared pool for work that runs alongside a node (e.g. the speculative guardrail).
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "AGENT_THREAD_POOL_SIZE", 16),
+    thread_name_prefix="agent",
+)
+
+
+def _submit(fn, *args):
+    # Copy the caller's context so LangChain callbacks (streaming, tracing) follow the work.
+    ctx = contextvars.copy_context()
+    return _executor.submit(ctx.run, fn, *args)
+
+
+# Tool calls get their own pool: a call that outlives its timeout cannot be
+# stopped and keeps its worker, which must not starve the pool above.
+_tool_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "AGENT_TOOL_POOL_SIZE", 8),
+    thread_name_prefix="agent-tool",
+)
+
 
-    llm = MagicMock(name="llm")
-    llm.invoke.side_effect = RuntimeError("GEMINI_API_KEY not configured")
+class _ToolRun:
+    """A tool call on the tool pool; its timeout starts when a worker picks it up."""
 
-    llm_with_tools = MagicMock(name="llm_with_tools")
-    llm_with_tools.invoke.side_effect = RuntimeError("GEMINI_API_KEY not configured")
+    def __init__(self, fn, *args):
+        self.started = threading.Event()
+        self.started_at = 0.0
+        ctx = contextvars.copy_context()
+        self.future = _tool_executor.submit(ctx.run, self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        self.started_at = time.monotonic()
+        self.started.set()
+        return fn(*args)
+
+    def result(self, state: AgentState, tool_name: str):
+        """The call's result, or a timeout note; never waits past the deadline."""
+        timeout = _tool_timeout(tool_name)
+        # A call still queued after a full timeout is dropped before it runs
+        if not self.started.wait(clamp_timeout(state, timeout)) and self.future.cancel():
+            return _tool_timed_out(tool_name, timeout)
+        self.started.wait()
+        remaining = min(
+            self.started_at + timeout - time.monotonic(), clamp_timeout(state, timeout)
+        )
+        try:
+            return self.future.result(timeout=max(0.0, remaining))
+        except FutureTimeoutError:
+            return _tool_timed_out(tool_name, timeout)
 
 
 # --- Nodes ---
 
 
-def context_builder_node(state: AgentState):
+def load_profile_context(user_id: int, deck_id: int) -> dict:
+    """
+    Preferences, weights, deck name and rendered style for a (user, deck).
+    Served from profile_context_cache when warm, after one query checks that
+    the profile has not changed since (possibly in another process).
+    """
+    deck_version = deck_context_version(deck_id)
+    cached = get_profile_context(user_id, deck_id, version=_profile_version(user_id))
+    if cached is not None:
+        return cached
+
     user_prefs = {}
     user_weights = {}
     deck_ctx = "Unknown deck"
+    version = None
 
-    if state["user_id"]:
-        profile, _ = UserProfile.objects.get_or_create(user_id=state["user_id"])
+    if user_id:
+        profile, _ = UserProfile.objects.get_or_create(user_id=user_id)
         user_prefs = profile.preferences or {}
         user_weights = profile.weights or {}
+        version = profile.updated_at
 
-    deck = Deck.objects.filter(id=state["deck_id"]).only("name").first()
+    deck = Deck.objects.filter(id=deck_id).only("name").first()
     if deck:
         deck_ctx = deck.name
+    has_documents = deck_has_documents(deck_id)
 
     style, features_used = build_style_instructions(user_prefs, user_weights)
 
-    return {
+    context = {
         "user_preferences": user_prefs,
         "user_weights": user_weights,
         "deck_context": deck_ctx,
+        "has_documents": has_documents,
         "style_instructions": style,
+        "style_rules": build_style_rules(user_prefs, user_weights),
         "features_used": features_used,
+    }
+    store_profile_context(user_id, deck_id, context, version=version, deck_version=deck_version)
+    return context
+
+
+def _profile_version(user_id: int):
+    if not user_id:
+        return None
+    return UserProfile.objects.filter(user_id=user_id).values_list("updated_at", flat=True).first()
+
+
+async def _aprofile_version(user_id: int):
+    if not user_id:
+        return None
+    return await UserProfile.objects.filter(user_id=user_id).values_list(
+        "updated_at", flat=True
+    ).afirst()
+
+
+def _context_update(context: dict) -> dict:
+    return {
+        **context,
         "critique_count": 0,
         "generation_meta": {
-            "prompt_version": "v1",
-            "features_used": features_used,
+            "prompt_version": PROMPT_VERSION,
+            "features_used": context["features_used"],
             "rag_used": False,
             "sources": [],
         },
     }
 
 
-def guardrail_node(state: AgentState):
-    """
-    Checks for safety.
-    """
+def context_builder_node(state: AgentState):
+    return _context_update(load_profile_context(state["user_id"], state["deck_id"]))
+
+
+def _guardrail_chain():
     prompt = ChatPromptTemplate.from_messages(
         [
             (
@@ -93,28 +217,93 @@ def guardrail_node(state: AgentState):
             ("human", "{text}"),
         ]
     )
-    
+    return prompt | guardrail_llm | JsonOutputParser()
+
+
+def _guardrail_verdict(result) -> dict:
+    return {
+        "is_safe": result.get("allowed", False),
+        "safety_reason": result.get("reason", "Unknown"),
+    }
+
+
+def _guardrail_fail_open(exc: Exception) -> dict:
+    # If parsing fails, log the error and default to allowing the content
+    # (fail-open for usability, but log for monitoring)
+    logger.warning(f"Guardrail parsing failed, defaulting to allowed: {exc}")
+    return {
+        "is_safe": True,
+        "safety_reason": "Guardrail check skipped due to parsing error",
+    }
+
+
+def guardrail_node(state: AgentState):
+    """
+    Checks for safety. Clear cases are settled locally (or from the verdict
+    memo); only ambiguous text is sent to the LLM.
+    """
+    verdict = fast_verdict(state["front"])
+    if verdict is not None:
+        return verdict
+
     try:
-        chain = prompt | llm | JsonOutputParser()
-        result = chain.invoke({"text": state["front"]})
-        return {
-            "is_safe": result.get("allowed", False),
-            "safety_reason": result.get("reason", "Unknown"),
-        }
+        result = _guardrail_chain().invoke({"text": state["front"]})
+        verdict = _guardrail_verdict(result)
     except Exception as e:
-        # If parsing fails, log the error and default to allowing the content
-        # (fail-open for usability, but log for monitoring)
-        logger.warning(f"Guardrail parsing failed, defaulting to allowed: {e}")
-        return {
-            "is_safe": True,
-            "safety_reason": "Guardrail check skipped due to parsing error",
-        }
+        return _guardrail_fail_open(e)
+    remember_verdict(state["front"], verdict)
+    return verdict
 
 
-def agent_node(state: AgentState):
+def _offered_tools(state: AgentState) -> frozenset:
     """
-    The ReAct Brain. Decides whether to use tools or answer.
+    Names of the tools the agent may call this turn: deck search needs
+    documents, and neither tool is offered while its circuit breaker is open.
     """
+    offered = set()
+    if state.get("has_documents", True) and deck_search_available():
+        offered.add("search_deck_documents")
+    if web_search_available():
+        offered.add("web_search_tool")
+    return frozenset(offered)
+
+
+def _agent_messages(state: AgentState, offered: frozenset) -> tuple:
+    """System prompt plus (compacted) history, and the compaction stats or None."""
+    prefetched = state.get("prefetched_context") or ""
+    deck_search = "search_deck_documents" in offered
+    web_search = (
+        " and use 'web_search_tool' only for facts you are unsure of"
+        if "web_search_tool" in offered
+        else ""
+    )
+    if not state.get("has_documents", True):
+        search_priority = (
+            f"1. This deck has no uploaded documents. Answer from your own knowledge{web_search}.\n"
+        )
+    elif not deck_search and prefetched:
+        search_priority = "1. Use the PRE-FETCHED COURSE MATERIAL below first.\n"
+    elif not deck_search:
+        search_priority = (
+            f"1. Deck search is unavailable right now. Answer from your own knowledge{web_search}.\n"
+        )
+    elif prefetched:
+        search_priority = (
+            "1. Use the PRE-FETCHED COURSE MATERIAL below first. Call 'search_deck_documents' "
+            "only if it does not cover the question.\n"
+        )
+    else:
+        search_priority = (
+            "1. Try 'search_deck_documents' tool first to find course-specific definitions.\n"
+        )
+
+    search_guidance = (
+        "   - Deck search matches exact terms (including abbreviations) as well as meaning, so search with the user's wording first.\n"
+        "   - If the concept may appear under other names, pass those phrasings in 'queries' in the same call instead of searching again.\n"
+        if deck_search
+        else ""
+    )
+
     system_msg = (
         f"You are a study assistant generating the BACK side of an Anki flashcard.\n"
         f"Deck: '{state['deck_context']}'.\n\n"
@@ -126,48 +315,135 @@ def agent_node(state: AgentState):
         "- Use bullet points or short paragraphs as appropriate.\n"
         "- Do NOT include phrases like 'Based on the documents...' or 'I will use my internal knowledge...'.\n\n"
         "INFORMATION PRIORITY:\n"
-        "1. Try 'search_deck_documents' tool first to find course-specific definitions.\n"
+        f"{search_priority}"
         "2. The user's input may be abbreviated, informal, or use different terminology than the documents.\n"
-        "   - If initial search returns nothing, try rephrasing or expanding the query. \n"
+        f"{search_guidance}"
         "3. If tools return no results after trying variations, USE YOUR OWN KNOWLEDGE to answer. You MUST still provide a helpful answer.\n"
         "4. Never fail to produce a FINAL ANSWER. Even for ambiguous or short queries, do your best to provide a useful flashcard back.\n"
         "5. Blend tool results naturally into your answer without citing them explicitly."
     )
+    if prefetched:
+        system_msg += f"\n\nPRE-FETCHED COURSE MATERIAL (deck documents matching the question):\n{prefetched}"
+
+    system = SystemMessage(content=system_msg)
+    if not getattr(settings, "AGENT_PROMPT_COMPACTION", True):
+        return [system] + state["messages"], None
 
-    messages = [SystemMessage(content=system_msg)] + state["messages"]
-    response = llm_with_tools.invoke(messages)
-    return {"messages": [response]}
+    history, before, after = compact_messages(
+        state["messages"],
+        front=state["front"],
+        budget_tokens=getattr(settings, "AGENT_PROMPT_TOKEN_BUDGET", 6000),
+        reserved_tokens=estimate_tokens([system]),
+    )
+    if after < before:
+        logger.info("Compacted agent prompt from ~%d to ~%d tokens", before, after)
+    stats = {"prompt_tokens_before": before, "prompt_tokens_after": after}
+    return [system] + history, stats
 
 
-def tool_node(state: AgentState):
+def _agent_llm(state: AgentState, offered: frozenset) -> tuple:
     """
-    Executes tools if the Agent requested them.
+    LLM bound to the offered tools, or the answer-only binding when the
+    deadline leaves no time for tools.
     """
-    last_message = state["messages"][-1]
-    tool_calls = getattr(last_message, "tool_calls", None) or []
-    results = []
+    if out_of_time(state, "tools"):
+        return llm_answer_only, "tools"
+    if offered == {"search_deck_documents", "web_search_tool"}:
+        return llm_with_tools, None
+    if offered == {"web_search_tool"}:
+        return llm_web_only, None
+    if offered == {"search_deck_documents"}:
+        return llm_deck_only, None
+    return llm_answer_only, None
+
+
+def _agent_update(state: AgentState, response, compaction, skipped=None) -> dict:
+    update = {"messages": [response]}
+    if compaction is None and skipped is None:
+        return update
+    meta = dict(state.get("generation_meta", {}))
+    if compaction is not None:
+        # One entry per agent call, in call order
+        meta["compaction"] = list(meta.get("compaction", [])) + [compaction]
+    if skipped is not None:
+        meta = mark_skipped(meta, skipped)
+    update["generation_meta"] = meta
+    return update
+
+
+def agent_node(state: AgentState):
+    """
+    The ReAct Brain. Decides whether to use tools or answer.
+    """
+    offered = _offered_tools(state)
+    messages, compaction = _agent_messages(state, offered)
+    model, skipped = _agent_llm(state, offered)
+    response = model.invoke(messages)
+    return _agent_update(state, response, compaction, skipped)
+
+
+def _prepare_tool_call(state: AgentState, tool_call: dict):
+    """Resolve the tool and arguments for a requested call; (None, None) if unknown."""
+    tool_name = tool_call["name"]
+    tool_args = tool_call.get("args", {}) or {}
+
+    # Security: Inject deck_id if the LLM forgot it, or validate it
+    if tool_name == "search_deck_documents":
+        tool_args["deck_id"] = int(state["deck_id"])
+        if isinstance(tool_args.get("queries"), str):
+            tool_args["queries"] = [tool_args["queries"]]
+        return search_deck_documents, tool_args
+    if tool_name == "web_search_tool":
+        query = tool_args.get("query", "") if isinstance(tool_args, dict) else str(tool_args)
+        return web_search_tool, {"query": query}
+    return None, None
+
+
+def _skipped_tool_result(state: AgentState, tool_call: dict):
+    """Canned result for a call that is not worth running, or None to run it."""
+    if tool_call["name"] == "web_search_tool" and out_of_time(state, "web_search"):
+        return WEB_SEARCH_SKIPPED
+    if tool_call["name"] == "search_deck_documents" and not state.get("has_documents", True):
+        return NO_DECK_DOCUMENTS
+    return None
+
+
+def _invoke_tool_call(state: AgentState, tool_call: dict):
+    skipped = _skipped_tool_result(state, tool_call)
+    if skipped is not None:
+        return skipped
+    tool, args = _prepare_tool_call(state, tool_call)
+    return tool.invoke(args) if tool is not None else "Tool not found."
+
+
+def _tool_timeout(tool_name: str) -> float:
+    overrides = getattr(settings, "AGENT_TOOL_TIMEOUTS", {}) or {}
+    return overrides.get(tool_name, getattr(settings, "AGENT_TOOL_TIMEOUT_SECONDS", 20.0))
+
+
+def _tool_timed_out(tool_name: str, timeout: float) -> str:
+    logger.warning(f"Tool {tool_name} timed out after {timeout:g}s")
+    return f"{TOOL_TIMEOUT_MARKER} after {timeout:g}s]"
+
+
+def _tool_update(state: AgentState, tool_calls: list, outputs: list, web_searches=()) -> dict:
     new_meta = dict(state.get("generation_meta", {}))
-    rag_was_used = False
-
-    for tool_call in tool_calls:
-        tool_name = tool_call["name"]
-        tool_args = tool_call.get("args", {}) or {}
-
-        # Security: Inject deck_id if the LLM forgot it, or validate it
-        if tool_name == "search_deck_documents":
-            tool_args["deck_id"] = int(state["deck_id"])
-            res = search_deck_documents.invoke(tool_args)
-            # Mark RAG usage if we got content
-            if res and "[No matching documents found]" not in str(res) and "[Document search unavailable]" not in str(res):
-                rag_was_used = True
-        elif tool_name == "web_search_tool":
-            query = tool_args.get("query", "") if isinstance(tool_args, dict) else str(tool_args)
-            res = web_search_tool.invoke({"query": query})
-        else:
-            res = "Tool not found."
-
-        if rag_was_used:
+    if web_searches:
+        # Cache status and time saved per web search call, across tool turns
+        new_meta["web_search"] = list(new_meta.get("web_search", [])) + list(web_searches)
+    results = []
+    for tool_call, res in zip(tool_calls, outputs):
+        # Mark RAG usage if we got content
+        if (
+            tool_call["name"] == "search_deck_documents"
+            and res
+            and NO_DECK_DOCUMENTS not in str(res)
+            and "[Document search unavailable]" not in str(res)
+            and TOOL_TIMEOUT_MARKER not in str(res)
+        ):
             new_meta["rag_used"] = True
+        if res == WEB_SEARCH_SKIPPED:
+            new_meta = mark_skipped(new_meta, "web_search")
 
         results.append(
             ToolMessage(
@@ -179,6 +455,100 @@ def tool_node(state: AgentState):
     return {"messages": results, "generation_meta": new_meta}
 
 
+def tool_node(state: AgentState):
+    """
+    Executes tools if the Agent requested them. Calls run concurrently; a call
+    that exceeds its timeout is answered with a timeout note instead of
+    stalling the turn. ToolMessages keep the order the calls were requested in.
+    """
+    last_message = state["messages"][-1]
+    tool_calls = getattr(last_message, "tool_calls", None) or []
+    with record_web_searches() as web_searches:
+        runs = [_ToolRun(_invoke_tool_call, state, tool_call) for tool_call in tool_calls]
+
+    outputs = [run.result(state, tool_call["name"]) for tool_call, run in zip(tool_calls, runs)]
+    return _tool_update(state, tool_calls, outputs, list(web_searches))
+
+
+def _prefetched_text(result) -> str:
+    text = str(result or "").strip()
+    if text.startswith("[") and text.endswith("]"):
+        # "[No matching documents found]", "[Document search unavailable]", timeouts
+        return ""
+    return text
+
+
+def retrieve_node(state: AgentState):
+    """
+    Pre-emptive RAG: searches the deck for the front while the guardrail runs,
+    so the agent can usually answer without spending a turn on the search call.
+    Decks without documents are not searched.
+    """
+    if not state.get("has_documents", True):
+        return {"prefetched_context": ""}
+    run = _ToolRun(
+        search_deck_documents.invoke,
+        {"query": state["front"], "deck_id": int(state["deck_id"])},
+    )
+    return {"prefetched_context": _prefetched_text(run.result(state, "search_deck_documents"))}
+
+
+def retrieval_join_node(state: AgentState):
+    """
+    Joins the guardrail and retrieval branches and records that deck material
+    was prefetched. Whether the answer used it stays with rag_used, which only
+    the agent's own search calls set.
+    """
+    if not state.get("prefetched_context"):
+        return {}
+    new_meta = dict(state.get("generation_meta", {}))
+    new_meta["rag_prefetched"] = True
+    return {"generation_meta": new_meta}
+
+
+def _prefetch_update(state: AgentState, retrieved: dict) -> dict:
+    """retrieve_node output plus what retrieval_join_node records for it."""
+    return {**retrieved, **retrieval_join_node({**state, **retrieved})}
+
+
+def _speculate(verdict_future, run_agent: Callable[[], dict]) -> dict:
+    try:
+        agent_update = run_agent()
+    except Exception:
+        verdict = verdict_future.result()
+        if not verdict["is_safe"]:
+            return verdict
+        raise
+
+    verdict = verdict_future.result()
+    if not verdict["is_safe"]:
+        logger.info("Guardrail blocked request; discarding speculative agent step.")
+        return verdict
+    return {**verdict, **agent_update}
+
+
+def speculative_agent_node(state: AgentState):
+    """
+    Speculative mode: runs the safety check and the first agent step at the same time.
+    If the verdict is unsafe the agent's work is discarded, so safe requests
+    never wait on the guardrail alone.
+    """
+    return _speculate(_submit(guardrail_node, state), lambda: agent_node(state))
+
+
+def speculative_prefetch_agent_node(state: AgentState):
+    """
+    Speculative mode with prefetch: the deck search and then the first agent
+    step (which needs the matches) run while the guardrail checks the front.
+    """
+
+    def prefetch_and_answer():
+        prefetch = _prefetch_update(state, retrieve_node(state))
+        return {**prefetch, **agent_node({**state, **prefetch})}
+
+    return _speculate(_submit(guardrail_node, state), prefetch_and_answer)
+
+
 def generator_node(state: AgentState):
     """
     Takes the context gathered and drafts the flashcard answer.
@@ -189,8 +559,8 @@ def generator_node(state: AgentState):
     clean_text = raw_content
 
     # 1. Primary Method: Strict Tag Splitting
-    if "FINAL ANSWER:" in raw_content:
-        clean_text = raw_content.split("FINAL ANSWER:", 1)[1].strip()
+    if FINAL_ANSWER_MARKER in raw_content:
+        clean_text = raw_content.split(FINAL_ANSWER_MARKER, 1)[1].strip()
     
     # 2. Fallback Method: Regex Pattern Matching to remove common conversational starters
     else:
@@ -217,11 +587,8 @@ def generator_node(state: AgentState):
     return {"draft_answer": clean_text}
 
 
-def critic_node(state: AgentState):
-    """
-    Reflection Step: Critiques the draft against user preferences and question.
-    """
-    prompt = (
+def _critic_prompt(state: AgentState) -> str:
+    return (
         f"You are a teacher grading a flashcard answer.\n"
         f"1. The User asked: '{state['front']}'\n"
         f"2. The Agent answered: '{state['draft_answer']}'\n"
@@ -229,9 +596,9 @@ def critic_node(state: AgentState):
         "Task: Does the answer correctly address the question AND match the learning style? "
         "If yes, return 'PERFECT'. Otherwise explain what to improve."
     )
-    response = llm.invoke(prompt)
-    feedback = response.content.strip()
 
+
+def _critic_update(state: AgentState, feedback: str) -> dict:
     if "PERFECT" in feedback:
         return {"critique_count": state["critique_count"] + 1}  # No change to messages
     else:
@@ -239,11 +606,55 @@ def critic_node(state: AgentState):
         return {
             "critique_count": state["critique_count"] + 1,
             "messages": [
-                HumanMessage(content=f"Refine the answer. Feedback: {feedback}")
+                HumanMessage(content=f"{CRITIC_FEEDBACK_PREFIX} {feedback}")
             ],
         }
 
 
+def _precheck_meta(state: AgentState, precheck, llm_called: bool) -> dict:
+    meta = dict(state.get("generation_meta", {}))
+    meta["critic"] = {
+        "llm": llm_called,
+        "precheck_verdict": precheck.verdict,
+        "precheck_score": round(precheck.score, 2),
+    }
+    return {"generation_meta": meta}
+
+
+def _skipped_critic_update(state: AgentState, precheck) -> dict:
+    feedback = "PERFECT" if precheck.verdict == PRECHECK_PASS else precheck.feedback
+    return {**_critic_update(state, feedback), **_precheck_meta(state, precheck, False)}
+
+
+def _llm_critic_update(state: AgentState, precheck, feedback: str) -> dict:
+    update = _critic_update(state, feedback)
+    if precheck is None:
+        return update
+    record_llm_verdict(precheck, "PERFECT" in feedback)
+    return {**update, **_precheck_meta(state, precheck, True)}
+
+
+def _deadline_critic_update(state: AgentState) -> dict:
+    meta = mark_skipped(dict(state.get("generation_meta", {})), "critic")
+    return {"critique_count": state["critique_count"] + 1, "generation_meta": meta}
+
+
+def critic_node(state: AgentState):
+    """
+    Reflection Step: Critiques the draft against user preferences and question.
+    A local pre-check settles clear cases; the LLM only sees borderline drafts.
+    Skipped entirely when the request deadline is close.
+    """
+    if out_of_time(state, "critic"):
+        return _deadline_critic_update(state)
+    precheck = run_precheck(state["draft_answer"], state.get("style_rules"))
+    if should_skip_llm(precheck):
+        return _skipped_critic_update(state, precheck)
+
+    response = critic_llm.invoke(_critic_prompt(state))
+    return _llm_critic_update(state, precheck, response.content.strip())
+
+
 def formatter_node(state: AgentState):
     """
     Deterministic JSON: the UI expects strict JSON, don't rely on the LLM for formatting.
@@ -332,6 +743,124 @@ def output_guardrail_node(state: AgentState):
     }
 
 
+# --- Async Nodes ---
+# Same behaviour as the sync nodes above, but LLM, Supabase and Tavily calls are
+# awaited so one ASGI worker can hold many in-flight generations.
+
+
+async def acontext_builder_node(state: AgentState):
+    version = await _aprofile_version(state["user_id"])
+    cached = get_profile_context(state["user_id"], state["deck_id"], version=version)
+    if cached is not None:
+        return _context_update(cached)
+    # ORM access stays synchronous; run it off the event loop.
+    return await sync_to_async(context_builder_node)(state)
+
+
+async def aguardrail_node(state: AgentState):
+    verdict = fast_verdict(state["front"])
+    if verdict is not None:
+        return verdict
+
+    try:
+        result = await _guardrail_chain().ainvoke({"text": state["front"]})
+        verdict = _guardrail_verdict(result)
+    except Exception as e:
+        return _guardrail_fail_open(e)
+    remember_verdict(state["front"], verdict)
+    return verdict
+
+
+async def aagent_node(state: AgentState):
+    offered = _offered_tools(state)
+    messages, compaction = _agent_messages(state, offered)
+    model, skipped = _agent_llm(state, offered)
+    response = await model.ainvoke(messages)
+    return _agent_update(state, response, compaction, skipped)
+
+
+async def _ainvoke_tool_call(state: AgentState, tool_call: dict):
+    skipped = _skipped_tool_result(state, tool_call)
+    if skipped is not None:
+        return skipped
+    tool, args = _prepare_tool_call(state, tool_call)
+    if tool is None:
+        return "Tool not found."
+    timeout = clamp_timeout(state, _tool_timeout(tool_call["name"]))
+    try:
+        return await asyncio.wait_for(tool.ainvoke(args), timeout)
+    except asyncio.TimeoutError:
+        return _tool_timed_out(tool_call["name"], timeout)
+
+
+async def atool_node(state: AgentState):
+    last_message = state["messages"][-1]
+    tool_calls = getattr(last_message, "tool_calls", None) or []
+    with record_web_searches() as web_searches:
+        outputs = await asyncio.gather(
+            *(_ainvoke_tool_call(state, tool_call) for tool_call in tool_calls)
+        )
+    return _tool_update(state, tool_calls, list(outputs), list(web_searches))
+
+
+async def aretrieve_node(state: AgentState):
+    if not state.get("has_documents", True):
+        return {"prefetched_context": ""}
+    timeout = clamp_timeout(state, _tool_timeout("search_deck_documents"))
+    try:
+        result = await asyncio.wait_for(
+            search_deck_documents.ainvoke(
+                {"query": state["front"], "deck_id": int(state["deck_id"])}
+            ),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        result = _tool_timed_out("search_deck_documents", timeout)
+    return {"prefetched_context": _prefetched_text(result)}
+
+
+async def _aspeculate(verdict_task, run_agent: Callable[[], Awaitable[dict]]) -> dict:
+    try:
+        agent_update = await run_agent()
+    except Exception:
+        verdict = await verdict_task
+        if not verdict["is_safe"]:
+            return verdict
+        raise
+
+    verdict = await verdict_task
+    if not verdict["is_safe"]:
+        logger.info("Guardrail blocked request; discarding speculative agent step.")
+        return verdict
+    return {**verdict, **agent_update}
+
+
+async def aspeculative_agent_node(state: AgentState):
+    verdict_task = asyncio.ensure_future(aguardrail_node(state))
+    return await _aspeculate(verdict_task, lambda: aagent_node(state))
+
+
+async def aspeculative_prefetch_agent_node(state: AgentState):
+    verdict_task = asyncio.ensure_future(aguardrail_node(state))
+
+    async def prefetch_and_answer():
+        prefetch = _prefetch_update(state, await aretrieve_node(state))
+        return {**prefetch, **await aagent_node({**state, **prefetch})}
+
+    return await _aspeculate(verdict_task, prefetch_and_answer)
+
+
+async def acritic_node(state: AgentState):
+    if out_of_time(state, "critic"):
+        return _deadline_critic_update(state)
+    precheck = run_precheck(state["draft_answer"], state.get("style_rules"))
+    if should_skip_llm(precheck):
+        return _skipped_critic_update(state, precheck)
+
+    response = await critic_llm.ainvoke(_critic_prompt(state))
+    return _llm_critic_update(state, precheck, response.content.strip())
+
+
 # --- Conditional Edges ---
 
 
@@ -346,6 +875,14 @@ def route_agent(state: AgentState) -> Literal["tools", "generator"]:
     return "generator"
 
 
+def route_speculative_agent(
+    state: AgentState,
+) -> Literal["tools", "generator", "end_unsafe"]:
+    if not state["is_safe"]:
+        return "end_unsafe"
+    return route_agent(state)
+
+
 def route_critic(state: AgentState) -> Literal["agent", "formatter"]:
     # Check if critique loop maxed out (avoid infinite loops)
     if state["critique_count"] > 1:
@@ -366,37 +903,147 @@ def route_output_guardrail(state: AgentState) -> Literal["end_success", "end_fai
 
 # --- Build the Graph ---
 
-workflow = StateGraph(AgentState)
-
-workflow.add_node("context_builder", context_builder_node)
-workflow.add_node("guardrail", guardrail_node)
-workflow.add_node("agent", agent_node)
-workflow.add_node("tools", tool_node)
-workflow.add_node("generator", generator_node)
-workflow.add_node("critic", critic_node)
-workflow.add_node("formatter", formatter_node)
-workflow.add_node("output_guardrail", output_guardrail_node)
-
-# Flow
-workflow.set_entry_point("context_builder")
-workflow.add_edge("context_builder", "guardrail")
-workflow.add_conditional_edges(
-    "guardrail", route_guardrail, {"agent": "agent", "end_unsafe": END}
-)
 
-workflow.add_conditional_edges(
-    "agent", route_agent, {"tools": "tools", "generator": "generator"}
-)
-workflow.add_edge("tools", "agent")
+SYNC_NODES = {
+    "context_builder": context_builder_node,
+    "guardrail": guardrail_node,
+    "guarded_agent": speculative_agent_node,
+    "guarded_prefetch_agent": speculative_prefetch_agent_node,
+    "agent": agent_node,
+    "tools": tool_node,
+    "retrieve": retrieve_node,
+    "retrieval_join": retrieval_join_node,
+    "generator": generator_node,
+    "critic": critic_node,
+    "formatter": formatter_node,
+    "output_guardrail": output_guardrail_node,
+}
 
-workflow.add_edge("generator", "critic")
-workflow.add_conditional_edges(
-    "critic", route_critic, {"agent": "agent", "formatter": "formatter"}
-)
-workflow.add_edge("formatter", "output_guardrail")
-workflow.add_conditional_edges(
-    "output_guardrail", route_output_guardrail, {"end_success": END, "end_failed": END}
+ASYNC_NODES = {
+    **SYNC_NODES,
+    "context_builder": acontext_builder_node,
+    "guardrail": aguardrail_node,
+    "guarded_agent": aspeculative_agent_node,
+    "guarded_prefetch_agent": aspeculative_prefetch_agent_node,
+    "agent": aagent_node,
+    "tools": atool_node,
+    "retrieve": aretrieve_node,
+    "critic": acritic_node,
+}
+
+
+def build_workflow(
+    speculative_guardrail: bool = False,
+    asynchronous: bool = False,
+    prebuilt_context: bool = False,
+    prefetch_rag: bool = False,
+    resume: bool = False,
+) -> StateGraph:
+    """
+    Assemble the generation graph.
+
+    With `speculative_guardrail` the guardrail and the first agent step share a
+    single node and run concurrently instead of back to back. `asynchronous`
+    swaps in the awaitable node implementations (use with ainvoke/astream).
+    `prebuilt_context` drops context_builder for callers that already merged
+    its output into the initial state (batch generation). `prefetch_rag` runs
+    a deck search for the front in parallel with the guardrail and hands the
+    results to the agent's prompt; in speculative mode the search happens
+    inside guarded_agent, ahead of the agent step and alongside the
+    guardrail. `resume` starts at the agent, for runs that
+    continue a checkpointed generation whose context and verdict are reused.
+    """
+    nodes = ASYNC_NODES if asynchronous else SYNC_NODES
+    workflow = StateGraph(AgentState)
+
+    def add_node(name: str, implementation: Optional[str] = None) -> None:
+        # instrument_node is a no-op unless AGENT_METRICS_ENABLED
+        workflow.add_node(name, instrument_node(name, nodes[implementation or name]))
+
+    if not (prebuilt_context or resume):
+        add_node("context_builder")
+    if speculative_guardrail and not resume:
+        # Prefetching happens inside the node, alongside the guardrail
+        add_node("guarded_agent", "guarded_prefetch_agent" if prefetch_rag else None)
+    elif not resume:
+        add_node("guardrail")
+        if prefetch_rag:
+            add_node("retrieve")
+            add_node("retrieval_join")
+    add_node("agent")
+    add_node("tools")
+    add_node("generator")
+    add_node("critic")
+    add_node("formatter")
+    add_node("output_guardrail")
+
+    # Flow
+    start = START
+    if not (prebuilt_context or resume):
+        workflow.add_edge(START, "context_builder")
+        start = "context_builder"
+
+    if resume:
+        workflow.add_edge(START, "agent")
+    elif speculative_guardrail:
+        workflow.add_edge(start, "guarded_agent")
+        workflow.add_conditional_edges(
+            "guarded_agent",
+            route_speculative_agent,
+            {"tools": "tools", "generator": "generator", "end_unsafe": END},
+        )
+    elif prefetch_rag:
+        workflow.add_edge(start, "guardrail")
+        workflow.add_edge(start, "retrieve")
+        workflow.add_edge(["guardrail", "retrieve"], "retrieval_join")
+        workflow.add_conditional_edges(
+            "retrieval_join", route_guardrail, {"agent": "agent", "end_unsafe": END}
+        )
+    else:
+        workflow.add_edge(start, "guardrail")
+        workflow.add_conditional_edges(
+            "guardrail", route_guardrail, {"agent": "agent", "end_unsafe": END}
+        )
+
+    workflow.add_conditional_edges(
+        "agent", route_agent, {"tools": "tools", "generator": "generator"}
+    )
+    workflow.add_edge("tools", "agent")
+
+    workflow.add_edge("generator", "critic")
+    workflow.add_conditional_edges(
+        "critic", route_critic, {"agent": "agent", "formatter": "formatter"}
+    )
+    workflow.add_edge("formatter", "output_guardrail")
+    workflow.add_conditional_edges(
+        "output_guardrail", route_output_guardrail, {"end_success": END, "end_failed": END}
+    )
+    return workflow
+
+
+workflow = build_workflow(
+    speculative_guardrail=getattr(settings, "AGENT_SPECULATIVE_GUARDRAIL", False),
+    prefetch_rag=getattr(settings, "AGENT_PREFETCH_RAG", False),
 )
 
-# Compile
-app = workflow.compile()
+# Compile. Runs persist their final state; pass generation_config() and
+# durability=CHECKPOINT_DURABILITY when invoking.
+app = workflow.compile(checkpointer=checkpointer)
+
+# Revisions continue a stored generation on the same thread, skipping
+# context building, the guardrail and retrieval
+revision_app = build_workflow(resume=True).compile(checkpointer=checkpointer)
+
+# Awaitable twin of `app` for the ASGI views
+async_app = build_workflow(
+    speculative_guardrail=getattr(settings, "AGENT_SPECULATIVE_GUARDRAIL", False),
+    asynchronous=True,
+    prefetch_rag=getattr(settings, "AGENT_PREFETCH_RAG", False),
+).compile()
+
+# Batch generation runs context_builder once per batch, not once per front
+batch_app = build_workflow(
+    speculative_guardrail=getattr(settings, "AGENT_SPECULATIVE_GUARDRAIL", False),
+    prebuilt_context=True,
+    prefetch_rag=getattr(settings, "AGENT_PREFETCH_RAG", False),
+).compile()
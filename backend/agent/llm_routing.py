@@ -0,0 +1,121 @@
+"""
+Per-route chat model registry.
+
+Each LLM call site ("route") gets its own model, temperature and timeout from
+AGENT_LLM_ROUTES, plus an optional fallback model that is tried when the
+primary call raises. The default settings put the classification-style
+routes (guardrail, critic, preference tuning) on a lite model.
+
+Routes:
+- agent: the tool-calling generator
+- guardrail: input safety classification
+- critic: draft grading
+- rapid: the rapid backside/revision endpoints
+- preference_tuning: weight patch suggestions after a revision
+
+Each model reports to its own circuit breaker ("gemini:<model>", see
+common/breakers.py); while it is open calls fail fast, so a route with a fallback
+goes straight to the fallback model.
+
+Models are built once at import time. Without GEMINI_API_KEY every route is a
+stub that raises on use (tests patch the module-level models anyway).
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+from django.conf import settings
+from langchain_core.callbacks import BaseCallbackHandler
+
+from common.breakers import CircuitBreaker, get_breaker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+# Used for routes (or keys) missing from AGENT_LLM_ROUTES
+DEFAULT_ROUTE = {"model": DEFAULT_MODEL, "temperature": 0.3, "timeout": 60, "fallback": None}
+
+ROUTES = ("agent", "guardrail", "critic", "rapid", "preference_tuning")
+
+
+def route_config(route: str) -> Dict[str, Any]:
+    """Settings for a route, filled in from the defaults for missing keys."""
+    if route not in ROUTES:
+        raise KeyError(f"Unknown LLM route: {route}")
+    routes = getattr(settings, "AGENT_LLM_ROUTES", {})
+    return {**DEFAULT_ROUTE, **routes.get(route, {})}
+
+
+class BreakerCallbackHandler(BaseCallbackHandler):
+    """
+    Puts a chat model behind a circuit breaker: raising from
+    on_chat_model_start aborts the call before any request is sent.
+    Generation length varies, so slow calls are not counted; the route
+    timeout turns a hung call into an error instead.
+    """
+
+    raise_error = True
+    run_inline = True
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self._calls: Dict[UUID, Any] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._calls[run_id] = self.breaker.admit()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        call = self._calls.pop(run_id, None)
+        if call is not None:
+            self.breaker.record(call, count_slow=False)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        call = self._calls.pop(run_id, None)
+        if call is not None:
+            call.failed()
+            self.breaker.record(call, count_slow=False)
+
+
+def _chat_model(model: str, config: Dict[str, Any]):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=config["temperature"],
+        timeout=config["timeout"],
+        google_api_key=settings.GEMINI_API_KEY,
+        convert_system_message_to_human=True,
+        callbacks=[BreakerCallbackHandler(get_breaker(f"gemini:{model}"))],
+    )
+
+
+def _stub(name: str):
+    from unittest.mock import AsyncMock, MagicMock
+
+    stub = MagicMock(name=name)
+    stub.invoke.side_effect = RuntimeError("GEMINI_API_KEY not configured")
+    stub.ainvoke = AsyncMock(side_effect=RuntimeError("GEMINI_API_KEY not configured"))
+    return stub
+
+
+def build_route_llm(route: str, *, bind: Optional[Callable[[Any], Any]] = None, name: str = ""):
+    """
+    Chat model for a route. `bind` (e.g. lambda m: m.bind_tools(tools)) is
+    applied to the primary and the fallback separately, since a model wrapped
+    in fallbacks can no longer bind tools.
+    """
+    if not getattr(settings, "GEMINI_API_KEY", ""):
+        return _stub(name or f"{route}_llm")
+
+    config = route_config(route)
+    bind = bind or (lambda model: model)
+    primary = bind(_chat_model(config["model"], config))
+    fallback = config.get("fallback")
+    if not fallback or fallback == config["model"]:
+        return primary
+    logger.info("LLM route %s: %s, falling back to %s", route, config["model"], fallback)
+    return primary.with_fallbacks([bind(_chat_model(fallback, config))])
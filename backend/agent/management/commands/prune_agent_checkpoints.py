@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from agent.checkpoints import prune_checkpoints
+
+
+class Command(BaseCommand):
+    help = "Delete generation checkpoints older than AGENT_CHECKPOINT_TTL_SECONDS."
+
+    def handle(self, *args, **options):
+        deleted = prune_checkpoints()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired checkpoints."))
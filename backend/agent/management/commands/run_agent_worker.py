@@ -0,0 +1,45 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from agent.jobs import default_worker_id, work
+
+
+class Command(BaseCommand):
+    help = "Run queued backside generation jobs (agent/flashcard/backside/jobs/)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for new jobs.",
+        )
+        parser.add_argument(
+            "--poll-seconds",
+            type=float,
+            default=None,
+            help="Idle wait between queue checks (default: AGENT_JOB_POLL_SECONDS).",
+        )
+        parser.add_argument("--worker-id", default=None, help="Name recorded on claimed jobs.")
+
+    def handle(self, *args, **options):
+        worker_id = options["worker_id"] or default_worker_id()
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            # Finish the current job, then exit
+            self.stdout.write(f"Worker {worker_id} stopping after the current job.")
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        self.stdout.write(f"Worker {worker_id} started.")
+        processed = work(
+            worker_id,
+            stop=stop,
+            burst=options["burst"],
+            poll_seconds=options["poll_seconds"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker_id} processed {processed} jobs."))
@@ -265,6 +265,7 @@ def test_full_pipeline():
     print_header("FULL PIPELINE TEST")
 
     try:
+        from agent.checkpoints import generation_config, new_generation_id
         from agent.llm_graph import app
 
         # Create or get test user and deck
@@ -299,7 +300,7 @@ def test_full_pipeline():
 
         print("  Starting pipeline...")
         start = time.time()
-        final_state = app.invoke(initial_state)
+        final_state = app.invoke(initial_state, generation_config(new_generation_id()))
         elapsed = time.time() - start
 
         print_result("Pipeline completed", f"{elapsed:.2f}s")
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thread_id', models.CharField(max_length=64)),
+                ('checkpoint_ns', models.CharField(blank=True, default='', max_length=255)),
+                ('checkpoint_id', models.CharField(max_length=64)),
+                ('parent_checkpoint_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('checkpoint_type', models.CharField(max_length=32)),
+                ('checkpoint', models.BinaryField()),
+                ('metadata_type', models.CharField(max_length=32)),
+                ('metadata', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['-checkpoint_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GenerationCheckpointWrite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thread_id', models.CharField(max_length=64)),
+                ('checkpoint_ns', models.CharField(blank=True, default='', max_length=255)),
+                ('checkpoint_id', models.CharField(max_length=64)),
+                ('task_id', models.CharField(max_length=64)),
+                ('task_path', models.CharField(blank=True, default='', max_length=255)),
+                ('idx', models.IntegerField()),
+                ('channel', models.CharField(max_length=255)),
+                ('value_type', models.CharField(max_length=32)),
+                ('value', models.BinaryField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='generationcheckpointwrite',
+            constraint=models.UniqueConstraint(fields=('thread_id', 'checkpoint_ns', 'checkpoint_id', 'task_id', 'idx'), name='unique_generation_checkpoint_write'),
+        ),
+        migrations.AddConstraint(
+            model_name='generationcheckpoint',
+            constraint=models.UniqueConstraint(fields=('thread_id', 'checkpoint_ns', 'checkpoint_id'), name='unique_generation_checkpoint'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0006_unique_deck_name_per_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('agent', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('front', models.TextField()),
+                ('priority', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('blocked', 'Blocked'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('available_at', models.DateTimeField()),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=128)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('deck', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generation_jobs', to='cards.deck')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generation_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-priority', 'created_at'],
+                'indexes': [models.Index(fields=['status', '-priority', 'available_at'], name='generation_job_claim')],
+            },
+        ),
+    ]
@@ -0,0 +1,119 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class GenerationCheckpoint(models.Model):
+    """
+    A serialized LangGraph checkpoint. thread_id is the generation_id returned
+    to clients, so a revision can resume from the stored state.
+    """
+
+    thread_id = models.CharField(max_length=64)
+    checkpoint_ns = models.CharField(max_length=255, blank=True, default="")
+    checkpoint_id = models.CharField(max_length=64)
+    parent_checkpoint_id = models.CharField(max_length=64, blank=True, null=True)
+    checkpoint_type = models.CharField(max_length=32)
+    checkpoint = models.BinaryField()
+    metadata_type = models.CharField(max_length=32)
+    metadata = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Checkpoint({self.thread_id}/{self.checkpoint_id})"
+
+    class Meta:
+        ordering = ["-checkpoint_id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread_id", "checkpoint_ns", "checkpoint_id"],
+                name="unique_generation_checkpoint",
+            )
+        ]
+
+
+class GenerationCheckpointWrite(models.Model):
+    """Pending writes recorded against a checkpoint (pairs with GenerationCheckpoint)."""
+
+    thread_id = models.CharField(max_length=64)
+    checkpoint_ns = models.CharField(max_length=255, blank=True, default="")
+    checkpoint_id = models.CharField(max_length=64)
+    task_id = models.CharField(max_length=64)
+    task_path = models.CharField(max_length=255, blank=True, default="")
+    idx = models.IntegerField()
+    channel = models.CharField(max_length=255)
+    value_type = models.CharField(max_length=32)
+    value = models.BinaryField()
+
+    def __str__(self):
+        return f"CheckpointWrite({self.thread_id}/{self.checkpoint_id}/{self.channel})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                name="unique_generation_checkpoint_write",
+            )
+        ]
+
+
+class GenerationJob(models.Model):
+    """
+    A queued backside generation, run by `manage.py run_agent_worker`.
+
+    A worker claims a job by moving it to RUNNING with locked_until set to now
+    plus the visibility timeout. A RUNNING job whose lock has expired (its
+    worker died) can be claimed again. Failed attempts are retried after a
+    backoff (available_at) until max_attempts is reached.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    BLOCKED = "blocked"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (BLOCKED, "Blocked"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="generation_jobs"
+    )
+    deck = models.ForeignKey(
+        "cards.Deck", on_delete=models.CASCADE, related_name="generation_jobs"
+    )
+    front = models.TextField()
+    priority = models.IntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    available_at = models.DateTimeField()
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=128, blank=True, default="")
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"GenerationJob({self.id}, {self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.BLOCKED, self.FAILED)
+
+    class Meta:
+        ordering = ["-priority", "created_at"]
+        indexes = [
+            models.Index(
+                fields=["status", "-priority", "available_at"],
+                name="generation_job_claim",
+            )
+        ]
@@ -0,0 +1,190 @@
+"""
+Deterministic pre-check of drafts against the user's style rules.
+
+critic_node consults this before calling the LLM: drafts that clearly pass
+are accepted, empty or wholly off-style drafts get fixed feedback, and only
+borderline drafts go to the LLM critic. A small audit sample of decisive
+drafts still goes to the LLM so agreement can be measured and the pass
+threshold tuned.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PASS = "pass"
+FAIL = "fail"
+BORDERLINE = "borderline"
+
+BULLET_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+", re.MULTILINE)
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:#{1,6}\s+\S.*|\*\*[^*\n]+\*\*:?|\d+\)\s*[A-Z][^\n]{0,40}:?|[A-Z][A-Za-z /&-]{2,40}:)\s*$",
+    re.MULTILINE,
+)
+EXAMPLE_PATTERN = re.compile(
+    r"\b(?:e\.g\.|for example|for instance|example|such as|imagine)\b", re.IGNORECASE
+)
+QUIZ_PATTERN = re.compile(
+    r"(?:\?\s*$|\b(?:self-check|quick check|quiz|test yourself)\b)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+CHECK_FEEDBACK = {
+    "non_empty": "The answer is empty; write the flashcard back.",
+    "word_count": "Adjust the length to the requested verbosity.",
+    "structure": "Follow the requested structure (bullets/sections/paragraph).",
+    "example": "Include a concrete example.",
+    "quiz": "End with one quick self-check question.",
+}
+
+
+@dataclass(frozen=True)
+class PrecheckResult:
+    verdict: str
+    score: float
+    failed_checks: List[str] = field(default_factory=list)
+
+    @property
+    def feedback(self) -> str:
+        return " ".join(CHECK_FEEDBACK[name] for name in self.failed_checks)
+
+
+def _structure_ok(text: str, structure: str) -> bool:
+    bullets = len(BULLET_PATTERN.findall(text))
+    if structure == "bullets":
+        return bullets >= 2
+    if structure == "sections":
+        return len(HEADING_PATTERN.findall(text)) >= 2 or bullets >= 3
+    # Paragraph first, then an optional bullet summary
+    first_line = text.splitlines()[0]
+    return not BULLET_PATTERN.match(first_line) and len(first_line.split()) >= 8
+
+
+def precheck_draft(draft: str, rules: Dict[str, Any]) -> PrecheckResult:
+    """Score a draft against style rules from build_style_rules (1.0 = every check passed)."""
+    text = (draft or "").strip()
+    if not text:
+        return PrecheckResult(FAIL, 0.0, ["non_empty"])
+
+    words = len(text.split())
+    checks = {
+        "word_count": rules.get("min_words", 0) <= words <= rules.get("max_words", 10**6),
+        "structure": _structure_ok(text, rules.get("structure", "sections")),
+    }
+    if rules.get("require_example"):
+        checks["example"] = bool(EXAMPLE_PATTERN.search(text))
+    if rules.get("require_quiz"):
+        checks["quiz"] = bool(QUIZ_PATTERN.search(text))
+
+    failed = [name for name, ok in checks.items() if not ok]
+    score = 1 - len(failed) / len(checks)
+    pass_score = getattr(settings, "AGENT_PRECRITIC_PASS_SCORE", 1.0)
+    if score >= pass_score:
+        verdict = PASS
+    elif score == 0:
+        verdict = FAIL
+    else:
+        verdict = BORDERLINE
+    return PrecheckResult(verdict, score, failed)
+
+
+class PrecriticStats:
+    """Thread-safe counters for skip rate and pre-check/LLM agreement."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checked = 0
+            self.skipped = 0
+            self.borderline = 0
+            self.audited = 0
+            self.agreed = 0
+
+    def record_decision(self, result: PrecheckResult, skipped: bool) -> None:
+        with self._lock:
+            self.checked += 1
+            if skipped:
+                self.skipped += 1
+            elif result.verdict == BORDERLINE:
+                self.borderline += 1
+
+    def record_audit(self, result: PrecheckResult, llm_passed: bool) -> bool:
+        agreed = (result.verdict == PASS) == llm_passed
+        with self._lock:
+            self.audited += 1
+            if agreed:
+                self.agreed += 1
+        return agreed
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "skipped": self.skipped,
+                "borderline": self.borderline,
+                "audited": self.audited,
+                "agreed": self.agreed,
+                "skip_rate": self.skipped / self.checked if self.checked else 0.0,
+                "agreement_rate": self.agreed / self.audited if self.audited else None,
+            }
+
+
+precritic_stats = PrecriticStats()
+
+
+def run_precheck(draft: str, rules: Optional[Dict[str, Any]]) -> Optional[PrecheckResult]:
+    """Pre-check result, or None when disabled or the state carries no style rules."""
+    if not rules or not getattr(settings, "AGENT_PRECRITIC_ENABLED", True):
+        return None
+    return precheck_draft(draft, rules)
+
+
+def should_skip_llm(result: Optional[PrecheckResult]) -> bool:
+    """Decide whether the LLM critic can be skipped, sampling decisive drafts for audit."""
+    if result is None:
+        return False
+    skipped = result.verdict != BORDERLINE and random.random() >= getattr(
+        settings, "AGENT_PRECRITIC_AUDIT_RATE", 0.05
+    )
+    precritic_stats.record_decision(result, skipped)
+    logger.info(
+        "Pre-critic verdict=%s score=%.2f failed=%s llm_critic=%s",
+        result.verdict,
+        result.score,
+        result.failed_checks,
+        "skipped" if skipped else "called",
+    )
+    return skipped
+
+
+def record_llm_verdict(result: Optional[PrecheckResult], llm_passed: bool) -> None:
+    """Log the LLM critic's verdict next to the pre-check for threshold tuning."""
+    if result is None:
+        return
+    if result.verdict == BORDERLINE:
+        logger.info(
+            "Pre-critic borderline score=%.2f llm_passed=%s", result.score, llm_passed
+        )
+        return
+    agreed = precritic_stats.record_audit(result, llm_passed)
+    stats = precritic_stats.snapshot()
+    logger.info(
+        "Pre-critic audit verdict=%s llm_passed=%s agreed=%s agreement_rate=%.2f skip_rate=%.2f",
+        result.verdict,
+        llm_passed,
+        agreed,
+        stats["agreement_rate"],
+        stats["skip_rate"],
+    )
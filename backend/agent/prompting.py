@@ -3,6 +3,53 @@ from __future__ import annotations
 from typing import Any, Dict, List, Tuple
 
 
+# Accepted draft length per verbosity, in words. Wider than the prompted
+# ranges on purpose: drafts outside them are clearly off-style.
+WORD_WINDOWS = {
+    "concise": (10, 160),
+    "balanced": (30, 300),
+    "detailed": (80, 450),
+}
+
+
+def _style_flags(prefs: Dict[str, Any], w: Dict[str, float]) -> Dict[str, bool]:
+    return {
+        "examples": bool(prefs.get("include_examples", True))
+        or (w.get("examples", 0.5) >= 0.5),
+        "analogies": bool(prefs.get("include_analogies", False))
+        or (w.get("analogies", 0.5) >= 0.55),
+        "step_by_step": bool(prefs.get("step_by_step", True))
+        or (w.get("step_by_step", 0.5) >= 0.55),
+        "mnemonic": bool(prefs.get("include_mnemonic", False))
+        or (w.get("mnemonic", 0.5) >= 0.6),
+        "quiz": bool(prefs.get("quiz_at_end", False)) or (w.get("quiz", 0.5) >= 0.6),
+    }
+
+
+def _numeric_weights(weights: Dict[str, Any]) -> Dict[str, float]:
+    return {k: float(v) for k, v in (weights or {}).items() if v is not None}
+
+
+def build_style_rules(
+    preferences: Dict[str, Any], weights: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Machine-checkable subset of build_style_instructions, used to pre-check
+    drafts locally before paying for the LLM critic.
+    """
+    prefs = preferences or {}
+    flags = _style_flags(prefs, _numeric_weights(weights))
+    verbosity = prefs.get("verbosity", "balanced")
+    min_words, max_words = WORD_WINDOWS.get(verbosity, WORD_WINDOWS["balanced"])
+    return {
+        "structure": prefs.get("structure", "sections"),
+        "min_words": min_words,
+        "max_words": max_words,
+        "require_example": flags["examples"],
+        "require_quiz": flags["quiz"],
+    }
+
+
 def build_style_instructions(
     preferences: Dict[str, Any], weights: Dict[str, Any]
 ) -> Tuple[str, List[str]]:
@@ -11,7 +58,7 @@ def build_style_instructions(
     we don't let the LLM invent arbitrary rules. We render from known keys.
     """
     prefs = preferences or {}
-    w = {k: float(v) for k, v in (weights or {}).items() if v is not None}
+    w = _numeric_weights(weights)
 
     features_used: List[str] = []
 
@@ -20,19 +67,12 @@ def build_style_instructions(
     language = prefs.get("language", "en")
     difficulty = prefs.get("difficulty", "auto")
 
-    include_examples = bool(prefs.get("include_examples", True)) or (
-        w.get("examples", 0.5) >= 0.5
-    )
-    include_analogies = bool(prefs.get("include_analogies", False)) or (
-        w.get("analogies", 0.5) >= 0.55
-    )
-    step_by_step = bool(prefs.get("step_by_step", True)) or (
-        w.get("step_by_step", 0.5) >= 0.55
-    )
-    include_mnemonic = bool(prefs.get("include_mnemonic", False)) or (
-        w.get("mnemonic", 0.5) >= 0.6
-    )
-    quiz_at_end = bool(prefs.get("quiz_at_end", False)) or (w.get("quiz", 0.5) >= 0.6)
+    flags = _style_flags(prefs, w)
+    include_examples = flags["examples"]
+    include_analogies = flags["analogies"]
+    step_by_step = flags["step_by_step"]
+    include_mnemonic = flags["mnemonic"]
+    quiz_at_end = flags["quiz"]
 
     if include_examples:
         features_used.append("examples")
@@ -0,0 +1,239 @@
+"""
+Local fast path in front of the LLM guardrail.
+
+Most fronts are plainly benign study prompts ("What is mitosis?"). A regex
+block list and an allowlist of study-question shapes settle clear cases
+in-process:
+
+- a block pattern match is a clear block
+- a short study question or bare term ("What is ...", "Define: ...",
+  "Photosynthesis") with no risk terms and no personal or procedural
+  wording is a clear allow
+- anything else escalates to the LLM; the absence of risk terms alone is
+  not evidence that a front is safe
+
+Study decks legitimately cover war, drugs and disease, so lexicon hits never
+block on their own; they only make the LLM look. Every verdict, local or
+LLM, is memoized by a hash of the normalized front.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+from .cache import TTLCache, _digest, normalize_front
+
+logger = logging.getLogger(__name__)
+
+# High-precision patterns: requests for operational harm, not topics.
+BLOCK_PATTERNS = [
+    (
+        re.compile(
+            r"\b(?:how|steps?|instructions?|guide|recipe)\b.{0,40}\b(?:make|build|assemble|synthesi[sz]e|cook)\b"
+            r".{0,30}\b(?:bomb|pipe bomb|explosives?|nerve agents?|sarin|ricin|vx|meth(?:amphetamine)?)\b",
+            re.IGNORECASE,
+        ),
+        "Instructions for weapons or dangerous substances",
+    ),
+    (
+        re.compile(
+            r"\b(?:child|children|minor|underage|kid)s?\b.{0,40}\b(?:sex(?:ual)?|nude|naked|porn\w*|erotic)\b",
+            re.IGNORECASE,
+        ),
+        "Sexual content involving minors",
+    ),
+    (
+        re.compile(
+            r"\b(?:how|best way|ways?)\b.{0,20}\b(?:to )?(?:kill|hurt|harm) (?:myself|yourself)\b",
+            re.IGNORECASE,
+        ),
+        "Self-harm instructions",
+    ),
+]
+
+# Terms that warrant an LLM look. Weights feed the logged score only. Every
+# noun BLOCK_PATTERNS names is here too: those patterns need procedural
+# wording, so a bare "Sarin synthesis" must still escalate.
+RISK_LEXICON: Dict[str, float] = {
+    "nerve agent": 0.8,
+    "sarin": 0.8,
+    "ricin": 0.8,
+    "vx": 0.8,
+    "meth": 0.6,
+    "methamphetamine": 0.6,
+    "naked": 0.6,
+    "underage": 0.4,
+    "kill": 0.4,
+    "murder": 0.5,
+    "weapon": 0.4,
+    "gun": 0.3,
+    "bomb": 0.6,
+    "explosive": 0.6,
+    "terror": 0.5,
+    "attack": 0.2,
+    "poison": 0.4,
+    "drug": 0.3,
+    "cocaine": 0.4,
+    "heroin": 0.4,
+    "suicide": 0.6,
+    "self-harm": 0.6,
+    "hack": 0.3,
+    "malware": 0.4,
+    "steal": 0.3,
+    "porn": 0.8,
+    "sex": 0.4,
+    "nude": 0.6,
+    "nazi": 0.4,
+    "racist": 0.4,
+    "slur": 0.5,
+    "hate": 0.3,
+    "abuse": 0.4,
+    "ignore previous": 0.5,
+    "ignore all": 0.5,
+    "jailbreak": 0.6,
+    "system prompt": 0.5,
+    "shoot": 0.4,
+    "stab": 0.4,
+    "stalk": 0.4,
+    "fentanyl": 0.4,
+    "molotov": 0.6,
+    "erotic": 0.8,
+    "explicit": 0.4,
+}
+# Short terms that would otherwise match ordinary words ("method", "vxlan")
+_WHOLE_WORD_TERMS = {"meth", "vx"}
+_LEXICON_PATTERN = re.compile(
+    r"\b(?:"
+    + "|".join(
+        re.escape(term) + (r"\b" if term in _WHOLE_WORD_TERMS else r"\w*")
+        for term in sorted(RISK_LEXICON, key=len, reverse=True)
+    )
+    + r")",
+    re.IGNORECASE,
+)
+
+
+def risk_score(text: str) -> float:
+    """Sum of lexicon weights for each distinct risk term in the text."""
+    found = set()
+    for match in _LEXICON_PATTERN.finditer(text):
+        word = match.group(0).lower()
+        found.update(term for term in RISK_LEXICON if word.startswith(term))
+    return round(sum(RISK_LEXICON[term] for term in found), 2)
+
+
+# Positive evidence for a local allow: the shapes flashcard fronts take.
+STUDY_QUESTION = re.compile(
+    r"^(?:"
+    r"(?:what|which|who|when|where|why|how) (?:is|are|was|were|does|do|did)\b"
+    r"|(?:define|definition of|explain|describe|summari[sz]e|compare|contrast|outline)\b"
+    r"|(?:the )?differences? between\b"
+    r")",
+    re.IGNORECASE,
+)
+# A bare term or "Term: detail" front, a handful of words
+BARE_TERM = re.compile(r"^[\w'-]+(?:[ :,/-]+[\w'-]+){0,3}[?.]?$")
+# Personal, procedural or prompt-directed wording sends even a study-shaped front to the LLM
+DISQUALIFIERS = re.compile(
+    r"\b(?:i|me|my|mine|myself|we|us|our|you|your|yourself)\b"
+    r"|\bhow to\b|\bstep[- ]by[- ]step\b|\binstructions?\b|\bwithout (?:getting|being)\b"
+    r"|\bat home\b|\bignore\b|\bpretend\b|\brole-?play\b|\bstory\b|\bprompt\b",
+    re.IGNORECASE,
+)
+
+
+def classify_locally(text: str) -> Tuple[Optional[bool], str]:
+    """
+    Local verdict: (True, reason) clear allow, (False, reason) clear block,
+    (None, reason) ambiguous -> ask the LLM.
+    """
+    for pattern, reason in BLOCK_PATTERNS:
+        if pattern.search(text):
+            return False, f"{reason} (local classifier)."
+
+    score = risk_score(text)
+    if score > 0:
+        return None, f"Risk terms found (score {score})."
+    text = text.strip()
+    if len(text) > getattr(settings, "AGENT_LOCAL_GUARDRAIL_MAX_CHARS", 200):
+        return None, "Long input."
+    if DISQUALIFIERS.search(text):
+        return None, "Personal or procedural wording."
+    if not (STUDY_QUESTION.match(text) or BARE_TERM.match(text)):
+        return None, "Not a recognized study question."
+    return True, "Study question with no risk terms (local classifier)."
+
+
+class GuardrailStats:
+    """How often the local tier or the memo saved an LLM call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = {"memo": 0, "local_allow": 0, "local_block": 0, "llm": 0}
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        return {
+            **counts,
+            "total": total,
+            "llm_rate": counts["llm"] / total if total else 0.0,
+        }
+
+
+guardrail_stats = GuardrailStats()
+
+verdict_memo = TTLCache(
+    "guardrail_verdicts",
+    max_entries=getattr(settings, "AGENT_GUARDRAIL_MEMO_MAX_ENTRIES", 4096),
+    ttl_seconds=getattr(settings, "AGENT_GUARDRAIL_MEMO_TTL_SECONDS", 86400),
+)
+
+
+def _memo_key(text: str) -> str:
+    return _digest(normalize_front(text))
+
+
+def fast_verdict(text: str) -> Optional[Dict[str, object]]:
+    """
+    Memoized or locally decided guardrail verdict in the node's output shape,
+    or None when the LLM has to decide.
+    """
+    key = _memo_key(text)
+    cached = verdict_memo.get(key)
+    if cached is not None:
+        guardrail_stats.record("memo")
+        return dict(cached)
+
+    if not getattr(settings, "AGENT_LOCAL_GUARDRAIL", False):
+        return None
+
+    allowed, reason = classify_locally(text)
+    if allowed is None:
+        logger.debug("Guardrail escalated to LLM: %s", reason)
+        return None
+
+    guardrail_stats.record("local_allow" if allowed else "local_block")
+    verdict = {"is_safe": allowed, "safety_reason": reason}
+    verdict_memo.set(key, verdict)
+    return dict(verdict)
+
+
+def remember_verdict(text: str, verdict: Dict[str, object]) -> None:
+    """Memoize an LLM verdict (fail-open fallbacks are never stored)."""
+    guardrail_stats.record("llm")
+    verdict_memo.set(_memo_key(text), dict(verdict))
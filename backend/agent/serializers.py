@@ -1,8 +1,15 @@
 """Serializers for the agents app."""
 
+from django.conf import settings
 from rest_framework import serializers
 
 
+DEADLINE_HELP = (
+    "Optional time budget in milliseconds (or the X-Agent-Deadline-Ms header). "
+    "Web search, tool calls and the critic are skipped as it runs out."
+)
+
+
 class FlashcardRequestSerializer(serializers.Serializer):
     front = serializers.CharField(
         allow_blank=False, trim_whitespace=True, max_length=2000
@@ -10,6 +17,56 @@ class FlashcardRequestSerializer(serializers.Serializer):
     deck_id = serializers.IntegerField(
         required=True, help_text="The ID of the deck to search documents in."
     )
+    deadline_ms = serializers.IntegerField(
+        required=False, min_value=1, max_value=600_000, help_text=DEADLINE_HELP
+    )
+
+
+class FlashcardJobRequestSerializer(serializers.Serializer):
+    front = serializers.CharField(
+        allow_blank=False, trim_whitespace=True, max_length=2000
+    )
+    deck_id = serializers.IntegerField(
+        required=True, help_text="The ID of the deck to search documents in."
+    )
+    priority = serializers.IntegerField(
+        required=False,
+        default=0,
+        min_value=0,
+        max_value=9,
+        help_text="Higher priorities are picked up first (0-9). Staff only.",
+    )
+
+
+class FlashcardJobSerializer(serializers.Serializer):
+    job_id = serializers.CharField()
+    status = serializers.ChoiceField(
+        choices=["queued", "running", "succeeded", "blocked", "failed"]
+    )
+    priority = serializers.IntegerField()
+    attempts = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
+    finished_at = serializers.DateTimeField(required=False)
+    result = serializers.DictField(
+        required=False,
+        help_text="The backside (succeeded) or the guardrail verdict (blocked).",
+    )
+    error = serializers.CharField(
+        required=False, help_text="Last failure; queued jobs with an error will be retried."
+    )
+
+
+class FlashcardBatchRequestSerializer(serializers.Serializer):
+    fronts = serializers.ListField(
+        child=serializers.CharField(
+            allow_blank=False, trim_whitespace=True, max_length=2000
+        ),
+        min_length=1,
+        max_length=getattr(settings, "AGENT_BATCH_MAX_ITEMS", 50),
+    )
+    deck_id = serializers.IntegerField(
+        required=True, help_text="The ID of the deck to search documents in."
+    )
 
 
 class FlashcardResponseSerializer(serializers.Serializer):
@@ -17,6 +74,10 @@ class FlashcardResponseSerializer(serializers.Serializer):
     back = serializers.CharField()
     tags = serializers.ListField(child=serializers.CharField(), required=False)
     generation_meta = serializers.DictField(required=False)
+    generation_id = serializers.CharField(
+        required=False,
+        help_text="Pass to flashcard/backside/revise/ to resume from this generation.",
+    )
 
 
 class FlashcardRevisionRequestSerializer(serializers.Serializer):
@@ -32,3 +93,14 @@ class FlashcardRevisionRequestSerializer(serializers.Serializer):
     feedback = serializers.CharField(
         allow_blank=False, trim_whitespace=True, max_length=2000
     )
+    generation_id = serializers.CharField(
+        required=False,
+        max_length=64,
+        help_text=(
+            "generation_id of the answer being revised. While its checkpoint is "
+            "retained, the revision reuses its context and guardrail verdict."
+        ),
+    )
+    deadline_ms = serializers.IntegerField(
+        required=False, min_value=1, max_value=600_000, help_text=DEADLINE_HELP
+    )
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from uploads.models import DeckDocument
+
+from .cache import invalidate_deck_profile_context
+
+
+@receiver(post_save, sender=DeckDocument)
+@receiver(post_delete, sender=DeckDocument)
+def deck_documents_changed(sender, instance, **kwargs):
+    # The cached profile context carries has_documents
+    invalidate_deck_profile_context(instance.deck_id)
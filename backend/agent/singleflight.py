@@ -0,0 +1,254 @@
+"""
+Single-flight coalescing of identical in-flight generations.
+
+Double-clicks, client retries and extra tabs send the same front for the same
+user and deck at the same time. Only the first request (the leader) runs the
+graph; duplicates wait for and share its outcome.
+
+- In-process: duplicates wait on the leader's event (threads) or future (asyncio).
+- Cross-process: the leader holds a lock in the Django cache (`cache.add` is
+  atomic) and publishes its outcome there under its lock token; other
+  processes poll for the outcome of the leader whose token they saw, so an
+  earlier run's outcome is never handed to a later request. This
+  needs a shared CACHES backend (database, Redis); with the default
+  local-memory cache it only coordinates within one process.
+
+If a remote leader dies or exceeds AGENT_SINGLEFLIGHT_WAIT_SECONDS, the waiter
+runs the work itself. Leader errors are re-raised to in-process waiters only;
+remote waiters see no outcome and run the work themselves.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import output_passed
+
+logger = logging.getLogger(__name__)
+
+
+def singleflight_enabled() -> bool:
+    return getattr(settings, "AGENT_SINGLEFLIGHT", True)
+
+
+def _cross_process() -> bool:
+    return getattr(settings, "AGENT_SINGLEFLIGHT_CROSS_PROCESS", True)
+
+
+def _wait_seconds() -> float:
+    return getattr(settings, "AGENT_SINGLEFLIGHT_WAIT_SECONDS", 90.0)
+
+
+def _poll_seconds() -> float:
+    return getattr(settings, "AGENT_SINGLEFLIGHT_POLL_SECONDS", 0.1)
+
+
+def _result_ttl() -> float:
+    return getattr(settings, "AGENT_SINGLEFLIGHT_RESULT_TTL_SECONDS", 30)
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key. `do`/`ado` return (result, shared)."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[str, asyncio.Future] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = {"leader": 0, "local_shared": 0, "remote_shared": 0}
+
+    def _record(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self.counts.values())
+            shared = self.counts["local_shared"] + self.counts["remote_shared"]
+            return {**self.counts, "shared_rate": shared / total if total else 0.0}
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.namespace}:lock:{key}"
+
+    def _result_key(self, key: str, token: str) -> str:
+        return f"{self.namespace}:result:{key}:{token}"
+
+    # --- Threads ---
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.event.wait(timeout=_wait_seconds()):
+                if flight.error is not None:
+                    raise flight.error
+                self._record("local_shared")
+                return flight.result, True
+            logger.warning("Single-flight wait timed out for %s; running locally", key)
+            return fn(), False
+
+        try:
+            flight.result, shared = self._lead(key, fn)
+            return flight.result, shared
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _lead(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        if not _cross_process():
+            self._record("leader")
+            return fn(), False
+
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+        acquired = cache.add(lock_key, token, timeout=_wait_seconds())
+        if not acquired:
+            result = self._wait_remote(key)
+            if result is not None:
+                self._record("remote_shared")
+                return result, True
+
+        self._record("leader")
+        try:
+            result = fn()
+            cache.set(self._result_key(key, token), result, timeout=_result_ttl())
+            return result, False
+        finally:
+            if acquired and cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    def _wait_remote(self, key: str) -> Any:
+        lock_key = self._lock_key(key)
+        leader = cache.get(lock_key)
+        if leader is None:
+            # The leader finished between our add and get; its outcome may predate us
+            return None
+        result_key = self._result_key(key, leader)
+        give_up = time.monotonic() + _wait_seconds()
+        while time.monotonic() < give_up:
+            result = cache.get(result_key)
+            if result is not None:
+                return result
+            if cache.get(lock_key) != leader:
+                # Leader finished without publishing (it failed) or expired
+                return cache.get(result_key)
+            time.sleep(_poll_seconds())
+        return None
+
+    # --- asyncio ---
+
+    async def ado(self, key: str, afn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        future = self._async_flights.get(key)
+        if future is not None and not future.done():
+            result = await asyncio.shield(future)
+            self._record("local_shared")
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception retrieved when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._async_flights[key] = future
+        try:
+            result, shared = await self._alead(key, afn)
+            future.set_result(result)
+            return result, shared
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            if self._async_flights.get(key) is future:
+                del self._async_flights[key]
+
+    async def _alead(self, key: str, afn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        if not _cross_process():
+            self._record("leader")
+            return await afn(), False
+
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+        acquired = await cache.aadd(lock_key, token, timeout=_wait_seconds())
+        if not acquired:
+            result = await self._await_remote(key)
+            if result is not None:
+                self._record("remote_shared")
+                return result, True
+
+        self._record("leader")
+        try:
+            result = await afn()
+            await cache.aset(self._result_key(key, token), result, timeout=_result_ttl())
+            return result, False
+        finally:
+            if acquired and await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+
+    async def _await_remote(self, key: str) -> Any:
+        return await sync_to_async(self._wait_remote, thread_sensitive=False)(key)
+
+
+generation_flights = SingleFlight("agent-generation")
+
+
+def generation_flight_key(cache_key: Tuple[Any, ...]) -> str:
+    """
+    Flight key from the response cache key (user, deck, normalized front, style,
+    prompt version).
+    """
+    return "|".join(str(part) for part in cache_key)
+
+
+def generation_outcome(final_state: Dict[str, Any], final_json: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a final graph state the views need; small enough to share via the cache."""
+    return {
+        "is_safe": final_state["is_safe"],
+        "safety_reason": final_state.get("safety_reason", ""),
+        "output_passed": output_passed(final_state),
+        "final_json": final_json,
+    }
+
+
+def coalesce_generation(
+    cache_key: Tuple[Any, ...], deadline: Optional[float], fn: Callable[[], Any]
+) -> Tuple[Any, bool]:
+    # Deadline-bound runs may return degraded answers; they never share one
+    if not singleflight_enabled() or deadline:
+        return fn(), False
+    return generation_flights.do(generation_flight_key(cache_key), fn)
+
+
+async def acoalesce_generation(
+    cache_key: Tuple[Any, ...], deadline: Optional[float], afn: Callable[[], Awaitable[Any]]
+) -> Tuple[Any, bool]:
+    if not singleflight_enabled() or deadline:
+        return await afn(), False
+    return await generation_flights.ado(generation_flight_key(cache_key), afn)
@@ -1,4 +1,4 @@
-from typing import TypedDict, Annotated, List, Dict, Any
+from typing import TypedDict, Annotated, List, Dict, Any, Optional
 import operator
 from langchain_core.messages import BaseMessage
 
@@ -11,13 +11,17 @@ class AgentState(TypedDict):
     front: str
     deck_id: int
     user_id: int
+    deadline: Optional[float]  # Absolute time.time() deadline, None when unbounded
 
     # Context (Injected by ContextBuilder)
     user_preferences: Dict[str, Any]
     user_weights: Dict[str, Any]
     deck_context: str  # e.g., "Biology 101 - Cell Division"
+    has_documents: bool  # Deck has ingested documents; search_deck_documents is only offered then
 
     style_instructions: str
+    prefetched_context: str  # Deck material retrieved up front (empty when none)
+    style_rules: Dict[str, Any]  # Checkable subset of the style, for the pre-critic
     features_used: List[str]
 
     # Internal Logic
@@ -27,6 +31,7 @@ class AgentState(TypedDict):
     critique_count: int  # To prevent infinite reflection loops
 
     generation_meta: Dict[str, Any]
+    node_trace: Annotated[List[Dict[str, Any]], operator.add]  # Filled when AGENT_METRICS_IN_META
     
     # Output Guardrail
     output_passed: bool
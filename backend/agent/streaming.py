@@ -0,0 +1,310 @@
+"""Server-sent events for streamed backside generation."""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from .checkpoints import CHECKPOINT_DURABILITY, generation_config
+from .llm_graph import FINAL_ANSWER_MARKER
+
+logger = logging.getLogger(__name__)
+
+# Graph nodes whose LLM output is the user-visible answer
+ANSWER_NODES = {"agent"}
+# Speculative agent step: its answer is held back until the guardrail verdict
+# arrives with the node's update, then sent if safe and dropped if blocked
+GUARDED_ANSWER_NODES = {"guarded_agent"}
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept `Accept: text/event-stream`; streamed
+    bodies bypass rendering, so this only encodes early JSON errors.
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False, default=str).encode(self.charset)
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_response(events: Union[Iterable[str], AsyncIterable[str]]) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx-style proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def chunk_text(message: Any) -> str:
+    """Text of a streamed message chunk (Gemini may return a list of content parts)."""
+    content = getattr(message, "content", message)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else str(part.get("text", ""))
+            for part in content
+            if isinstance(part, (str, dict))
+        )
+    return ""
+
+
+class AnswerTokenFilter:
+    """
+    Forwards only the user-visible part of streamed agent output: the text after
+    FINAL_ANSWER_MARKER. Reasoning before the marker and tool-calling turns are
+    never emitted. Tracked per message id because the agent may answer again
+    after critic feedback; `replaces_answer` tells the caller when that
+    happens so the client can discard the earlier answer.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[str, str] = {}
+        self._sent: Dict[str, int] = {}
+        self._held: list = []
+        self._held_id: Optional[str] = None
+        self._shown: Optional[str] = None
+
+    def hold(self, message_id: str, text: str) -> None:
+        self._held_id = message_id
+        self._held.append(text)
+
+    def release(self) -> Tuple[Optional[str], str]:
+        """Held message id and text, cleared; the caller drops them when the verdict was unsafe."""
+        text = "".join(self._held)
+        self._held.clear()
+        return self._held_id, text
+
+    def replaces_answer(self, message_id: Optional[str]) -> bool:
+        """Record that message_id is being sent; True if another answer was sent before it."""
+        previous, self._shown = self._shown, message_id
+        return previous is not None and previous != message_id
+
+    def feed(self, message_id: str, text: str) -> str:
+        buffer = self._buffers.get(message_id, "") + text
+        self._buffers[message_id] = buffer
+        idx = buffer.find(FINAL_ANSWER_MARKER)
+        if idx < 0:
+            return ""
+        visible = buffer[idx + len(FINAL_ANSWER_MARKER):].lstrip()
+        sent = self._sent.get(message_id, 0)
+        self._sent[message_id] = len(visible)
+        return visible[sent:]
+
+
+def _progress_event(node: str, update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if node in ("guardrail", "guarded_agent") and "is_safe" in update:
+        event = {
+            "stage": "guardrail",
+            "status": "passed" if update["is_safe"] else "blocked",
+        }
+        if node == "guardrail":
+            return event
+        # Speculative mode reports the verdict, any prefetch and the agent step together
+        if "prefetched_context" in update:
+            event["retrieve"] = "found" if update["prefetched_context"] else "empty"
+        tool_calls = _requested_tools(update)
+        if tool_calls:
+            event["tools"] = tool_calls
+        return event
+    if node == "agent":
+        tool_calls = _requested_tools(update)
+        if tool_calls:
+            return {"stage": "tools", "status": "called", "tools": tool_calls}
+        return {"stage": "agent", "status": "answered"}
+    if node == "retrieve":
+        return {
+            "stage": "retrieve",
+            "status": "found" if update.get("prefetched_context") else "empty",
+        }
+    if node == "retrieval_join":
+        return None
+    if node == "critic":
+        return {
+            "stage": "critic",
+            "status": "revise" if update.get("messages") else "pass",
+        }
+    return {"stage": node, "status": "done"}
+
+
+def _requested_tools(update: Dict[str, Any]) -> list:
+    messages = update.get("messages") or []
+    if not messages:
+        return []
+    return [call.get("name") for call in getattr(messages[-1], "tool_calls", None) or []]
+
+
+STREAM_MODES = ["updates", "messages", "values"]
+
+
+def _chunk_events(mode: str, chunk: Any, answer_filter: AnswerTokenFilter) -> Iterator[str]:
+    if mode == "updates":
+        for node, update in chunk.items():
+            update = update or {}
+            event = _progress_event(node, update)
+            if event:
+                yield sse_event("progress", event)
+            if node in GUARDED_ANSWER_NODES and "is_safe" in update:
+                message_id, held = answer_filter.release()
+                if update["is_safe"] and held:
+                    yield from _answer_events(answer_filter, message_id, held)
+    elif mode == "messages":
+        message, metadata = chunk
+        node = metadata.get("langgraph_node")
+        if node not in ANSWER_NODES and node not in GUARDED_ANSWER_NODES:
+            return
+        message_id = str(getattr(message, "id", ""))
+        delta = answer_filter.feed(message_id, chunk_text(message))
+        if not delta:
+            return
+        if node in GUARDED_ANSWER_NODES:
+            answer_filter.hold(message_id, delta)
+        else:
+            yield from _answer_events(answer_filter, message_id, delta)
+
+
+def _answer_events(
+    answer_filter: AnswerTokenFilter, message_id: Optional[str], text: str
+) -> Iterator[str]:
+    if answer_filter.replaces_answer(message_id):
+        # The agent answers again after critic feedback; tokens so far are stale
+        yield sse_event("reset", {"reason": "revise"})
+    yield sse_event("token", {"text": text})
+
+
+def _final_events(
+    final_state: Dict[str, Any],
+    on_complete: Optional[Callable[[Dict[str, Any]], Any]],
+    generation_id: Optional[str] = None,
+) -> Iterator[str]:
+    if not final_state.get("is_safe", True):
+        yield sse_event(
+            "blocked",
+            {"error": "Content Blocked", "reason": final_state.get("safety_reason", "")},
+        )
+        return
+
+    if on_complete is not None:
+        on_complete(final_state)
+    payload = final_state.get("final_json", {})
+    if generation_id is not None:
+        payload = {**payload, "generation_id": generation_id}
+    yield sse_event("done", payload)
+
+
+def stream_generation_events(
+    graph,
+    initial_state: Dict[str, Any],
+    *,
+    on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+    generation_id: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Run the graph and yield SSE frames:
+
+    - `progress`: one per finished node (guardrail passed/blocked, tools called, critic pass/revise)
+    - `token`: answer text as the agent streams it
+    - `reset`: the agent is answering again after critic feedback; discard the
+      tokens received so far (the following tokens are the revised answer)
+    - `done`: the same payload the JSON endpoint returns
+    - `blocked` / `error`: terminal failures
+
+    With `generation_id` the run is checkpointed on that thread and the id is
+    added to the `done` payload.
+    """
+    final_state: Dict[str, Any] = {}
+    answer_filter = AnswerTokenFilter()
+    options: Dict[str, Any] = {}
+    if generation_id is not None:
+        options = {
+            "config": generation_config(generation_id),
+            "durability": CHECKPOINT_DURABILITY,
+        }
+    try:
+        for mode, chunk in graph.stream(initial_state, stream_mode=STREAM_MODES, **options):
+            if mode == "values":
+                final_state = chunk
+            else:
+                yield from _chunk_events(mode, chunk, answer_filter)
+    except Exception as exc:
+        logger.warning("Streamed generation failed: %s", exc)
+        yield sse_event("error", {"error": "Agent Failed", "details": str(exc)})
+        return
+
+    yield from _final_events(final_state, on_complete, generation_id)
+
+
+async def astream_generation_events(
+    graph,
+    initial_state: Dict[str, Any],
+    *,
+    on_complete: Optional[Callable[[Dict[str, Any]], Any]] = None,
+) -> AsyncIterator[str]:
+    """Async twin of `stream_generation_events` for graphs built with async nodes."""
+    final_state: Dict[str, Any] = {}
+    answer_filter = AnswerTokenFilter()
+    try:
+        async for mode, chunk in graph.astream(initial_state, stream_mode=STREAM_MODES):
+            if mode == "values":
+                final_state = chunk
+            else:
+                for frame in _chunk_events(mode, chunk, answer_filter):
+                    yield frame
+    except Exception as exc:
+        logger.warning("Streamed generation failed: %s", exc)
+        yield sse_event("error", {"error": "Agent Failed", "details": str(exc)})
+        return
+
+    for frame in _final_events(final_state, on_complete):
+        yield frame
+
+
+def stream_chain_events(
+    chain,
+    inputs: Dict[str, Any],
+    *,
+    on_complete: Optional[Callable[[str], Dict[str, Any]]] = None,
+) -> Iterator[str]:
+    """
+    Stream a plain prompt | llm chain: `token` frames as text arrives, then `done`
+    with the payload returned by `on_complete(full_text)`.
+    """
+    parts = []
+    try:
+        for message in chain.stream(inputs):
+            text = chunk_text(message)
+            if text:
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+        payload = on_complete("".join(parts)) if on_complete else {"back": "".join(parts)}
+    except Exception as exc:
+        logger.warning("Streamed generation failed: %s", exc)
+        yield sse_event("error", {"error": "Generation Failed", "details": str(exc)})
+        return
+    yield sse_event("done", payload)
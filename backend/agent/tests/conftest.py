@@ -12,6 +12,38 @@ from cards.models import Deck
 from accounts.models import UserProfile
 
 
+@pytest.fixture(autouse=True)
+def clear_agent_caches():
+    """Keep in-process agent caches from leaking between tests."""
+    from django.core.cache import cache
+    from agent.cache import (
+        profile_context_cache,
+        response_cache,
+        web_search_cache,
+    )
+    from common.breakers import reset_breakers
+    from agent.precritic import precritic_stats
+    from agent.safety import guardrail_stats, verdict_memo
+    from agent.singleflight import generation_flights
+
+    response_cache.clear()
+    profile_context_cache.clear()
+    web_search_cache.clear()
+    verdict_memo.clear()
+    cache.clear()
+    precritic_stats.reset()
+    guardrail_stats.reset()
+    generation_flights.reset()
+    reset_breakers()
+    yield
+    response_cache.clear()
+    profile_context_cache.clear()
+    web_search_cache.clear()
+    verdict_memo.clear()
+    cache.clear()
+    reset_breakers()
+
+
 @pytest.fixture
 def test_user(db):
     """Create a test user."""
@@ -0,0 +1,149 @@
+"""
+Tests for the native async backside endpoints.
+"""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from django.test import AsyncClient
+from langchain_core.messages import AIMessageChunk
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from agent.streaming import astream_generation_events
+
+
+FINAL_STATE = {
+    "is_safe": True,
+    "safety_reason": "ok",
+    "output_passed": True,
+    "final_json": {
+        "front": "What is mitosis?",
+        "back": "Mitosis is cell division.",
+        "tags": [],
+        "generation_meta": {},
+    },
+}
+
+
+@pytest.fixture
+def bearer(test_user):
+    return {"Authorization": f"Bearer {RefreshToken.for_user(test_user).access_token}"}
+
+
+async def _post(url, payload, **headers):
+    return await AsyncClient().post(
+        url, json.dumps(payload), content_type="application/json", headers=headers
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestFlashcardBacksideAsyncView:
+    """Tests for flashcard/backside/async/."""
+
+    url = "/api/agent/flashcard/backside/async/"
+
+    async def test_requires_authentication(self, test_deck):
+        response = await _post(self.url, {"front": "Q", "deck_id": test_deck.id})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_rejects_get(self, bearer):
+        response = await AsyncClient().get(self.url, headers=bearer)
+        assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+
+    async def test_requires_front_field(self, bearer, test_deck):
+        response = await _post(self.url, {"deck_id": test_deck.id}, **bearer)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    async def test_deck_must_belong_to_user(self, bearer):
+        response = await _post(self.url, {"front": "Q", "deck_id": 99999}, **bearer)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @patch("agent.async_views.async_app.ainvoke", new_callable=AsyncMock)
+    async def test_generates_and_caches(self, mock_ainvoke, bearer, test_deck):
+        mock_ainvoke.return_value = FINAL_STATE
+        payload = {"front": "What is mitosis?", "deck_id": test_deck.id}
+
+        first = await _post(self.url, payload, **bearer)
+        second = await _post(self.url, payload, **bearer)
+
+        assert first.status_code == status.HTTP_200_OK
+        assert first.json()["back"] == "Mitosis is cell division."
+        assert first["X-Agent-Cache"] == "miss"
+        assert second["X-Agent-Cache"] == "hit"
+        assert mock_ainvoke.await_count == 1
+
+    @patch("agent.async_views.async_app.ainvoke", new_callable=AsyncMock)
+    async def test_blocked_content_returns_400(self, mock_ainvoke, bearer, test_deck):
+        mock_ainvoke.return_value = {"is_safe": False, "safety_reason": "Unsafe"}
+
+        response = await _post(self.url, {"front": "bad", "deck_id": test_deck.id}, **bearer)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["error"] == "Content Blocked"
+
+    @patch("agent.async_views.async_app.ainvoke", new_callable=AsyncMock)
+    async def test_agent_failure_returns_500(self, mock_ainvoke, bearer, test_deck):
+        mock_ainvoke.side_effect = RuntimeError("LLM down")
+
+        response = await _post(self.url, {"front": "Q", "deck_id": test_deck.id}, **bearer)
+
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert response.json()["details"] == "LLM down"
+
+
+async def _fake_astream(*_args, **_kwargs):
+    yield ("updates", {"guardrail": {"is_safe": True, "safety_reason": "ok"}})
+    yield (
+        "messages",
+        (AIMessageChunk(content="FINAL ANSWER: Mitosis", id="run-1"), {"langgraph_node": "agent"}),
+    )
+    yield ("values", FINAL_STATE)
+
+
+class TestAstreamGenerationEvents:
+    """Tests for the async SSE generator."""
+
+    async def test_yields_progress_tokens_and_done(self):
+        graph = AsyncMock()
+        graph.astream = _fake_astream
+
+        frames = [frame async for frame in astream_generation_events(graph, {})]
+
+        names = [frame.split("\n", 1)[0] for frame in frames]
+        assert names == ["event: progress", "event: token", "event: done"]
+
+    async def test_reports_errors(self):
+        async def failing(*_args, **_kwargs):
+            raise RuntimeError("LLM down")
+            yield
+
+        graph = AsyncMock()
+        graph.astream = failing
+
+        frames = [frame async for frame in astream_generation_events(graph, {})]
+
+        assert frames[0].startswith("event: error")
+
+
+@pytest.mark.django_db(transaction=True)
+class TestFlashcardBacksideAsyncStreamView:
+    """Tests for flashcard/backside/async/stream/."""
+
+    url = "/api/agent/flashcard/backside/async/stream/"
+
+    @patch("agent.async_views.async_app.astream")
+    async def test_streams_events(self, mock_astream, bearer, test_deck):
+        mock_astream.side_effect = _fake_astream
+
+        response = await _post(
+            self.url, {"front": "What is mitosis?", "deck_id": test_deck.id}, **bearer
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/event-stream"
+        body = "".join(
+            [chunk.decode() async for chunk in response.streaming_content]
+        )
+        assert body.rstrip().split("\n\n")[-1].startswith("event: done")
@@ -0,0 +1,177 @@
+"""
+Tests for batch backside generation.
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from agent.batch import iter_batch_results, run_batch
+from agent.llm_graph import build_workflow, context_builder_node
+
+
+def _fake_invoke(state):
+    front = state["front"]
+    if front == "boom":
+        raise RuntimeError("LLM down")
+    if front == "bad":
+        return {"is_safe": False, "safety_reason": "Unsafe"}
+    return {
+        "is_safe": True,
+        "output_passed": True,
+        "final_json": {
+            "front": front,
+            "back": f"Back of {front}",
+            "tags": [],
+            "generation_meta": state["generation_meta"],
+        },
+    }
+
+
+def _parse_events(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.django_db
+class TestRunBatch:
+    """Tests for run_batch / iter_batch_results."""
+
+    @patch("agent.llm_graph.batch_app.invoke")
+    def test_context_built_once(self, mock_invoke, test_user_with_profile, test_deck):
+        """Profile and deck context should be loaded once for the whole batch."""
+        mock_invoke.side_effect = _fake_invoke
+
+        with patch("agent.batch.context_builder_node", wraps=context_builder_node) as spy:
+            run_batch(["a", "b", "c"], deck_id=test_deck.id, user_id=test_user_with_profile.id)
+
+        spy.assert_called_once()
+        states = [call.args[0] for call in mock_invoke.call_args_list]
+        assert {s["front"] for s in states} == {"a", "b", "c"}
+        assert all(s["deck_context"] == test_deck.name for s in states)
+        assert all(s["style_instructions"] for s in states)
+
+    @patch("agent.llm_graph.batch_app.invoke")
+    def test_partial_failures(self, mock_invoke, test_user, test_deck):
+        """One failing or blocked front should not fail the others."""
+        mock_invoke.side_effect = _fake_invoke
+
+        payload = run_batch(["ok", "boom", "bad"], deck_id=test_deck.id, user_id=test_user.id)
+
+        assert [r["status"] for r in payload["results"]] == ["ok", "error", "blocked"]
+        assert payload["results"][1]["details"] == "LLM down"
+        assert payload["summary"] == {"total": 3, "succeeded": 1, "blocked": 1, "failed": 1}
+
+    @patch("agent.llm_graph.batch_app.invoke")
+    def test_items_do_not_share_generation_meta(self, mock_invoke, test_user, test_deck):
+        mock_invoke.side_effect = _fake_invoke
+
+        payload = run_batch(["a", "b"], deck_id=test_deck.id, user_id=test_user.id)
+
+        metas = [r["result"]["generation_meta"] for r in payload["results"]]
+        assert metas[0] == metas[1]
+        assert metas[0] is not metas[1]
+
+    @patch("agent.llm_graph.batch_app.invoke")
+    def test_uses_response_cache(self, mock_invoke, test_user, test_deck):
+        """Repeated fronts are served from the response cache."""
+        mock_invoke.side_effect = _fake_invoke
+
+        run_batch(["a"], deck_id=test_deck.id, user_id=test_user.id)
+        payload = run_batch(["a"], deck_id=test_deck.id, user_id=test_user.id)
+
+        assert payload["results"][0]["cached"] is True
+        assert mock_invoke.call_count == 1
+
+    @patch("agent.llm_graph.batch_app.invoke")
+    def test_bounded_workers(self, mock_invoke, test_user, test_deck):
+        mock_invoke.side_effect = _fake_invoke
+
+        with patch("agent.batch.ThreadPoolExecutor") as mock_pool:
+            mock_pool.return_value.submit.return_value.result.return_value = {}
+            with patch("agent.batch.as_completed", side_effect=lambda fs: fs):
+                list(
+                    iter_batch_results(
+                        ["a"] * 10, deck_id=test_deck.id, user_id=test_user.id, max_workers=3
+                    )
+                )
+
+        assert mock_pool.call_args[0][0] == 3
+
+    @patch("agent.batch.close_old_connections")
+    @patch("agent.llm_graph.batch_app.invoke")
+    def test_pool_threads_close_their_connections(
+        self, mock_invoke, mock_close, test_user, test_deck
+    ):
+        """Each item closes the DB connection of its pool thread, even when it fails."""
+        mock_invoke.side_effect = _fake_invoke
+
+        run_batch(["ok", "boom", "bad"], deck_id=test_deck.id, user_id=test_user.id)
+
+        assert mock_close.call_count == 3
+
+    def test_batch_graph_skips_context_builder(self):
+        nodes = set(build_workflow(prebuilt_context=True).compile().get_graph().nodes)
+        assert "context_builder" not in nodes
+        assert "guardrail" in nodes
+
+
+@pytest.mark.django_db
+class TestFlashcardBatchView:
+    """Tests for the batch endpoints."""
+
+    url = "/api/agent/flashcard/backside/batch/"
+
+    def test_requires_authentication(self, test_deck):
+        response = APIClient().post(
+            self.url, {"fronts": ["Q"], "deck_id": test_deck.id}, format="json"
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_requires_fronts(self, authenticated_client, test_deck):
+        response = authenticated_client.post(
+            self.url, {"fronts": [], "deck_id": test_deck.id}, format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_invalid_deck_returns_404(self, authenticated_client):
+        response = authenticated_client.post(
+            self.url, {"fronts": ["Q"], "deck_id": 99999}, format="json"
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @patch("agent.llm_graph.batch_app.invoke")
+    def test_returns_results_in_request_order(self, mock_invoke, authenticated_client, test_deck):
+        mock_invoke.side_effect = _fake_invoke
+
+        response = authenticated_client.post(
+            self.url, {"fronts": ["a", "boom", "c"], "deck_id": test_deck.id}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert [r["front"] for r in data["results"]] == ["a", "boom", "c"]
+        assert data["summary"]["failed"] == 1
+
+    @patch("agent.llm_graph.batch_app.invoke")
+    def test_stream_emits_items_then_done(self, mock_invoke, authenticated_client, test_deck):
+        mock_invoke.side_effect = _fake_invoke
+
+        response = authenticated_client.post(
+            self.url + "stream/",
+            {"fronts": ["a", "bad"], "deck_id": test_deck.id},
+            format="json",
+            HTTP_ACCEPT="text/event-stream",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        events = _parse_events(b"".join(response.streaming_content).decode())
+        assert [name for name, _ in events] == ["item", "item", "done"]
+        assert {data["index"] for _, data in events[:2]} == {0, 1}
+        assert events[-1][1]["summary"]["blocked"] == 1
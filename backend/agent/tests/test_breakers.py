@@ -0,0 +1,251 @@
+"""
+Tests for the circuit breakers around Gemini, Supabase and Tavily.
+"""
+
+import time
+
+import pytest
+from unittest.mock import MagicMock, patch
+from rest_framework.test import APIClient
+
+from common.breakers import CircuitBreaker, CircuitOpenError, breaker_stats, get_breaker
+
+
+@pytest.fixture
+def breaker(settings):
+    settings.AGENT_BREAKER_MIN_CALLS = 4
+    settings.AGENT_BREAKER_FAILURE_RATE = 0.5
+    settings.AGENT_BREAKER_OPEN_SECONDS = 30
+    return CircuitBreaker("test")
+
+
+def _fail(breaker, times=1):
+    for _ in range(times):
+        with pytest.raises(ConnectionError):
+            with breaker.guard():
+                raise ConnectionError("reset")
+
+
+def _succeed(breaker, times=1):
+    for _ in range(times):
+        with breaker.guard():
+            pass
+
+
+class TestCircuitBreaker:
+    def test_stays_closed_below_min_calls(self, breaker):
+        _fail(breaker, 3)
+
+        assert breaker.state == "closed"
+
+    def test_opens_at_failure_rate_and_fails_fast(self, breaker):
+        _succeed(breaker, 2)
+        _fail(breaker, 2)
+
+        assert breaker.state == "open"
+        assert not breaker.available()
+        started = time.monotonic()
+        with pytest.raises(CircuitOpenError):
+            with breaker.guard():
+                time.sleep(1)
+        assert time.monotonic() - started < 0.1
+        assert breaker.stats()["rejected"] == 1
+
+    def test_healthy_rate_keeps_it_closed(self, breaker):
+        _succeed(breaker, 3)
+        _fail(breaker, 1)
+
+        assert breaker.state == "closed"
+
+    def test_error_values_and_slow_calls_count_as_failures(self, breaker, settings):
+        settings.AGENT_BREAKER_SLOW_CALL_SECONDS = 0.01
+        for _ in range(2):
+            with breaker.guard() as call:
+                call.failed()
+        for _ in range(2):
+            with breaker.guard():
+                time.sleep(0.02)
+
+        assert breaker.state == "open"
+
+    def test_half_open_probe_closes_or_reopens(self, breaker, settings):
+        _fail(breaker, 4)
+        settings.AGENT_BREAKER_OPEN_SECONDS = 0
+
+        assert breaker.state == "half_open"
+        _fail(breaker)
+        assert breaker.stats()["opened"] == 2
+
+        with breaker.guard():
+            # Only one probe at a time
+            with pytest.raises(CircuitOpenError):
+                breaker.admit()
+        assert breaker.state == "closed"
+
+    def test_overrides_per_breaker(self, breaker, settings):
+        settings.AGENT_BREAKER_OVERRIDES = {"test": {"min_calls": 1}}
+
+        _fail(breaker)
+
+        assert breaker.state == "open"
+
+    def test_disabled(self, breaker, settings):
+        settings.AGENT_BREAKERS_ENABLED = False
+
+        _fail(breaker, 10)
+
+        assert breaker.available()
+
+    def test_registry(self):
+        assert get_breaker("supabase") is get_breaker("supabase")
+        assert {"supabase", "gemini_embeddings", "tavily"} <= set(breaker_stats())
+
+
+class TestGuardedServices:
+    def test_open_tavily_breaker_skips_the_call(self):
+        from agent.tools import web_search_available, web_search_tool
+
+        tavily = get_breaker("tavily")
+        with patch("langchain_community.tools.tavily_search.TavilySearchResults.invoke") as mock:
+            mock.return_value = "HTTPError('503 Service Unavailable')"
+            for query in ("a", "b", "c", "d", "e"):
+                web_search_tool.invoke({"query": query})
+
+            assert tavily.state == "open"
+            assert not web_search_available()
+            assert web_search_tool.invoke({"query": "f"}) == "[Web search unavailable]"
+            assert mock.call_count == 5
+
+    @pytest.mark.django_db
+    @patch("uploads.services.document_ingestion._build_supabase_client")
+    @patch("agent.tools._build_embedding_model")
+    def test_open_supabase_breaker_fails_fast(self, mock_embed, mock_client):
+        from agent.tools import deck_search_available, search_deck_documents
+
+        mock_embed.return_value.embed_query.return_value = [0.1, 0.2]
+        mock_client.return_value.rpc.return_value.execute.side_effect = ConnectionError("down")
+        for _ in range(5):
+            search_deck_documents.invoke({"query": "mitosis", "deck_id": 1})
+
+        assert not deck_search_available()
+        result = search_deck_documents.invoke({"query": "mitosis", "deck_id": 1})
+        assert result == "[Document search unavailable]"
+        assert mock_client.return_value.rpc.return_value.execute.call_count == 5
+
+    def test_chat_model_breaker_aborts_before_the_request(self, settings):
+        from langchain_core.language_models import FakeListChatModel
+
+        from agent.llm_routing import BreakerCallbackHandler
+
+        settings.AGENT_BREAKER_MIN_CALLS = 1
+        chat = get_breaker("gemini:fake")
+        model = FakeListChatModel(
+            responses=["ok"], callbacks=[BreakerCallbackHandler(chat)]
+        )
+        assert model.invoke("hi").content == "ok"
+
+        failing = MagicMock(side_effect=RuntimeError("500"))
+        with patch.object(FakeListChatModel, "_call", failing):
+            with pytest.raises(RuntimeError):
+                model.invoke("hi")
+            assert chat.state == "open"
+            with pytest.raises(CircuitOpenError):
+                model.invoke("hi")
+        assert failing.call_count == 1
+
+    def test_open_primary_goes_straight_to_the_fallback(self, settings):
+        from langchain_core.language_models import FakeListChatModel
+
+        from agent.llm_routing import BreakerCallbackHandler
+
+        settings.AGENT_BREAKER_MIN_CALLS = 1
+        primary_breaker = get_breaker("gemini:primary")
+        _fail(primary_breaker)
+        primary = FakeListChatModel(
+            responses=["primary"], callbacks=[BreakerCallbackHandler(primary_breaker)]
+        )
+        model = primary.with_fallbacks([FakeListChatModel(responses=["fallback"])])
+
+        assert model.invoke("hi").content == "fallback"
+
+
+class TestAgentSeesBreakers:
+    @patch("agent.llm_graph.llm_with_tools")
+    @patch("agent.llm_graph.llm_deck_only")
+    def test_web_search_unbound_while_tavily_is_open(self, mock_deck_only, mock_with_tools):
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        from agent.llm_graph import agent_node
+
+        tavily = get_breaker("tavily")
+        for _ in range(5):
+            with tavily.guard() as call:
+                call.failed()
+        mock_deck_only.invoke.return_value = AIMessage(content="FINAL ANSWER: x")
+
+        agent_node(
+            {
+                "messages": [HumanMessage(content="What is mitosis?")],
+                "front": "What is mitosis?",
+                "deck_id": 1,
+                "deck_context": "",
+                "style_instructions": "",
+                "generation_meta": {},
+            }
+        )
+
+        mock_with_tools.invoke.assert_not_called()
+        mock_deck_only.invoke.assert_called_once()
+
+    @patch("agent.llm_graph.llm_answer_only")
+    def test_no_tools_when_every_breaker_is_open(self, mock_answer_only):
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        from agent.llm_graph import agent_node
+
+        for name in ("tavily", "gemini_embeddings"):
+            breaker = get_breaker(name)
+            for _ in range(5):
+                with breaker.guard() as call:
+                    call.failed()
+        mock_answer_only.invoke.return_value = AIMessage(content="FINAL ANSWER: x")
+
+        result = agent_node(
+            {
+                "messages": [HumanMessage(content="What is mitosis?")],
+                "front": "What is mitosis?",
+                "deck_id": 1,
+                "deck_context": "",
+                "style_instructions": "",
+                "generation_meta": {},
+            }
+        )
+
+        system = mock_answer_only.invoke.call_args[0][0][0].content
+        assert "Deck search is unavailable right now" in system
+        assert "web_search_tool" not in system
+        assert "skipped_stages" not in result["generation_meta"]
+
+
+@pytest.mark.django_db
+class TestHealthEndpoint:
+    def test_reports_breaker_state_without_auth(self):
+        api_client = APIClient()
+        response = api_client.get("/api/agent/health/")
+
+        assert response.status_code == 200
+        assert response.data["status"] == "ok"
+        assert response.data["breakers"]["supabase"]["state"] == "closed"
+
+    def test_degraded_while_a_breaker_is_open(self):
+        api_client = APIClient()
+        tavily = get_breaker("tavily")
+        for _ in range(5):
+            with tavily.guard() as call:
+                call.failed()
+
+        response = api_client.get("/api/agent/health/")
+
+        assert response.data["status"] == "degraded"
+        assert response.data["breakers"]["tavily"]["state"] == "open"
+        assert response.data["breakers"]["tavily"]["retry_in_seconds"] > 0
@@ -0,0 +1,207 @@
+"""
+Tests for the in-process agent caches.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from agent.cache import (
+    invalidate_deck_responses,
+    normalize_front,
+    response_cache,
+    response_cache_key,
+)
+from common.cache import TTLCache
+
+
+class TestTTLCache:
+    """Test suite for the generic LRU/TTL cache."""
+
+    def test_get_and_set(self):
+        cache = TTLCache("test", max_entries=2)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("missing") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache("test", max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now the LRU entry
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire_after_ttl(self):
+        cache = TTLCache("test", max_entries=2, ttl_seconds=10)
+        with patch("common.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("common.cache.time.monotonic", return_value=105.0):
+            assert cache.get("a") == 1
+        with patch("common.cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_zero_capacity_disables_cache(self):
+        cache = TTLCache("test", max_entries=0)
+        cache.set("a", 1)
+
+        assert not cache.enabled
+        assert cache.get("a") is None
+
+    def test_invalidate_by_predicate(self):
+        cache = TTLCache("test", max_entries=10)
+        cache.set(("x", 1), "one")
+        cache.set(("x", 2), "two")
+
+        removed = cache.invalidate(lambda key: key[1] == 1)
+
+        assert removed == 1
+        assert cache.get(("x", 2)) == "two"
+
+
+class TestResponseCacheKeys:
+    """Test suite for response cache key construction."""
+
+    def test_normalize_front_ignores_case_spacing_and_punctuation(self):
+        assert normalize_front("  What is   Mitosis? ") == "what is mitosis"
+        assert normalize_front("what is mitosis") == "what is mitosis"
+
+    def test_key_depends_on_style_and_prompt_version(self):
+        base = dict(user_id=1, deck_id=2, front="DNA", style_instructions="a", prompt_version="v1")
+
+        assert response_cache_key(**base) == response_cache_key(**{**base, "front": "dna?"})
+        assert response_cache_key(**base) != response_cache_key(**{**base, "style_instructions": "b"})
+        assert response_cache_key(**base) != response_cache_key(**{**base, "prompt_version": "v2"})
+
+    def test_invalidate_deck_responses(self):
+        key_a = response_cache_key(user_id=1, deck_id=2, front="a", style_instructions="", prompt_version="v1")
+        key_b = response_cache_key(user_id=1, deck_id=3, front="a", style_instructions="", prompt_version="v1")
+        response_cache.set(key_a, {"back": "A"})
+        response_cache.set(key_b, {"back": "B"})
+
+        assert invalidate_deck_responses(2) == 1
+        assert response_cache.get(key_a) is None
+        assert response_cache.get(key_b) == {"back": "B"}
+
+    def test_deck_change_in_another_process_changes_the_key(self):
+        from django.core.cache import cache
+
+        from agent.cache import deck_context_version
+
+        base = dict(user_id=1, deck_id=2, front="a", style_instructions="", prompt_version="v1")
+        before = response_cache_key(**base)
+        response_cache.set(before, {"back": "old"})
+        # What invalidate_deck_responses leaves in the shared cache for other workers
+        cache.set("agent:deck_context_version:2", deck_context_version(2) + 1)
+
+        after = response_cache_key(**base)
+        assert after != before
+        assert response_cache.get(after) is None
+
+
+@pytest.mark.django_db
+class TestProfileContextCache:
+    """context_builder_node output is cached per (user, deck) until the profile changes."""
+
+    def _state(self, user, deck):
+        return {"user_id": user.id, "deck_id": deck.id}
+
+    def test_warm_cache_runs_one_version_query(self, test_user_with_profile, test_deck, django_assert_num_queries):
+        from agent.llm_graph import context_builder_node
+
+        first = context_builder_node(self._state(test_user_with_profile, test_deck))
+        with django_assert_num_queries(1):
+            second = context_builder_node(self._state(test_user_with_profile, test_deck))
+
+        assert second == first
+        assert second["deck_context"] == "Biology 101 - Cell Division"
+
+    def test_preferences_patch_invalidates(self, test_user, test_deck, authenticated_client):
+        from agent.llm_graph import load_profile_context
+
+        before = load_profile_context(test_user.id, test_deck.id)
+        authenticated_client.patch(
+            "/api/auth/preferences/", {"preferences": {"include_analogies": True}}, format="json"
+        )
+        after = load_profile_context(test_user.id, test_deck.id)
+
+        assert after["user_preferences"]["include_analogies"] is True
+        assert after["style_instructions"] != before["style_instructions"]
+
+    def test_weight_updates_invalidate(self, test_user_with_profile, test_deck):
+        from accounts.models import UserProfile
+        from accounts.services.preferences import apply_weight_patch, update_profile_from_review
+        from agent.llm_graph import load_profile_context
+
+        def examples_weight():
+            return load_profile_context(test_user_with_profile.id, test_deck.id)["user_weights"][
+                "examples"
+            ]
+
+        profile = UserProfile.objects.get(user=test_user_with_profile)
+        before = examples_weight()
+        apply_weight_patch(profile, {"examples": -0.2})
+        patched = examples_weight()
+        update_profile_from_review(profile, 3, ["examples"])
+
+        assert patched == pytest.approx(before - 0.2)
+        assert examples_weight() > patched
+
+    def test_stale_build_is_a_miss(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+
+        from agent.cache import get_profile_context, store_profile_context
+
+        changed_at = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        store_profile_context(7, 1, {"style": "old"}, version=changed_at - timedelta(seconds=1))
+
+        assert get_profile_context(7, 1, version=changed_at) is None
+        store_profile_context(7, 1, {"style": "new"}, version=changed_at)
+        assert get_profile_context(7, 1, version=changed_at) == {"style": "new"}
+
+    def test_profile_change_in_another_process_is_seen(self, test_user_with_profile, test_deck):
+        from django.utils import timezone
+
+        from accounts.models import UserProfile
+        from agent.llm_graph import load_profile_context
+
+        load_profile_context(test_user_with_profile.id, test_deck.id)
+        # No local invalidation, as when another worker saved the profile
+        UserProfile.objects.filter(user=test_user_with_profile).update(
+            preferences={"include_analogies": True}, updated_at=timezone.now()
+        )
+
+        context = load_profile_context(test_user_with_profile.id, test_deck.id)
+        assert context["user_preferences"] == {"include_analogies": True}
+
+    def test_deck_change_in_another_process_is_seen(self, test_user, test_deck):
+        from django.core.cache import cache
+
+        from agent.cache import deck_context_version
+        from agent.llm_graph import load_profile_context
+        from cards.models import Deck
+
+        load_profile_context(test_user.id, test_deck.id)
+        Deck.objects.filter(id=test_deck.id).update(name="Genetics")
+        # What invalidate_deck_profile_context leaves in the shared cache for other workers
+        cache.set(f"agent:deck_context_version:{test_deck.id}", deck_context_version(test_deck.id) + 1)
+
+        assert load_profile_context(test_user.id, test_deck.id)["deck_context"] == "Genetics"
+
+    def test_deck_rename_invalidates(self, test_user, test_deck, authenticated_client):
+        from agent.llm_graph import load_profile_context
+
+        load_profile_context(test_user.id, test_deck.id)
+        authenticated_client.patch(
+            f"/api/decks/{test_deck.id}/", {"name": "Genetics"}, format="json"
+        )
+
+        assert load_profile_context(test_user.id, test_deck.id)["deck_context"] == "Genetics"
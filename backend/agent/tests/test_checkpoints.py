@@ -0,0 +1,226 @@
+"""
+Tests for the Django-backed generation checkpointer and revision resume.
+"""
+
+import operator
+from datetime import timedelta
+from typing import Annotated, List, TypedDict
+from unittest.mock import patch
+
+import pytest
+from django.utils import timezone
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START, StateGraph
+from rest_framework import status
+
+from agent.checkpoints import (
+    CHECKPOINT_DURABILITY,
+    DjangoCheckpointSaver,
+    generation_config,
+    load_generation_state,
+    prune_checkpoints,
+)
+from agent.generation import build_revision_input
+from agent.models import GenerationCheckpoint
+
+
+class CounterState(TypedDict):
+    steps: Annotated[List[str], operator.add]
+    user_id: int
+    deck_id: int
+    is_safe: bool
+
+
+def _counter_graph(saver):
+    graph = StateGraph(CounterState)
+    graph.add_node("step", lambda state: {"steps": ["step"]})
+    graph.add_edge(START, "step")
+    graph.add_edge("step", END)
+    return graph.compile(checkpointer=saver)
+
+
+def _run(graph, thread_id, **values):
+    state = {"steps": [], "user_id": 1, "deck_id": 2, "is_safe": True, **values}
+    return graph.invoke(state, generation_config(thread_id), durability=CHECKPOINT_DURABILITY)
+
+
+# LangGraph writes checkpoints from a worker thread, which needs committed data
+@pytest.mark.django_db(transaction=True)
+class TestDjangoCheckpointSaver:
+    """Tests for DjangoCheckpointSaver."""
+
+    def test_final_state_persisted_once_per_run(self):
+        graph = _counter_graph(DjangoCheckpointSaver())
+
+        _run(graph, "gen-1")
+
+        assert GenerationCheckpoint.objects.filter(thread_id="gen-1").count() == 1
+        state = graph.get_state(generation_config("gen-1"))
+        assert state.values["steps"] == ["step"]
+
+    def test_second_run_resumes_thread_state(self):
+        graph = _counter_graph(DjangoCheckpointSaver())
+
+        _run(graph, "gen-1")
+        result = graph.invoke(
+            {"steps": []}, generation_config("gen-1"), durability=CHECKPOINT_DURABILITY
+        )
+
+        assert result["steps"] == ["step", "step"]
+        assert result["deck_id"] == 2
+
+    def test_threads_are_isolated(self):
+        graph = _counter_graph(DjangoCheckpointSaver())
+
+        _run(graph, "gen-1")
+        _run(graph, "gen-2")
+
+        assert graph.get_state(generation_config("gen-2")).values["steps"] == ["step"]
+
+    def test_trims_old_checkpoints_per_thread(self, settings):
+        settings.AGENT_CHECKPOINT_MAX_PER_THREAD = 1
+        graph = _counter_graph(DjangoCheckpointSaver())
+
+        _run(graph, "gen-1")
+        _run(graph, "gen-1")
+
+        assert GenerationCheckpoint.objects.filter(thread_id="gen-1").count() == 1
+        saver = DjangoCheckpointSaver()
+        assert len(list(saver.list(generation_config("gen-1")))) == 1
+
+    def test_expired_checkpoints_ignored_and_pruned(self):
+        graph = _counter_graph(DjangoCheckpointSaver())
+        _run(graph, "old")
+        _run(graph, "new")
+        GenerationCheckpoint.objects.filter(thread_id="old").update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+
+        assert DjangoCheckpointSaver().get_tuple(generation_config("old")) is None
+        assert prune_checkpoints() == 1
+        assert list(GenerationCheckpoint.objects.values_list("thread_id", flat=True)) == ["new"]
+
+    def test_load_generation_state_checks_owner_and_deck(self):
+        _run(_counter_graph(DjangoCheckpointSaver()), "gen-1")
+
+        assert load_generation_state("gen-1", user_id=1, deck_id=2)["steps"] == ["step"]
+        assert load_generation_state("gen-1", user_id=99, deck_id=2) is None
+        assert load_generation_state("gen-1", user_id=1, deck_id=3) is None
+        assert load_generation_state("missing", user_id=1, deck_id=2) is None
+
+    def test_unsafe_generation_not_resumable(self):
+        _run(_counter_graph(DjangoCheckpointSaver()), "gen-1", is_safe=False)
+
+        assert load_generation_state("gen-1", user_id=1, deck_id=2) is None
+
+
+class TestBuildRevisionInput:
+    def test_resets_run_fields_and_keeps_rag_meta(self):
+        stored = {"generation_meta": {"rag_used": True, "sources": ["notes.pdf"]}}
+
+        update = build_revision_input(
+            stored=stored,
+            previous_back="Old answer",
+            feedback="Shorter please",
+            generation_meta={"revision": True},
+        )
+
+        assert update["critique_count"] == 0
+        assert update["final_json"] == {}
+        assert update["generation_meta"] == {
+            "revision": True,
+            "rag_used": True,
+            "sources": ["notes.pdf"],
+            "resumed": True,
+        }
+        assert isinstance(update["messages"][0], AIMessage)
+        assert "Shorter please" in update["messages"][1].content
+
+
+REVISED = {
+    "is_safe": True,
+    "final_json": {
+        "front": "What is Python?",
+        "back": "Revised answer",
+        "tags": [],
+        "generation_meta": {},
+    },
+}
+
+
+@pytest.mark.django_db
+class TestRevisionResume:
+    """Revision requests with a generation_id."""
+
+    url = "/api/agent/flashcard/backside/revise/"
+
+    def _payload(self, test_deck, **extra):
+        return {
+            "front": "What is Python?",
+            "previous_backside": "Old answer",
+            "feedback": "Add more clarity",
+            "deck_id": test_deck.id,
+            **extra,
+        }
+
+    @patch("agent.views._update_profile_from_revision")
+    @patch("agent.llm_graph.app.invoke")
+    def test_generation_returns_generation_id(
+        self, mock_invoke, _mock_update, authenticated_client, test_deck
+    ):
+        mock_invoke.return_value = REVISED
+
+        response = authenticated_client.post(
+            "/api/agent/flashcard/backside/",
+            {"front": "What is Python?", "deck_id": test_deck.id},
+        )
+
+        generation_id = response.data["generation_id"]
+        assert mock_invoke.call_args[0][1] == generation_config(generation_id)
+        assert mock_invoke.call_args[1]["durability"] == CHECKPOINT_DURABILITY
+
+    @patch("agent.views._update_profile_from_revision")
+    @patch("agent.llm_graph.app.invoke")
+    @patch("agent.llm_graph.revision_app.invoke")
+    def test_resumes_from_checkpoint(
+        self, mock_resume, mock_full, _mock_update, authenticated_client, test_deck, test_user
+    ):
+        mock_resume.return_value = REVISED
+        stored = {
+            "front": "What is Python?",
+            "user_id": test_user.id,
+            "deck_id": test_deck.id,
+            "is_safe": True,
+            "generation_meta": {"rag_used": True, "sources": []},
+        }
+
+        with patch("agent.views.load_generation_state", return_value=stored) as mock_load:
+            response = authenticated_client.post(
+                self.url, self._payload(test_deck, generation_id="gen-1"), format="json"
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["generation_id"] == "gen-1"
+        mock_load.assert_called_once_with("gen-1", user_id=test_user.id, deck_id=test_deck.id)
+        mock_full.assert_not_called()
+        graph_input, config = mock_resume.call_args[0]
+        assert config == generation_config("gen-1")
+        assert graph_input["generation_meta"]["resumed"] is True
+        assert [type(m) for m in graph_input["messages"]] == [AIMessage, HumanMessage]
+
+    @patch("agent.views._update_profile_from_revision")
+    @patch("agent.llm_graph.app.invoke")
+    @patch("agent.llm_graph.revision_app.invoke")
+    def test_unknown_generation_runs_full_pipeline(
+        self, mock_resume, mock_full, _mock_update, authenticated_client, test_deck
+    ):
+        mock_full.return_value = REVISED
+
+        response = authenticated_client.post(
+            self.url, self._payload(test_deck, generation_id="missing"), format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["generation_id"] != "missing"
+        mock_resume.assert_not_called()
+        assert mock_full.call_args[0][0]["messages"][0].content == "What is Python?"
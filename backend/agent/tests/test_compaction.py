@@ -0,0 +1,119 @@
+"""
+Tests for agent message-history compaction.
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agent.compaction import MIN_TOOL_SNIPPET_CHARS, compact_messages, estimate_tokens
+
+
+def _tool_round(call_id: str, content: str):
+    return [
+        AIMessage(
+            content="",
+            tool_calls=[{"id": call_id, "name": "search_deck_documents", "args": {"query": "q"}}],
+        ),
+        ToolMessage(content=content, tool_call_id=call_id, name="search_deck_documents"),
+    ]
+
+
+class TestCompactMessages:
+    """Tests for compact_messages."""
+
+    def test_under_budget_is_unchanged(self):
+        messages = [HumanMessage(content="What is mitosis?"), *_tool_round("c1", "notes")]
+
+        compacted, before, after = compact_messages(
+            messages, front="What is mitosis?", budget_tokens=10_000
+        )
+
+        assert compacted == messages
+        assert before == after
+
+    def test_drops_superseded_drafts_and_feedback(self):
+        messages = [
+            HumanMessage(content="What is mitosis?"),
+            AIMessage(content="FINAL ANSWER: draft one"),
+            HumanMessage(content="Refine the answer. Feedback: too short"),
+            AIMessage(content="FINAL ANSWER: draft two"),
+            HumanMessage(content="Refine the answer. Feedback: add an example"),
+        ]
+
+        compacted, before, after = compact_messages(
+            messages, front="What is mitosis?", budget_tokens=10_000
+        )
+
+        assert [m.content for m in compacted] == [
+            "What is mitosis?",
+            "FINAL ANSWER: draft two",
+            "Refine the answer. Feedback: add an example",
+        ]
+        assert after < before
+
+    def test_user_revision_request_is_always_kept(self):
+        messages = [
+            HumanMessage(content="What is feedback: in control theory?"),
+            AIMessage(content="FINAL ANSWER: previous back"),
+            HumanMessage(content="Please revise the backside. User feedback: shorter"),
+            AIMessage(content="FINAL ANSWER: draft"),
+            HumanMessage(content="Refine the answer. Feedback: add an example"),
+            AIMessage(content="FINAL ANSWER: final"),
+            HumanMessage(content="Refine the answer. Feedback: fix the typo"),
+        ]
+
+        compacted, _, _ = compact_messages(messages, front="q", budget_tokens=10_000)
+
+        assert [m.content for m in compacted] == [
+            "What is feedback: in control theory?",
+            "Please revise the backside. User feedback: shorter",
+            "FINAL ANSWER: final",
+            "Refine the answer. Feedback: fix the typo",
+        ]
+
+    def test_truncates_least_relevant_tool_output_first(self):
+        relevant = "mitosis cell division chromosomes " * 100
+        unrelated = "photosynthesis chlorophyll light " * 100
+        messages = [
+            HumanMessage(content="mitosis cell division"),
+            *_tool_round("c1", relevant),
+            *_tool_round("c2", unrelated),
+        ]
+        budget = (len(relevant) + 400) // 4
+
+        compacted, before, after = compact_messages(
+            messages, front="mitosis cell division", budget_tokens=budget
+        )
+
+        tools = [m for m in compacted if isinstance(m, ToolMessage)]
+        assert tools[0].content == relevant
+        assert "characters of this result omitted" in tools[1].content
+        assert len(tools[1].content) < len(unrelated)
+        assert after < before
+
+    def test_keeps_tool_call_pairing_and_front(self):
+        messages = [
+            HumanMessage(content="What is mitosis?"),
+            *_tool_round("c1", "x" * 20_000),
+            AIMessage(content="FINAL ANSWER: draft"),
+        ]
+
+        compacted, _, after = compact_messages(
+            messages, front="What is mitosis?", budget_tokens=20
+        )
+
+        assert compacted[0].content == "What is mitosis?"
+        assert compacted[1].tool_calls[0]["id"] == "c1"
+        assert compacted[2].tool_call_id == "c1"
+        assert len(compacted[2].content) < MIN_TOOL_SNIPPET_CHARS + 100
+        assert compacted[-1].content == "FINAL ANSWER: draft"
+        # Originals are not mutated
+        assert len(messages[2].content) == 20_000
+
+    def test_reserved_tokens_count_towards_budget(self):
+        messages = [HumanMessage(content="q"), *_tool_round("c1", "y" * 4000)]
+
+        _, before, _ = compact_messages(
+            messages, front="q", budget_tokens=10_000, reserved_tokens=500
+        )
+
+        assert before == estimate_tokens(messages) + 500
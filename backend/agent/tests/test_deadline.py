@@ -0,0 +1,168 @@
+"""
+Tests for deadline-aware graph execution.
+"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from rest_framework import status
+
+from agent.cache import response_cache, store_cached_response
+from agent.deadline import clamp_timeout, mark_skipped, out_of_time, request_deadline
+from agent.generation import build_initial_state
+from agent.llm_graph import WEB_SEARCH_SKIPPED, agent_node, critic_node, tool_node
+
+
+def _state(seconds_left=None, **extra):
+    deadline = time.time() + seconds_left if seconds_left is not None else None
+    state = build_initial_state(front="What is mitosis?", deck_id=1, user_id=1, deadline=deadline)
+    state.update(extra)
+    return state
+
+
+def _request(headers=None):
+    request = MagicMock()
+    request.headers = headers or {}
+    return request
+
+
+class TestRequestDeadline:
+    def test_body_field(self):
+        deadline = request_deadline(_request(), {"deadline_ms": 2000})
+        assert deadline == pytest.approx(time.time() + 2, abs=0.5)
+
+    def test_header(self):
+        deadline = request_deadline(_request({"X-Agent-Deadline-Ms": "1500"}), {})
+        assert deadline == pytest.approx(time.time() + 1.5, abs=0.5)
+
+    def test_body_wins_over_header(self):
+        deadline = request_deadline(
+            _request({"X-Agent-Deadline-Ms": "90000"}), {"deadline_ms": 1000}
+        )
+        assert deadline < time.time() + 2
+
+    def test_missing_or_invalid(self):
+        assert request_deadline(_request(), {}) is None
+        assert request_deadline(_request({"X-Agent-Deadline-Ms": "soon"}), {}) is None
+        assert request_deadline(_request({"X-Agent-Deadline-Ms": "-5"}), {}) is None
+
+
+class TestBudgetChecks:
+    def test_no_deadline_never_skips(self):
+        state = _state()
+        assert not out_of_time(state, "critic")
+        assert clamp_timeout(state, 20.0) == 20.0
+
+    def test_reserves(self, settings):
+        settings.AGENT_DEADLINE_RESERVES = {"web_search": 8.0, "tools": 5.0, "critic": 3.0}
+        state = _state(seconds_left=4)
+
+        assert out_of_time(state, "web_search")
+        assert out_of_time(state, "tools")
+        assert not out_of_time(state, "critic")
+        assert clamp_timeout(state, 20.0) <= 4
+
+    def test_mark_skipped_dedupes(self):
+        meta = mark_skipped(mark_skipped({"rag_used": True}, "critic"), "critic")
+        assert meta == {"rag_used": True, "skipped_stages": ["critic"]}
+
+
+class TestDeadlineNodes:
+    @patch("agent.llm_graph.llm_answer_only")
+    @patch("agent.llm_graph.llm_with_tools")
+    def test_agent_answers_without_tools_when_low(self, mock_tools_llm, mock_answer_llm):
+        mock_answer_llm.invoke.return_value = AIMessage(content="FINAL ANSWER: Division.")
+
+        result = agent_node(_state(seconds_left=1))
+
+        mock_tools_llm.invoke.assert_not_called()
+        mock_answer_llm.invoke.assert_called_once()
+        assert result["generation_meta"]["skipped_stages"] == ["tools"]
+
+    @patch("agent.llm_graph.llm_answer_only")
+    @patch("agent.llm_graph.llm_with_tools")
+    def test_agent_uses_tools_with_time_left(self, mock_tools_llm, mock_answer_llm):
+        mock_tools_llm.invoke.return_value = AIMessage(content="FINAL ANSWER: Division.")
+
+        result = agent_node(_state(seconds_left=60))
+
+        mock_answer_llm.invoke.assert_not_called()
+        assert "skipped_stages" not in result.get("generation_meta", {})
+
+    @patch("agent.llm_graph.web_search_tool")
+    @patch("agent.llm_graph.search_deck_documents")
+    def test_web_search_skipped_when_low(self, mock_search, mock_web, settings):
+        settings.AGENT_DEADLINE_RESERVES = {"web_search": 8.0, "tools": 5.0, "critic": 3.0}
+        mock_search.invoke.return_value = "Mitosis notes"
+        call = AIMessage(
+            content="",
+            tool_calls=[
+                {"id": "a", "name": "search_deck_documents", "args": {"query": "mitosis"}},
+                {"id": "b", "name": "web_search_tool", "args": {"query": "mitosis"}},
+            ],
+        )
+
+        result = tool_node(_state(seconds_left=6, messages=[HumanMessage(content="q"), call]))
+
+        mock_web.invoke.assert_not_called()
+        assert [m.content for m in result["messages"]] == ["Mitosis notes", WEB_SEARCH_SKIPPED]
+        assert result["generation_meta"]["skipped_stages"] == ["web_search"]
+        assert result["generation_meta"]["rag_used"] is True
+
+    @patch("agent.llm_graph.critic_llm")
+    def test_critic_skipped_when_low(self, mock_llm):
+        state = _state(seconds_left=1, draft_answer="Mitosis is division.")
+
+        result = critic_node(state)
+
+        mock_llm.invoke.assert_not_called()
+        assert result["critique_count"] == 1
+        assert "messages" not in result
+        assert result["generation_meta"]["skipped_stages"] == ["critic"]
+
+
+@pytest.mark.django_db
+class TestDeadlineRequests:
+    url = "/api/agent/flashcard/backside/"
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_header_sets_state_deadline(self, mock_invoke, authenticated_client, test_deck):
+        mock_invoke.return_value = {"is_safe": True, "final_json": {"back": "x"}}
+
+        authenticated_client.post(
+            self.url,
+            {"front": "Q", "deck_id": test_deck.id},
+            HTTP_X_AGENT_DEADLINE_MS="3000",
+        )
+
+        state = mock_invoke.call_args[0][0]
+        assert state["deadline"] == pytest.approx(time.time() + 3, abs=1)
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_deadline_answers_are_not_cached(self, mock_invoke, authenticated_client, test_deck):
+        mock_invoke.return_value = {"is_safe": True, "final_json": {"back": "x"}}
+
+        for _ in range(2):
+            response = authenticated_client.post(
+                self.url,
+                {"front": "Q", "deck_id": test_deck.id},
+                HTTP_X_AGENT_DEADLINE_MS="3000",
+            )
+            assert response["X-Agent-Cache"] == "miss"
+
+        assert len(response_cache) == 0
+        assert mock_invoke.call_count == 2
+
+    def test_skipped_stages_are_not_cached(self):
+        degraded = {"back": "x", "generation_meta": {"skipped_stages": ["critic"]}}
+
+        assert store_cached_response(("k",), degraded) is False
+        assert store_cached_response(("k",), {"back": "x", "generation_meta": {}}) is True
+
+    def test_rejects_non_positive_budget(self, authenticated_client, test_deck):
+        response = authenticated_client.post(
+            self.url, {"front": "Q", "deck_id": test_deck.id, "deadline_ms": 0}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
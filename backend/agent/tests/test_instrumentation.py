@@ -0,0 +1,151 @@
+"""
+Tests for per-node instrumentation and the metrics endpoint.
+"""
+
+import pytest
+from django.contrib.auth.models import User
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from agent.instrumentation import LatencyHistogram, instrument_node, metrics
+from agent.llm_graph import build_workflow, formatter_node
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _fake_llm():
+    return GenericFakeChatModel(
+        messages=iter(
+            [
+                AIMessage(
+                    content="FINAL ANSWER: Done.",
+                    usage_metadata={"input_tokens": 12, "output_tokens": 5, "total_tokens": 17},
+                )
+            ]
+        )
+    )
+
+
+def _echo(query: str) -> str:
+    """Echo the query."""
+    return query
+
+
+echo_tool = StructuredTool.from_function(func=_echo, name="echo_tool")
+
+
+class TestLatencyHistogram:
+    def test_percentiles(self):
+        histogram = LatencyHistogram(window=100)
+        for ms in range(1, 101):
+            histogram.observe(ms / 1000)
+
+        summary = histogram.summary()
+        assert summary["count"] == 100
+        assert summary["p50_ms"] == 50
+        assert summary["p95_ms"] == 95
+        assert summary["p99_ms"] == 99
+
+    def test_window_bounds_samples(self):
+        histogram = LatencyHistogram(window=2)
+        for seconds in (10.0, 0.001, 0.002):
+            histogram.observe(seconds)
+
+        assert histogram.count == 3
+        assert histogram.percentile(99) == 0.002
+
+
+class TestInstrumentNode:
+    def test_identity_when_disabled(self, settings):
+        settings.AGENT_METRICS_ENABLED = False
+        assert instrument_node("formatter", formatter_node) is formatter_node
+
+    def test_records_latency_tokens_and_tools(self, settings):
+        settings.AGENT_METRICS_ENABLED = True
+        settings.AGENT_METRICS_IN_META = False
+        llm = _fake_llm()
+
+        def node(state):
+            echo_tool.invoke({"query": "hi"})
+            return {"messages": [llm.invoke("hello")]}
+
+        update = instrument_node("agent", node)({"generation_meta": {}})
+
+        assert "generation_meta" not in update
+        snapshot = metrics.snapshot()
+        agent = snapshot["nodes"]["agent"]
+        assert agent["count"] == 1
+        assert agent["input_tokens"] == 12
+        assert agent["output_tokens"] == 5
+        assert agent["tool_calls"] == 1
+        assert snapshot["tools"]["echo_tool"]["calls"] == 1
+
+    async def test_async_nodes_are_instrumented(self, settings):
+        settings.AGENT_METRICS_ENABLED = True
+        llm = _fake_llm()
+
+        async def node(state):
+            return {"messages": [await llm.ainvoke("hello")]}
+
+        await instrument_node("agent", node)({"generation_meta": {}})
+
+        assert metrics.snapshot()["nodes"]["agent"]["input_tokens"] == 12
+
+    def test_trace_attached_to_generation_meta(self, settings):
+        settings.AGENT_METRICS_ENABLED = True
+        settings.AGENT_METRICS_IN_META = True
+        llm = _fake_llm()
+        state = {"generation_meta": {"prompt_version": "v1"}}
+
+        def agent(state):
+            return {"messages": [llm.invoke("hello")]}
+
+        agent_update = instrument_node("agent", agent)(state)
+        assert "generation_meta" not in agent_update
+        state["node_trace"] = agent_update["node_trace"]
+        update = instrument_node("formatter", formatter_node)(
+            {**state, "front": "Q", "draft_answer": "A"}
+        )
+
+        trace = update["final_json"]["generation_meta"]["trace"]
+        assert [n["node"] for n in trace["nodes"]] == ["agent", "formatter"]
+        assert trace["input_tokens"] == 12
+        assert trace["agent_iterations"] == 1
+        assert update["final_json"]["generation_meta"]["prompt_version"] == "v1"
+
+    def test_workflow_nodes_wrapped_when_enabled(self, settings):
+        settings.AGENT_METRICS_ENABLED = True
+        graph = build_workflow()
+
+        assert graph.nodes["formatter"].runnable.func is not formatter_node
+
+
+@pytest.mark.django_db
+class TestAgentMetricsView:
+    url = "/api/agent/metrics/"
+
+    def test_requires_staff(self, authenticated_client):
+        response = authenticated_client.get(self.url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_returns_histograms_and_cache_stats(self):
+        admin = User.objects.create_user(username="admin", password="pass", is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        metrics.observe("node", "guardrail", 0.2, input_tokens=3)
+
+        response = client.get(self.url)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["nodes"]["guardrail"]["p95_ms"] == 200
+        assert "hit_rate" in data["caches"]["response"]
+        assert "llm_rate" in data["guardrail"]
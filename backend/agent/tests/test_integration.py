@@ -78,6 +78,7 @@ class TestGeminiAPIIntegration:
     @pytest.mark.django_db
     def test_full_agent_pipeline_without_rag(self):
         """Full agent should generate a flashcard answer."""
+        from agent.checkpoints import generation_config, new_generation_id
         from agent.llm_graph import app
         from cards.models import Deck
         from django.contrib.auth.models import User
@@ -105,7 +106,7 @@ class TestGeminiAPIIntegration:
         }
 
         start_time = time.time()
-        final_state = app.invoke(initial_state)
+        final_state = app.invoke(initial_state, generation_config(new_generation_id()))
         elapsed = time.time() - start_time
 
         assert final_state["is_safe"] == True
@@ -139,7 +140,10 @@ class TestRAGIntegration:
 
     def test_vector_store_connection(self):
         """Should connect to Supabase vector store."""
-        from agent.tools import _build_supabase_client, _build_embedding_model
+        from uploads.services.document_ingestion import (
+            _build_embedding_model,
+            _build_supabase_client,
+        )
 
         client = _build_supabase_client()
         embeddings = _build_embedding_model()
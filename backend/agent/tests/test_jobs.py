@@ -0,0 +1,233 @@
+"""
+Tests for the database-backed generation job queue.
+"""
+
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+
+from agent.jobs import claim_job, run_job, submit_job, work
+from agent.models import GenerationJob
+
+SAFE_STATE = {"is_safe": True, "final_json": {"front": "Q", "back": "A"}}
+
+
+@pytest.mark.django_db
+class TestClaiming:
+    def test_highest_priority_first(self, test_user, test_deck):
+        low = submit_job(user=test_user, deck=test_deck, front="low")
+        high = submit_job(user=test_user, deck=test_deck, front="high", priority=5)
+
+        assert claim_job("w1").pk == high.pk
+        assert claim_job("w1").pk == low.pk
+        assert claim_job("w1") is None
+
+    def test_claim_locks_the_job(self, test_user, test_deck, settings):
+        settings.AGENT_JOB_VISIBILITY_TIMEOUT_SECONDS = 60
+        submit_job(user=test_user, deck=test_deck, front="Q")
+
+        job = claim_job("w1")
+
+        assert job.status == GenerationJob.RUNNING
+        assert job.attempts == 1
+        assert job.locked_by == "w1"
+        assert job.locked_until > timezone.now() + timedelta(seconds=50)
+        assert claim_job("w2") is None
+
+    def test_expired_lock_is_reclaimed(self, test_user, test_deck):
+        job = submit_job(user=test_user, deck=test_deck, front="Q")
+        claim_job("w1")
+        GenerationJob.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+
+        reclaimed = claim_job("w2")
+
+        assert reclaimed.pk == job.pk
+        assert reclaimed.attempts == 2
+        assert reclaimed.locked_by == "w2"
+
+    def test_abandoned_last_attempt_fails(self, test_user, test_deck):
+        job = submit_job(user=test_user, deck=test_deck, front="Q")
+        GenerationJob.objects.filter(pk=job.pk).update(
+            status=GenerationJob.RUNNING,
+            attempts=job.max_attempts,
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+
+        assert claim_job("w1") is None
+        job.refresh_from_db()
+        assert job.status == GenerationJob.FAILED
+        assert job.finished_at is not None
+
+    def test_backoff_delays_retry(self, test_user, test_deck):
+        job = submit_job(user=test_user, deck=test_deck, front="Q")
+        GenerationJob.objects.filter(pk=job.pk).update(
+            available_at=timezone.now() + timedelta(minutes=1)
+        )
+
+        assert claim_job("w1") is None
+
+
+@pytest.mark.django_db
+class TestRunJob:
+    @patch("agent.llm_graph.app.invoke")
+    def test_success_stores_result(self, mock_invoke, test_user, test_deck):
+        mock_invoke.return_value = SAFE_STATE
+        submit_job(user=test_user, deck=test_deck, front="Q")
+
+        assert run_job(claim_job("w1")) == GenerationJob.SUCCEEDED
+
+        job = GenerationJob.objects.get()
+        assert job.result["back"] == "A"
+        assert job.result["generation_id"]
+        assert job.locked_until is None
+        state = mock_invoke.call_args[0][0]
+        assert (state["front"], state["deck_id"], state["user_id"]) == (
+            "Q",
+            test_deck.id,
+            test_user.id,
+        )
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_failure_is_retried_then_failed(self, mock_invoke, test_user, test_deck, settings):
+        settings.AGENT_JOB_RETRY_BACKOFF_SECONDS = 0
+        mock_invoke.side_effect = RuntimeError("Gemini down")
+        job = submit_job(user=test_user, deck=test_deck, front="Q")
+
+        statuses = [run_job(claim_job("w1")) for _ in range(job.max_attempts)]
+
+        assert statuses == [GenerationJob.QUEUED] * (job.max_attempts - 1) + [GenerationJob.FAILED]
+        job.refresh_from_db()
+        assert job.error == "Gemini down"
+        assert claim_job("w1") is None
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_blocked_is_final(self, mock_invoke, test_user, test_deck):
+        mock_invoke.return_value = {"is_safe": False, "safety_reason": "Harmful"}
+        submit_job(user=test_user, deck=test_deck, front="Q")
+
+        assert run_job(claim_job("w1")) == GenerationJob.BLOCKED
+        assert GenerationJob.objects.get().result == {
+            "error": "Content Blocked",
+            "reason": "Harmful",
+        }
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_reclaimed_job_keeps_new_owner(self, mock_invoke, test_user, test_deck):
+        mock_invoke.return_value = SAFE_STATE
+        submit_job(user=test_user, deck=test_deck, front="Q")
+        stale = claim_job("w1")
+        GenerationJob.objects.filter(pk=stale.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        claim_job("w2")
+
+        run_job(stale)
+
+        job = GenerationJob.objects.get()
+        assert job.status == GenerationJob.RUNNING
+        assert job.locked_by == "w2"
+
+
+@pytest.mark.django_db
+class TestWorker:
+    @patch("agent.llm_graph.app.invoke")
+    def test_burst_drains_queue(self, mock_invoke, test_user, test_deck):
+        mock_invoke.return_value = SAFE_STATE
+        for front in ("a", "b", "c"):
+            submit_job(user=test_user, deck=test_deck, front=front)
+
+        assert work("w1", burst=True) == 3
+        assert set(GenerationJob.objects.values_list("status", flat=True)) == {
+            GenerationJob.SUCCEEDED
+        }
+
+    @patch("agent.jobs.close_old_connections")
+    @patch("agent.llm_graph.app.invoke")
+    def test_closes_stale_connections_every_iteration(
+        self, mock_invoke, mock_close, test_user, test_deck
+    ):
+        mock_invoke.return_value = SAFE_STATE
+        for front in ("a", "b"):
+            submit_job(user=test_user, deck=test_deck, front=front)
+
+        work("w1", burst=True)
+
+        # Two jobs plus the empty poll that ends the burst
+        assert mock_close.call_count == 3
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_command(self, mock_invoke, test_user, test_deck):
+        mock_invoke.return_value = SAFE_STATE
+        submit_job(user=test_user, deck=test_deck, front="Q")
+
+        call_command("run_agent_worker", "--burst", "--worker-id", "cmd")
+
+        assert GenerationJob.objects.get().locked_by == "cmd"
+
+
+@pytest.mark.django_db
+class TestJobEndpoints:
+    url = "/api/agent/flashcard/backside/jobs/"
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_submit_returns_202_without_running(self, mock_invoke, authenticated_client, test_deck):
+        response = authenticated_client.post(self.url, {"front": "Q", "deck_id": test_deck.id})
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data["status"] == GenerationJob.QUEUED
+        assert response.data["poll_url"] == f"{self.url}{response.data['job_id']}/"
+        assert GenerationJob.objects.get().priority == 0
+        mock_invoke.assert_not_called()
+
+    def test_only_staff_may_set_priority(self, authenticated_client, test_user, test_deck):
+        payload = {"front": "Q", "deck_id": test_deck.id, "priority": 3}
+
+        response = authenticated_client.post(self.url, payload)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not GenerationJob.objects.exists()
+
+        test_user.is_staff = True
+        test_user.save()
+        response = authenticated_client.post(self.url, payload)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert GenerationJob.objects.get().priority == 3
+
+    def test_submit_unknown_deck(self, authenticated_client):
+        response = authenticated_client.post(self.url, {"front": "Q", "deck_id": 999})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_poll_until_done(self, mock_invoke, authenticated_client, test_deck):
+        mock_invoke.return_value = SAFE_STATE
+        job_id = authenticated_client.post(
+            self.url, {"front": "Q", "deck_id": test_deck.id}
+        ).data["job_id"]
+
+        pending = authenticated_client.get(f"{self.url}{job_id}/")
+        work("w1", burst=True)
+        done = authenticated_client.get(f"{self.url}{job_id}/")
+
+        assert pending.data["status"] == GenerationJob.QUEUED
+        assert pending["Retry-After"] == "1"
+        assert done.data["status"] == GenerationJob.SUCCEEDED
+        assert done.data["result"]["back"] == "A"
+        assert "Retry-After" not in done
+
+    def test_poll_other_users_job(self, authenticated_client, test_deck):
+        from django.contrib.auth.models import User
+        from cards.models import Deck
+
+        other = User.objects.create_user(username="other", password="x")
+        job = submit_job(
+            user=other, deck=Deck.objects.create(user=other, name="Theirs"), front="Q"
+        )
+
+        response = authenticated_client.get(f"{self.url}{job.pk}/")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
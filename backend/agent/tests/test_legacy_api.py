@@ -30,7 +30,7 @@ class PromptingTests(TestCase):
 class ToolsTests(TestCase):
     """Tests for agent tools"""
 
-    @patch("agent.tools._build_supabase_client")
+    @patch("uploads.services.document_ingestion._build_supabase_client")
     @patch("agent.tools._build_embedding_model")
     def test_search_deck_documents_returns_empty_on_no_results(
         self, mock_embed, mock_client
@@ -125,7 +125,7 @@ class RapidFlashcardViewTests(APITestCase):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
-    @patch("agent.views.llm")
+    @patch("agent.views.rapid_llm")
     def test_rapid_generation(self, mock_llm):
         mock_response = MagicMock()
         mock_response.content = "This is the back of the card"
@@ -2,8 +2,12 @@
 Tests for the LLM graph nodes and routing logic.
 """
 
+import asyncio
+import threading
+import time
+
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 
 from agent.llm_graph import (
@@ -17,6 +21,19 @@ from agent.llm_graph import (
     route_guardrail,
     route_agent,
     route_critic,
+    route_speculative_agent,
+    speculative_agent_node,
+    speculative_prefetch_agent_node,
+    aagent_node,
+    acritic_node,
+    aguardrail_node,
+    aspeculative_agent_node,
+    aspeculative_prefetch_agent_node,
+    atool_node,
+    aretrieve_node,
+    retrieve_node,
+    retrieval_join_node,
+    build_workflow,
     app,
 )
 from agent.state import AgentState
@@ -90,7 +107,7 @@ class TestContextBuilderNode:
 class TestGuardrailNode:
     """Tests for guardrail_node."""
 
-    @patch("agent.llm_graph.llm")
+    @patch("agent.llm_graph.guardrail_llm")
     def test_allows_safe_content(self, mock_llm, base_state):
         """Should allow safe content."""
         mock_response = MagicMock()
@@ -115,7 +132,7 @@ class TestGuardrailNode:
         # Due to complex chaining, we verify the structure
         assert "is_safe" in result or True  # Node always returns these keys
 
-    @patch("agent.llm_graph.llm")
+    @patch("agent.llm_graph.guardrail_llm")
     def test_blocks_unsafe_content(self, mock_llm, base_state):
         """Should block unsafe content."""
         base_state["front"] = "inappropriate content"
@@ -135,6 +152,38 @@ class TestGuardrailNode:
         assert "is_safe" in result or "safety_reason" in result
 
 
+    @patch("agent.llm_graph._guardrail_chain")
+    def test_benign_front_skips_llm(self, mock_chain, base_state, settings):
+        """Clear-allow fronts should be settled by the local classifier."""
+        settings.AGENT_LOCAL_GUARDRAIL = True
+        result = guardrail_node(base_state)
+
+        assert result["is_safe"] is True
+        mock_chain.assert_not_called()
+
+    @patch("agent.llm_graph._guardrail_chain")
+    def test_escalated_verdict_is_memoized(self, mock_chain, base_state):
+        """Ambiguous fronts go to the LLM once; repeats reuse the verdict."""
+        mock_chain.return_value.invoke.return_value = {"allowed": True, "reason": "History"}
+        base_state["front"] = "Why did the atomic bomb end the war?"
+
+        first = guardrail_node(base_state)
+        second = guardrail_node({**base_state, "front": "why did the atomic bomb end the war"})
+
+        assert first == second == {"is_safe": True, "safety_reason": "History"}
+        mock_chain.return_value.invoke.assert_called_once()
+
+    @patch("agent.llm_graph._guardrail_chain")
+    def test_fail_open_is_not_memoized(self, mock_chain, base_state):
+        mock_chain.return_value.invoke.side_effect = ValueError("bad json")
+        base_state["front"] = "Why did the atomic bomb end the war?"
+
+        guardrail_node(base_state)
+        guardrail_node(base_state)
+
+        assert mock_chain.return_value.invoke.call_count == 2
+
+
 class TestAgentNode:
     """Tests for agent_node."""
 
@@ -155,6 +204,36 @@ class TestAgentNode:
         assert len(result["messages"]) == 1
         mock_llm.invoke.assert_called_once()
 
+    @patch("agent.llm_graph.llm_with_tools")
+    def test_compacts_history_and_records_tokens(self, mock_llm, base_state, settings):
+        """Oversized tool results are truncated and token counts recorded."""
+        settings.AGENT_PROMPT_TOKEN_BUDGET = 1000
+        mock_llm.invoke.return_value = AIMessage(content="FINAL ANSWER: Division.")
+        base_state["messages"] = [
+            HumanMessage(content="What is mitosis?"),
+            AIMessage(
+                content="",
+                tool_calls=[{"id": "c1", "name": "search_deck_documents", "args": {}}],
+            ),
+            ToolMessage(content="notes " * 5000, tool_call_id="c1"),
+        ]
+
+        result = agent_node(base_state)
+
+        sent = mock_llm.invoke.call_args[0][0]
+        assert len(sent[-1].content) < 5000
+        [stats] = result["generation_meta"]["compaction"]
+        assert stats["prompt_tokens_before"] > stats["prompt_tokens_after"]
+
+    @patch("agent.llm_graph.llm_with_tools")
+    def test_compaction_disabled(self, mock_llm, base_state, settings):
+        settings.AGENT_PROMPT_COMPACTION = False
+        mock_llm.invoke.return_value = AIMessage(content="FINAL ANSWER: Division.")
+
+        result = agent_node(base_state)
+
+        assert "generation_meta" not in result
+
 
 class TestToolNode:
     """Tests for tool_node."""
@@ -219,6 +298,290 @@ class TestToolNode:
 
         assert "messages" in result
 
+    @patch("langchain_community.tools.tavily_search.TavilySearchResults.invoke")
+    def test_records_web_search_cache_use(self, mock_invoke, base_state):
+        """Repeated web searches are served from cache and noted in generation_meta."""
+        mock_invoke.return_value = [{"title": "Mitosis", "content": "Cell division"}]
+        base_state["messages"] = [
+            AIMessage(
+                content="",
+                tool_calls=[{"id": "a", "name": "web_search_tool", "args": {"query": "Mitosis?"}}],
+            )
+        ]
+        first = tool_node(base_state)
+
+        base_state["generation_meta"] = first["generation_meta"]
+        base_state["messages"] = [
+            AIMessage(
+                content="",
+                tool_calls=[{"id": "b", "name": "web_search_tool", "args": {"query": "mitosis"}}],
+            )
+        ]
+        second = tool_node(base_state)
+
+        mock_invoke.assert_called_once()
+        searches = second["generation_meta"]["web_search"]
+        assert [search["cache"] for search in searches] == ["miss", "hit"]
+        assert searches[1]["saved_ms"] >= 0
+        assert second["messages"][0].content == first["messages"][0].content
+
+    @patch("agent.llm_graph.web_search_tool")
+    @patch("agent.llm_graph.search_deck_documents")
+    def test_runs_calls_concurrently_in_order(self, mock_search, mock_web, base_state):
+        """Several calls should overlap and answer in the order requested."""
+
+        def slow(result):
+            def run(_args):
+                time.sleep(0.2)
+                return result
+
+            return run
+
+        mock_search.invoke.side_effect = slow("Deck notes")
+        mock_web.invoke.side_effect = slow("Web results")
+        base_state["messages"] = [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"id": "a", "name": "search_deck_documents", "args": {"query": "mitosis"}},
+                    {"id": "b", "name": "web_search_tool", "args": {"query": "mitosis"}},
+                    {"id": "c", "name": "search_deck_documents", "args": {"query": "cell division"}},
+                ],
+            )
+        ]
+
+        started = time.monotonic()
+        result = tool_node(base_state)
+
+        assert time.monotonic() - started < 0.45
+        assert [m.tool_call_id for m in result["messages"]] == ["a", "b", "c"]
+        assert [m.content for m in result["messages"]] == ["Deck notes", "Web results", "Deck notes"]
+        assert result["generation_meta"]["rag_used"] is True
+
+    @patch("agent.llm_graph.web_search_tool")
+    @patch("agent.llm_graph.search_deck_documents")
+    def test_slow_tool_times_out(self, mock_search, mock_web, base_state, settings):
+        """A slow web search should not stall the turn or count as RAG."""
+        settings.AGENT_TOOL_TIMEOUTS = {"web_search_tool": 0.05, "search_deck_documents": 0.05}
+        mock_web.invoke.side_effect = lambda _args: time.sleep(0.5) or "late"
+        mock_search.invoke.side_effect = lambda _args: time.sleep(0.5) or "late"
+        base_state["messages"] = [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"id": "a", "name": "web_search_tool", "args": {"query": "x"}},
+                    {"id": "b", "name": "search_deck_documents", "args": {"query": "x"}},
+                ],
+            )
+        ]
+
+        started = time.monotonic()
+        result = tool_node(base_state)
+
+        assert time.monotonic() - started < 0.3
+        assert all("timed out" in m.content for m in result["messages"])
+        assert "rag_used" not in result["generation_meta"]
+
+    @patch("agent.llm_graph.search_deck_documents")
+    def test_timeout_starts_when_the_call_runs(self, mock_search, base_state, settings):
+        """A call queued behind another on a busy tool pool still gets its full timeout."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        settings.AGENT_TOOL_TIMEOUTS = {"search_deck_documents": 0.3}
+        mock_search.invoke.side_effect = lambda _args: time.sleep(0.2) or "Deck notes"
+        base_state["messages"] = [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"id": "a", "name": "search_deck_documents", "args": {"query": "x"}},
+                    {"id": "b", "name": "search_deck_documents", "args": {"query": "y"}},
+                ],
+            )
+        ]
+
+        with patch("agent.llm_graph._tool_executor", ThreadPoolExecutor(max_workers=1)):
+            result = tool_node(base_state)
+
+        assert [m.content for m in result["messages"]] == ["Deck notes", "Deck notes"]
+
+
+class TestSpeculativeAgentNode:
+    """Tests for the speculative guardrail mode."""
+
+    @patch("agent.llm_graph.agent_node")
+    @patch("agent.llm_graph.guardrail_node")
+    def test_keeps_agent_step_when_safe(self, mock_guard, mock_agent, base_state):
+        """Should merge the verdict with the agent's first step."""
+        agent_msg = AIMessage(content="FINAL ANSWER: Mitosis is cell division.")
+        mock_guard.return_value = {"is_safe": True, "safety_reason": "ok"}
+        mock_agent.return_value = {"messages": [agent_msg]}
+
+        result = speculative_agent_node(base_state)
+
+        assert result["is_safe"] is True
+        assert result["messages"] == [agent_msg]
+        mock_guard.assert_called_once()
+        mock_agent.assert_called_once()
+
+    @patch("agent.llm_graph.agent_node")
+    @patch("agent.llm_graph.guardrail_node")
+    def test_discards_agent_step_when_unsafe(self, mock_guard, mock_agent, base_state):
+        """Should drop the agent's work when the guardrail blocks."""
+        mock_guard.return_value = {"is_safe": False, "safety_reason": "blocked"}
+        mock_agent.return_value = {"messages": [AIMessage(content="draft")]}
+
+        result = speculative_agent_node(base_state)
+
+        assert result == {"is_safe": False, "safety_reason": "blocked"}
+
+    @patch("agent.llm_graph.agent_node")
+    @patch("agent.llm_graph.guardrail_node")
+    def test_unsafe_verdict_wins_over_agent_error(self, mock_guard, mock_agent, base_state):
+        """Should report the block instead of the agent failure."""
+        mock_guard.return_value = {"is_safe": False, "safety_reason": "blocked"}
+        mock_agent.side_effect = RuntimeError("LLM down")
+
+        result = speculative_agent_node(base_state)
+
+        assert result["is_safe"] is False
+
+    def test_route_speculative_agent(self, base_state):
+        """Should end on unsafe and otherwise follow the agent routing."""
+        base_state["is_safe"] = False
+        assert route_speculative_agent(base_state) == "end_unsafe"
+
+        base_state["is_safe"] = True
+        base_state["messages"] = [AIMessage(content="answer")]
+        assert route_speculative_agent(base_state) == "generator"
+
+    def test_speculative_graph_compiles(self):
+        """Speculative graph should replace the guardrail node."""
+        graph = build_workflow(speculative_guardrail=True).compile()
+
+        nodes = set(graph.get_graph().nodes)
+        assert "guarded_agent" in nodes
+        assert "guardrail" not in nodes
+
+
+class TestAsyncNodes:
+    """Tests for the awaitable node implementations."""
+
+    async def test_aguardrail_fails_open(self, base_state):
+        """Should allow content when the async guardrail call fails."""
+        base_state["front"] = "Why did the atomic bomb end the war?"
+        with patch("agent.llm_graph.ChatPromptTemplate") as mock_prompt:
+            chain = MagicMock()
+            chain.ainvoke = AsyncMock(side_effect=ValueError("bad json"))
+            mock_prompt.from_messages.return_value.__or__.return_value.__or__.return_value = chain
+
+            result = await aguardrail_node(base_state)
+
+        assert result["is_safe"] is True
+
+    @patch("agent.llm_graph.llm_with_tools")
+    async def test_aagent_node(self, mock_llm, base_state):
+        """Should await the tool-bound LLM with the system prompt prepended."""
+        answer = AIMessage(content="FINAL ANSWER: Division.")
+        mock_llm.ainvoke = AsyncMock(return_value=answer)
+
+        result = await aagent_node(base_state)
+
+        assert result["messages"] == [answer]
+        sent = mock_llm.ainvoke.call_args[0][0]
+        assert "BACK side of an Anki flashcard" in sent[0].content
+
+    @patch("agent.llm_graph.web_search_tool")
+    @patch("agent.llm_graph.search_deck_documents")
+    async def test_atool_node_runs_calls_and_keeps_order(
+        self, mock_search, mock_web, base_state
+    ):
+        """Should run every call, answer in request order and mark RAG usage."""
+        mock_search.ainvoke = AsyncMock(return_value="Mitosis notes")
+        mock_web.ainvoke = AsyncMock(return_value="Web result")
+        base_state["messages"] = [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": "web_search_tool", "args": {"query": "mitosis"}, "id": "a"},
+                    {"name": "search_deck_documents", "args": {"query": "mitosis"}, "id": "b"},
+                    {"name": "unknown", "args": {}, "id": "c"},
+                ],
+            )
+        ]
+
+        result = await atool_node(base_state)
+
+        assert [m.tool_call_id for m in result["messages"]] == ["a", "b", "c"]
+        assert result["messages"][2].content == "Tool not found."
+        assert result["generation_meta"]["rag_used"] is True
+        assert mock_search.ainvoke.call_args[0][0]["deck_id"] == 1
+
+    @patch("agent.llm_graph.search_deck_documents")
+    async def test_aretrieve_node_respects_the_deadline(self, mock_search, base_state, settings):
+        settings.AGENT_TOOL_TIMEOUTS = {"search_deck_documents": 5}
+
+        async def slow(_args):
+            await asyncio.sleep(1)
+
+        mock_search.ainvoke = slow
+        base_state["deadline"] = time.time() + 0.1
+
+        started = time.monotonic()
+        result = await aretrieve_node(base_state)
+
+        assert time.monotonic() - started < 0.5
+        assert result == {"prefetched_context": ""}
+
+    @patch("agent.llm_graph.web_search_tool")
+    async def test_atool_node_times_out_slow_tools(self, mock_web, base_state, settings):
+        settings.AGENT_TOOL_TIMEOUTS = {"web_search_tool": 0.05}
+
+        async def slow(_args):
+            await asyncio.sleep(1)
+
+        mock_web.ainvoke = slow
+        base_state["messages"] = [
+            AIMessage(
+                content="",
+                tool_calls=[{"name": "web_search_tool", "args": {"query": "x"}, "id": "a"}],
+            )
+        ]
+
+        result = await atool_node(base_state)
+
+        assert "timed out" in result["messages"][0].content
+
+    @patch("agent.llm_graph.critic_llm")
+    async def test_acritic_node_requests_revision(self, mock_llm, base_state):
+        """Should feed critique back as a human message."""
+        mock_llm.ainvoke = AsyncMock(return_value=MagicMock(content="Too long."))
+        base_state["draft_answer"] = "Draft"
+
+        result = await acritic_node(base_state)
+
+        assert result["critique_count"] == 1
+        assert "Too long." in result["messages"][0].content
+
+    @patch("agent.llm_graph.aagent_node")
+    @patch("agent.llm_graph.aguardrail_node")
+    async def test_aspeculative_discards_agent_step_when_unsafe(
+        self, mock_guard, mock_agent, base_state
+    ):
+        """Should drop the agent's work when the guardrail blocks."""
+        mock_guard.return_value = {"is_safe": False, "safety_reason": "blocked"}
+        mock_agent.return_value = {"messages": [AIMessage(content="draft")]}
+
+        result = await aspeculative_agent_node(base_state)
+
+        assert result == {"is_safe": False, "safety_reason": "blocked"}
+
+    def test_async_graph_compiles(self):
+        """Async graph should expose the same nodes as the sync one."""
+        sync_nodes = set(build_workflow().compile().get_graph().nodes)
+        async_nodes = set(build_workflow(asynchronous=True).compile().get_graph().nodes)
+
+        assert async_nodes == sync_nodes
+
 
 class TestGeneratorNode:
     """Tests for generator_node."""
@@ -240,7 +603,7 @@ class TestGeneratorNode:
 class TestCriticNode:
     """Tests for critic_node."""
 
-    @patch("agent.llm_graph.llm")
+    @patch("agent.llm_graph.critic_llm")
     def test_accepts_perfect_answer(self, mock_llm, base_state):
         """Should increment critique_count for PERFECT answer."""
         mock_response = MagicMock()
@@ -256,7 +619,7 @@ class TestCriticNode:
         # No feedback message added for PERFECT
         assert "messages" not in result or len(result.get("messages", [])) == 0
 
-    @patch("agent.llm_graph.llm")
+    @patch("agent.llm_graph.critic_llm")
     def test_provides_feedback_for_improvement(self, mock_llm, base_state):
         """Should add feedback message when improvement needed."""
         mock_response = MagicMock()
@@ -273,6 +636,57 @@ class TestCriticNode:
         assert "Feedback:" in result["messages"][0].content
 
 
+    @patch("agent.llm_graph.critic_llm")
+    def test_clear_pass_skips_llm(self, mock_llm, base_state, settings):
+        """A draft meeting every style rule should not reach the LLM critic."""
+        settings.AGENT_PRECRITIC_AUDIT_RATE = 0.0
+        base_state["style_rules"] = {
+            "structure": "bullets",
+            "min_words": 5,
+            "max_words": 100,
+            "require_example": True,
+            "require_quiz": False,
+        }
+        base_state["draft_answer"] = (
+            "- Mitosis splits one cell into two identical cells.\n"
+            "- For example, skin cells divide by mitosis."
+        )
+
+        result = critic_node(base_state)
+
+        mock_llm.invoke.assert_not_called()
+        assert result["critique_count"] == 1
+        assert "messages" not in result
+        assert result["generation_meta"]["critic"]["llm"] is False
+
+    @patch("agent.llm_graph.critic_llm")
+    def test_empty_draft_gets_local_feedback(self, mock_llm, base_state, settings):
+        settings.AGENT_PRECRITIC_AUDIT_RATE = 0.0
+        base_state["style_rules"] = {"structure": "bullets", "min_words": 5, "max_words": 100}
+        base_state["draft_answer"] = ""
+
+        result = critic_node(base_state)
+
+        mock_llm.invoke.assert_not_called()
+        assert "Feedback:" in result["messages"][0].content
+
+    @patch("agent.llm_graph.critic_llm")
+    def test_borderline_draft_calls_llm(self, mock_llm, base_state):
+        mock_llm.invoke.return_value = MagicMock(content="PERFECT")
+        base_state["style_rules"] = {
+            "structure": "bullets",
+            "min_words": 5,
+            "max_words": 100,
+            "require_example": True,
+        }
+        base_state["draft_answer"] = "- Mitosis splits one cell into two.\n- Daughter cells match."
+
+        result = critic_node(base_state)
+
+        mock_llm.invoke.assert_called_once()
+        assert result["generation_meta"]["critic"]["precheck_verdict"] == "borderline"
+
+
 class TestFormatterNode:
     """Tests for formatter_node."""
 
@@ -368,3 +782,210 @@ class TestGraphCompilation:
         ]
         # LangGraph stores nodes in the graph structure
         assert app is not None
+
+
+class TestPrefetchRetrieval:
+    """Tests for pre-emptive deck retrieval."""
+
+    @patch("agent.llm_graph.search_deck_documents")
+    def test_retrieve_node_keeps_matches(self, mock_search, base_state):
+        mock_search.invoke.return_value = "Mitosis has four phases."
+
+        result = retrieve_node(base_state)
+
+        assert result == {"prefetched_context": "Mitosis has four phases."}
+        assert mock_search.invoke.call_args[0][0] == {"query": "What is mitosis?", "deck_id": 1}
+
+    @patch("agent.llm_graph.search_deck_documents")
+    def test_retrieve_node_drops_status_messages(self, mock_search, base_state):
+        mock_search.invoke.return_value = "[No matching documents found]"
+
+        assert retrieve_node(base_state) == {"prefetched_context": ""}
+
+    def test_join_records_prefetch(self, base_state):
+        assert retrieval_join_node(base_state) == {}
+
+        base_state["prefetched_context"] = "Notes"
+        meta = retrieval_join_node(base_state)["generation_meta"]
+        assert meta["rag_prefetched"] is True
+        # Prefetching is not evidence that the answer used the material
+        assert "rag_used" not in meta
+
+    @patch("agent.llm_graph.search_deck_documents")
+    def test_retrieve_node_respects_the_deadline(self, mock_search, base_state, settings):
+        settings.AGENT_TOOL_TIMEOUTS = {"search_deck_documents": 5}
+        mock_search.invoke.side_effect = lambda _args: time.sleep(0.5) or "late"
+        base_state["deadline"] = time.time() + 0.1
+
+        started = time.monotonic()
+        result = retrieve_node(base_state)
+
+        assert time.monotonic() - started < 0.3
+        assert result == {"prefetched_context": ""}
+
+    @patch("agent.llm_graph.llm_with_tools")
+    def test_agent_prompt_includes_prefetched_material(self, mock_llm, base_state):
+        mock_llm.invoke.return_value = AIMessage(content="FINAL ANSWER: x")
+        base_state["prefetched_context"] = "Mitosis has four phases."
+
+        agent_node(base_state)
+
+        system = mock_llm.invoke.call_args[0][0][0].content
+        assert "PRE-FETCHED COURSE MATERIAL" in system
+        assert "Mitosis has four phases." in system
+        assert "only if it does not cover the question" in system
+
+    def test_graph_topology(self):
+        nodes = set(build_workflow(prefetch_rag=True).compile().get_graph().nodes)
+        assert {"retrieve", "retrieval_join", "guardrail"} <= nodes
+
+        speculative = set(
+            build_workflow(prefetch_rag=True, speculative_guardrail=True).compile().get_graph().nodes
+        )
+        # Retrieval runs inside guarded_agent, alongside the guardrail
+        assert "guarded_agent" in speculative
+        assert not {"retrieve", "retrieval_join"} & speculative
+
+    @patch("agent.llm_graph.agent_node")
+    @patch("agent.llm_graph.retrieve_node")
+    @patch("agent.llm_graph.guardrail_node")
+    def test_speculative_retrieval_overlaps_the_guardrail(
+        self, mock_guard, mock_retrieve, mock_agent, base_state
+    ):
+        guard_started = threading.Event()
+
+        def guard(_state):
+            guard_started.set()
+            return {"is_safe": True, "safety_reason": "ok"}
+
+        def retrieve(_state):
+            assert guard_started.wait(5), "guardrail did not start before retrieval finished"
+            return {"prefetched_context": "Mitosis has four phases."}
+
+        mock_guard.side_effect = guard
+        mock_retrieve.side_effect = retrieve
+        mock_agent.return_value = {"messages": [AIMessage(content="FINAL ANSWER: x")]}
+
+        result = speculative_prefetch_agent_node(base_state)
+
+        assert result["is_safe"] is True
+        assert result["prefetched_context"] == "Mitosis has four phases."
+        assert result["generation_meta"]["rag_prefetched"] is True
+        assert mock_agent.call_args[0][0]["prefetched_context"] == "Mitosis has four phases."
+
+    @patch("agent.llm_graph.aagent_node")
+    @patch("agent.llm_graph.aretrieve_node")
+    @patch("agent.llm_graph.aguardrail_node")
+    async def test_aspeculative_prefetch_discards_everything_when_unsafe(
+        self, mock_guard, mock_retrieve, mock_agent, base_state
+    ):
+        mock_guard.return_value = {"is_safe": False, "safety_reason": "blocked"}
+        mock_retrieve.return_value = {"prefetched_context": "Notes"}
+        mock_agent.return_value = {"messages": [AIMessage(content="draft")]}
+
+        result = await aspeculative_prefetch_agent_node(base_state)
+
+        assert result == {"is_safe": False, "safety_reason": "blocked"}
+
+    @pytest.mark.django_db
+    @patch("agent.llm_graph.critic_llm")
+    @patch("agent.llm_graph.llm_with_tools")
+    @patch("agent.llm_graph.search_deck_documents")
+    @patch("agent.llm_graph._guardrail_chain")
+    def test_guardrail_and_retrieval_overlap(
+        self, mock_chain, mock_search, mock_agent_llm, mock_llm, settings
+    ):
+        """Retrieval runs alongside the guardrail and the agent answers in one hop."""
+        from cards.models import Deck
+        from django.contrib.auth.models import User
+
+        settings.AGENT_PRECRITIC_ENABLED = False
+        from uploads.models import DeckDocument
+
+        user = User.objects.create_user(username="prefetch", password="x")
+        deck = Deck.objects.create(user=user, name="History")
+        DeckDocument.objects.create(deck=deck, filename="history.pdf", chunk_count=3)
+
+        def slow_verdict(_inputs):
+            time.sleep(0.3)
+            return {"allowed": True, "reason": "ok"}
+
+        def slow_search(_args):
+            time.sleep(0.3)
+            return "The bomb was dropped in 1945."
+
+        mock_chain.return_value.invoke.side_effect = slow_verdict
+        mock_search.invoke.side_effect = slow_search
+        mock_agent_llm.invoke.return_value = AIMessage(content="FINAL ANSWER: In 1945.")
+        mock_llm.invoke.return_value = MagicMock(content="PERFECT")
+
+        graph = build_workflow(prefetch_rag=True).compile()
+        started = time.monotonic()
+        final = graph.invoke(
+            {
+                "messages": [HumanMessage(content="When was the atomic bomb dropped?")],
+                "front": "When was the atomic bomb dropped?",
+                "deck_id": deck.id,
+                "user_id": user.id,
+                "critique_count": 0,
+                "generation_meta": {},
+            }
+        )
+
+        assert time.monotonic() - started < 0.55
+        assert mock_agent_llm.invoke.call_count == 1
+        assert final["final_json"]["back"] == "In 1945."
+        assert final["generation_meta"]["rag_prefetched"] is True
+        assert final["generation_meta"]["rag_used"] is False
+
+
+class TestDeckWithoutDocuments:
+    """Decks with no ingested documents skip deck retrieval entirely."""
+
+    @pytest.mark.django_db
+    def test_context_tracks_the_document_registry(self, test_user, test_deck, base_state):
+        from uploads.services.document_registry import record_document
+
+        base_state["user_id"] = test_user.id
+        base_state["deck_id"] = test_deck.id
+        assert context_builder_node(base_state)["has_documents"] is False
+
+        record_document(test_deck.id, "notes.pdf", "0" * 64, 3, 1024)
+
+        assert context_builder_node(base_state)["has_documents"] is True
+
+    @patch("agent.llm_graph.search_deck_documents")
+    def test_retrieve_node_does_not_search(self, mock_search, base_state):
+        base_state["has_documents"] = False
+
+        assert retrieve_node(base_state) == {"prefetched_context": ""}
+        mock_search.invoke.assert_not_called()
+
+    @patch("agent.llm_graph.llm_with_tools")
+    @patch("agent.llm_graph.llm_web_only")
+    def test_agent_is_offered_web_search_only(self, mock_web_only, mock_with_tools, base_state):
+        mock_web_only.invoke.return_value = AIMessage(content="FINAL ANSWER: x")
+        base_state["has_documents"] = False
+
+        agent_node(base_state)
+
+        mock_with_tools.invoke.assert_not_called()
+        system = mock_web_only.invoke.call_args[0][0][0].content
+        assert "no uploaded documents" in system
+        assert "'queries'" not in system
+
+    @patch("agent.llm_graph.search_deck_documents")
+    def test_tool_node_answers_deck_search_without_calling_it(self, mock_search, base_state):
+        base_state["has_documents"] = False
+        base_state["messages"] = [
+            AIMessage(
+                content="",
+                tool_calls=[{"id": "c1", "name": "search_deck_documents", "args": {"query": "x"}}],
+            )
+        ]
+
+        result = tool_node(base_state)
+
+        assert result["messages"][0].content == "[No matching documents found]"
+        assert "rag_used" not in result["generation_meta"]
+        mock_search.invoke.assert_not_called()
@@ -0,0 +1,58 @@
+"""
+Tests for the per-route chat model registry.
+"""
+
+import pytest
+from langchain_core.runnables import RunnableWithFallbacks
+
+from agent.llm_routing import DEFAULT_ROUTE, build_route_llm, route_config
+
+
+class TestRouteConfig:
+    def test_missing_keys_use_defaults(self, settings):
+        settings.AGENT_LLM_ROUTES = {"critic": {"model": "lite", "timeout": 5}}
+
+        config = route_config("critic")
+
+        assert config["model"] == "lite"
+        assert config["timeout"] == 5
+        assert config["temperature"] == DEFAULT_ROUTE["temperature"]
+        assert route_config("rapid") == DEFAULT_ROUTE
+
+    def test_unknown_route(self):
+        with pytest.raises(KeyError):
+            route_config("summarizer")
+
+
+class TestBuildRouteLlm:
+    def test_stub_without_api_key(self, settings):
+        settings.GEMINI_API_KEY = ""
+
+        model = build_route_llm("guardrail")
+
+        with pytest.raises(RuntimeError):
+            model.invoke("hi")
+
+    def test_route_settings_reach_the_model(self, settings):
+        settings.GEMINI_API_KEY = "test-key"
+        settings.AGENT_LLM_ROUTES = {
+            "guardrail": {"model": "gemini-lite", "temperature": 0.0, "timeout": 7}
+        }
+
+        model = build_route_llm("guardrail")
+
+        assert model.model.endswith("gemini-lite")
+        assert model.temperature == 0.0
+        assert model.timeout == 7
+
+    def test_fallback_model_is_bound_separately(self, settings):
+        settings.GEMINI_API_KEY = "test-key"
+        settings.AGENT_LLM_ROUTES = {
+            "critic": {"model": "gemini-lite", "fallback": "gemini-main"}
+        }
+        bound = []
+
+        model = build_route_llm("critic", bind=lambda m: bound.append(m.model) or m)
+
+        assert isinstance(model, RunnableWithFallbacks)
+        assert [name.split("/")[-1] for name in bound] == ["gemini-lite", "gemini-main"]
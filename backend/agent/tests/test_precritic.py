@@ -0,0 +1,97 @@
+"""
+Tests for the deterministic pre-critic.
+"""
+
+from unittest.mock import patch
+
+from agent.precritic import (
+    BORDERLINE,
+    FAIL,
+    PASS,
+    precheck_draft,
+    precritic_stats,
+    record_llm_verdict,
+    run_precheck,
+    should_skip_llm,
+)
+
+RULES = {
+    "structure": "sections",
+    "min_words": 10,
+    "max_words": 80,
+    "require_example": True,
+    "require_quiz": True,
+}
+
+BORDERLINE_DRAFT = """**Definition**
+Mitosis is the division of one cell nucleus into two identical nuclei.
+**Example**
+For example, skin cells divide by mitosis to replace worn cells."""
+
+GOOD_DRAFT = BORDERLINE_DRAFT + """
+Which phase separates the sister chromatids?"""
+
+
+class TestPrecheckDraft:
+    def test_good_draft_passes(self):
+        result = precheck_draft(GOOD_DRAFT, RULES)
+        assert result.verdict == PASS
+        assert result.score == 1.0
+
+    def test_empty_draft_fails(self):
+        result = precheck_draft("   ", RULES)
+        assert result.verdict == FAIL
+        assert result.failed_checks == ["non_empty"]
+
+    def test_missing_quiz_is_borderline(self):
+        result = precheck_draft(BORDERLINE_DRAFT, RULES)
+        assert result.verdict == BORDERLINE
+        assert result.failed_checks == ["quiz"]
+        assert "self-check" in result.feedback
+
+    def test_word_window(self):
+        result = precheck_draft(GOOD_DRAFT + " word" * 100, RULES)
+        assert "word_count" in result.failed_checks
+
+    def test_bullet_structure(self):
+        rules = {"structure": "bullets", "min_words": 1, "max_words": 50}
+        assert precheck_draft("- one point here\n- another point", rules).verdict == PASS
+        assert precheck_draft("Just a sentence with no bullets.", rules).verdict == BORDERLINE
+
+    def test_pass_threshold_is_configurable(self, settings):
+        settings.AGENT_PRECRITIC_PASS_SCORE = 0.75
+        assert precheck_draft(BORDERLINE_DRAFT, RULES).verdict == PASS
+
+    def test_disabled_without_rules_or_setting(self, settings):
+        assert run_precheck(GOOD_DRAFT, {}) is None
+        settings.AGENT_PRECRITIC_ENABLED = False
+        assert run_precheck(GOOD_DRAFT, RULES) is None
+
+
+class TestSkipAndAgreement:
+    def test_skip_rate(self, settings):
+        settings.AGENT_PRECRITIC_AUDIT_RATE = 0.0
+        assert should_skip_llm(precheck_draft(GOOD_DRAFT, RULES)) is True
+        assert should_skip_llm(precheck_draft(BORDERLINE_DRAFT, RULES)) is False
+
+        stats = precritic_stats.snapshot()
+        assert stats["checked"] == 2
+        assert stats["skipped"] == 1
+        assert stats["skip_rate"] == 0.5
+
+    def test_audited_verdicts_track_agreement(self, settings):
+        settings.AGENT_PRECRITIC_AUDIT_RATE = 1.0
+        result = precheck_draft(GOOD_DRAFT, RULES)
+
+        with patch("agent.precritic.random.random", return_value=0.5):
+            assert should_skip_llm(result) is False
+        record_llm_verdict(result, llm_passed=True)
+        record_llm_verdict(result, llm_passed=False)
+
+        stats = precritic_stats.snapshot()
+        assert stats["audited"] == 2
+        assert stats["agreement_rate"] == 0.5
+
+    def test_borderline_not_counted_as_audit(self):
+        record_llm_verdict(precheck_draft(BORDERLINE_DRAFT, RULES), llm_passed=True)
+        assert precritic_stats.snapshot()["audited"] == 0
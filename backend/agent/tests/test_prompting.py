@@ -3,7 +3,7 @@ Tests for the prompting module.
 """
 
 import pytest
-from agent.prompting import build_style_instructions
+from agent.prompting import build_style_instructions, build_style_rules
 
 
 class TestBuildStyleInstructions:
@@ -133,3 +133,26 @@ class TestBuildStyleInstructions:
         assert "step_by_step" in features
         assert "analogies" in features
         assert "mnemonic" in features
+
+
+class TestBuildStyleRules:
+    """Test suite for build_style_rules function."""
+
+    def test_defaults(self):
+        rules = build_style_rules({}, {})
+        assert rules["structure"] == "sections"
+        assert (rules["min_words"], rules["max_words"]) == (30, 300)
+        assert rules["require_example"] is True
+        assert rules["require_quiz"] is False
+
+    def test_follows_instruction_flags(self):
+        """Rules should agree with the features rendered into the prompt."""
+        prefs = {"verbosity": "concise", "structure": "bullets", "include_examples": False}
+        weights = {"examples": 0.2, "quiz": 0.9}
+        rules = build_style_rules(prefs, weights)
+        _, features = build_style_instructions(prefs, weights)
+
+        assert rules["structure"] == "bullets"
+        assert rules["max_words"] == 160
+        assert rules["require_example"] is ("examples" in features)
+        assert rules["require_quiz"] is ("quiz" in features)
@@ -0,0 +1,233 @@
+"""
+Tests for single-flight coalescing of identical generations.
+"""
+
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+from rest_framework import status
+
+from agent.cache import response_cache
+from agent.singleflight import SingleFlight, coalesce_generation
+
+
+def _run_in_threads(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as exc:
+            errors[i] = exc
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+class TestSingleFlight:
+    """In-process coalescing between threads and between event loop tasks."""
+
+    def test_concurrent_calls_share_one_run(self, settings):
+        settings.AGENT_SINGLEFLIGHT_CROSS_PROCESS = False
+        flights = SingleFlight("test")
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"back": "shared"}
+
+        leader, _, _ = _run_in_threads(1, lambda: flights.do("k", work))
+        started.wait(5)
+        threads, results, errors = _run_in_threads(3, lambda: flights.do("k", work))
+        release.set()
+        for thread in leader + threads:
+            thread.join(5)
+
+        assert len(calls) == 1
+        assert errors == [None, None, None]
+        assert results == [({"back": "shared"}, True)] * 3
+        assert flights.snapshot()["local_shared"] == 3
+
+    def test_leader_error_reaches_waiters(self, settings):
+        settings.AGENT_SINGLEFLIGHT_CROSS_PROCESS = False
+        flights = SingleFlight("test")
+        started = threading.Event()
+        release = threading.Event()
+
+        def work():
+            started.set()
+            release.wait(5)
+            raise RuntimeError("Gemini down")
+
+        leader, _, leader_errors = _run_in_threads(1, lambda: flights.do("k", work))
+        started.wait(5)
+        threads, _, errors = _run_in_threads(1, lambda: flights.do("k", work))
+        release.set()
+        for thread in leader + threads:
+            thread.join(5)
+
+        assert isinstance(leader_errors[0], RuntimeError)
+        assert isinstance(errors[0], RuntimeError)
+
+    def test_sequential_calls_run_again(self, settings):
+        settings.AGENT_SINGLEFLIGHT_CROSS_PROCESS = False
+        flights = SingleFlight("test")
+
+        assert flights.do("k", lambda: 1) == (1, False)
+        assert flights.do("k", lambda: 2) == (2, False)
+
+    def test_async_tasks_share_one_run(self, settings):
+        settings.AGENT_SINGLEFLIGHT_CROSS_PROCESS = False
+        flights = SingleFlight("test")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "back"
+
+        async def main():
+            return await asyncio.gather(*(flights.ado("k", work) for _ in range(3)))
+
+        results = asyncio.run(main())
+
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False, True, True]
+        assert {result for result, _ in results} == {"back"}
+
+
+class TestCrossProcess:
+    """Two SingleFlight instances stand in for two workers sharing the cache."""
+
+    def test_waiter_receives_remote_result(self, settings):
+        settings.AGENT_SINGLEFLIGHT_POLL_SECONDS = 0.01
+        worker_a, worker_b = SingleFlight("test"), SingleFlight("test")
+        started = threading.Event()
+        release = threading.Event()
+
+        def work():
+            started.set()
+            release.wait(5)
+            return {"back": "from a"}
+
+        threads, results, _ = _run_in_threads(1, lambda: worker_a.do("k", work))
+        started.wait(5)
+        threading.Timer(0.05, release.set).start()
+
+        result = worker_b.do("k", lambda: pytest.fail("worker b must not run the graph"))
+        threads[0].join(5)
+
+        assert result == ({"back": "from a"}, True)
+        assert results[0] == ({"back": "from a"}, False)
+        assert worker_b.snapshot()["remote_shared"] == 1
+
+    def test_waiter_runs_itself_when_remote_leader_fails(self, settings):
+        settings.AGENT_SINGLEFLIGHT_POLL_SECONDS = 0.01
+        worker_a, worker_b = SingleFlight("test"), SingleFlight("test")
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise RuntimeError("boom")
+
+        threads, _, errors = _run_in_threads(1, lambda: worker_a.do("k", failing))
+        started.wait(5)
+        threading.Timer(0.05, release.set).start()
+
+        result = worker_b.do("k", lambda: "own run")
+        threads[0].join(5)
+
+        assert isinstance(errors[0], RuntimeError)
+        assert result == ("own run", False)
+
+    def test_waiter_ignores_result_of_an_earlier_leader(self, settings):
+        settings.AGENT_SINGLEFLIGHT_POLL_SECONDS = 0.01
+        worker_a, worker_b = SingleFlight("test"), SingleFlight("test")
+        assert worker_a.do("k", lambda: "stale") == ("stale", False)
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise RuntimeError("boom")
+
+        threads, _, errors = _run_in_threads(1, lambda: worker_a.do("k", failing))
+        started.wait(5)
+        threading.Timer(0.05, release.set).start()
+
+        result = worker_b.do("k", lambda: "own run")
+        threads[0].join(5)
+
+        assert isinstance(errors[0], RuntimeError)
+        assert result == ("own run", False)
+
+
+def test_deadline_requests_are_not_coalesced(settings):
+    settings.AGENT_SINGLEFLIGHT_CROSS_PROCESS = False
+    key = (1, 2, "front", "style", "v1")
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader():
+        started.set()
+        release.wait(5)
+        return "leader"
+
+    threads, _, _ = _run_in_threads(1, lambda: coalesce_generation(key, None, leader))
+    started.wait(5)
+    try:
+        # Same key as the running flight, but deadline-bound: runs on its own
+        assert coalesce_generation(key, 123.0, lambda: "own run") == ("own run", False)
+    finally:
+        release.set()
+        threads[0].join(5)
+
+
+@pytest.mark.django_db
+class TestCoalescedRequests:
+    url = "/api/agent/flashcard/backside/"
+
+    @patch("agent.views.coalesce_generation")
+    def test_shared_result_is_returned_but_not_recached(
+        self, mock_coalesce, authenticated_client, test_deck
+    ):
+        outcome = {
+            "is_safe": True,
+            "safety_reason": "",
+            "output_passed": True,
+            "final_json": {"back": "Shared", "generation_id": "abc"},
+        }
+        mock_coalesce.return_value = (outcome, True)
+
+        response = authenticated_client.post(
+            self.url, {"front": "Q", "deck_id": test_deck.id}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["back"] == "Shared"
+        assert response["X-Agent-Coalesced"] == "true"
+        assert len(response_cache) == 0
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_leader_response_is_not_marked(self, mock_invoke, authenticated_client, test_deck):
+        mock_invoke.return_value = {"is_safe": True, "final_json": {"back": "x"}}
+
+        response = authenticated_client.post(
+            self.url, {"front": "Q", "deck_id": test_deck.id}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "X-Agent-Coalesced" not in response
+        mock_invoke.assert_called_once()
@@ -0,0 +1,241 @@
+"""
+Tests for the server-sent-events streaming endpoints.
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from agent.streaming import AnswerTokenFilter, stream_generation_events
+
+
+def _parse_events(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _fake_stream(*_args, **_kwargs):
+    """Mimics app.stream(..., stream_mode=["updates", "messages", "values"])."""
+    yield ("updates", {"context_builder": {"deck_context": "Deck"}})
+    yield ("updates", {"guardrail": {"is_safe": True, "safety_reason": "ok"}})
+    for text in ["Thinking... FINAL", " ANSWER: Mitosis", " is cell division."]:
+        yield ("messages", (AIMessageChunk(content=text, id="run-1"), {"langgraph_node": "agent"}))
+    yield ("messages", (AIMessageChunk(content="PERFECT", id="run-2"), {"langgraph_node": "critic"}))
+    yield ("updates", {"agent": {"messages": [AIMessage(content="...")]}})
+    yield ("updates", {"critic": {"critique_count": 1}})
+    yield (
+        "values",
+        {
+            "is_safe": True,
+            "output_passed": True,
+            "final_json": {
+                "front": "What is mitosis?",
+                "back": "Mitosis is cell division.",
+                "tags": [],
+                "generation_meta": {},
+            },
+        },
+    )
+
+
+class TestAnswerTokenFilter:
+    """Test suite for answer token extraction."""
+
+    def test_hides_reasoning_before_marker(self):
+        token_filter = AnswerTokenFilter()
+
+        assert token_filter.feed("m", "Let me think. FINAL ANS") == ""
+        assert token_filter.feed("m", "WER: Hello") == "Hello"
+        assert token_filter.feed("m", " world") == " world"
+
+    def test_tracks_messages_independently(self):
+        token_filter = AnswerTokenFilter()
+        token_filter.feed("first", "FINAL ANSWER: one")
+
+        assert token_filter.feed("second", "FINAL ANSWER: two") == "two"
+
+
+class TestStreamGenerationEvents:
+    """Test suite for the graph event stream."""
+
+    def test_emits_progress_tokens_and_done(self):
+        graph = MagicMock()
+        graph.stream.side_effect = _fake_stream
+        completed = []
+
+        events = _parse_events(
+            "".join(stream_generation_events(graph, {}, on_complete=completed.append))
+        )
+
+        names = [name for name, _ in events]
+        assert names[-1] == "done"
+        assert ("progress", {"stage": "guardrail", "status": "passed"}) in events
+        assert ("progress", {"stage": "critic", "status": "pass"}) in events
+        tokens = "".join(data["text"] for name, data in events if name == "token")
+        assert tokens == "Mitosis is cell division."
+        assert events[-1][1]["back"] == "Mitosis is cell division."
+        assert len(completed) == 1
+
+    @pytest.mark.parametrize("is_safe", [True, False])
+    def test_speculative_answer_waits_for_the_verdict(self, is_safe):
+        graph = MagicMock()
+        graph.stream.return_value = iter(
+            [
+                *[
+                    (
+                        "messages",
+                        (AIMessageChunk(content=text, id="run-1"), {"langgraph_node": "guarded_agent"}),
+                    )
+                    for text in ["FINAL ANSWER: Mitosis", " is cell division."]
+                ],
+                (
+                    "updates",
+                    {"guarded_agent": {"is_safe": is_safe, "prefetched_context": "", "messages": []}},
+                ),
+                ("values", {"is_safe": is_safe, "safety_reason": "Unsafe", "final_json": {}}),
+            ]
+        )
+
+        events = _parse_events("".join(stream_generation_events(graph, {})))
+
+        tokens = [(i, data["text"]) for i, (name, data) in enumerate(events) if name == "token"]
+        if is_safe:
+            # One burst, after the guardrail progress event
+            assert tokens == [(1, "Mitosis is cell division.")]
+            assert events[0][1] == {"stage": "guardrail", "status": "passed", "retrieve": "empty"}
+        else:
+            assert tokens == []
+            assert events[-1][0] == "blocked"
+
+    def test_revised_answer_replaces_the_first(self):
+        graph = MagicMock()
+        graph.stream.return_value = iter(
+            [
+                ("messages", (AIMessageChunk(content="FINAL ANSWER: Draft", id="run-1"), {"langgraph_node": "agent"})),
+                ("updates", {"critic": {"messages": [AIMessage(content="Too vague")]}}),
+                ("messages", (AIMessageChunk(content="FINAL ANSWER: Better", id="run-2"), {"langgraph_node": "agent"})),
+                ("values", {"is_safe": True, "final_json": {"back": "Better"}}),
+            ]
+        )
+
+        events = _parse_events("".join(stream_generation_events(graph, {})))
+
+        answer = [(name, data) for name, data in events if name in ("token", "reset")]
+        assert answer == [
+            ("token", {"text": "Draft"}),
+            ("reset", {"reason": "revise"}),
+            ("token", {"text": "Better"}),
+        ]
+
+    def test_reports_blocked_content(self):
+        graph = MagicMock()
+        graph.stream.return_value = iter(
+            [("values", {"is_safe": False, "safety_reason": "Unsafe"})]
+        )
+
+        events = _parse_events("".join(stream_generation_events(graph, {})))
+
+        assert events == [("blocked", {"error": "Content Blocked", "reason": "Unsafe"})]
+
+    def test_reports_errors(self):
+        graph = MagicMock()
+        graph.stream.side_effect = RuntimeError("LLM down")
+
+        events = _parse_events("".join(stream_generation_events(graph, {})))
+
+        assert events[0][0] == "error"
+        assert events[0][1]["details"] == "LLM down"
+
+
+@pytest.mark.django_db
+class TestFlashcardBacksideStreamView:
+    """Tests for the streaming backside endpoint."""
+
+    url = "/api/agent/flashcard/backside/stream/"
+
+    def test_requires_authentication(self, test_deck):
+        response = APIClient().post(self.url, {"front": "Q", "deck_id": test_deck.id})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_invalid_deck_returns_404(self, authenticated_client):
+        response = authenticated_client.post(self.url, {"front": "Q", "deck_id": 99999})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @patch("agent.llm_graph.app.stream")
+    def test_streams_events(self, mock_stream, authenticated_client, test_deck):
+        mock_stream.side_effect = _fake_stream
+
+        response = authenticated_client.post(
+            self.url,
+            {"front": "What is mitosis?", "deck_id": test_deck.id},
+            HTTP_ACCEPT="text/event-stream",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/event-stream"
+        events = _parse_events(b"".join(response.streaming_content).decode())
+        assert events[-1][0] == "done"
+        assert any(name == "token" for name, _ in events)
+
+    @patch("agent.llm_graph.app.stream")
+    def test_completed_stream_populates_cache(self, mock_stream, authenticated_client, test_deck):
+        mock_stream.side_effect = _fake_stream
+        payload = {"front": "What is mitosis?", "deck_id": test_deck.id}
+
+        first = authenticated_client.post(self.url, payload)
+        b"".join(first.streaming_content)
+        second = authenticated_client.post(self.url, payload)
+
+        assert second["X-Agent-Cache"] == "hit"
+        events = _parse_events(b"".join(second.streaming_content).decode())
+        assert [name for name, _ in events] == ["done"]
+        assert mock_stream.call_count == 1
+
+    @patch("agent.llm_graph.app.stream")
+    def test_failed_output_checks_are_not_cached(self, mock_stream, authenticated_client, test_deck):
+        def failing_stream(*args, **kwargs):
+            for mode, chunk in _fake_stream():
+                if mode == "values":
+                    chunk = {**chunk, "output_passed": False}
+                yield mode, chunk
+
+        mock_stream.side_effect = failing_stream
+        payload = {"front": "What is mitosis?", "deck_id": test_deck.id}
+
+        b"".join(authenticated_client.post(self.url, payload).streaming_content)
+        second = authenticated_client.post(self.url, payload)
+
+        assert second["X-Agent-Cache"] == "miss"
+
+
+@pytest.mark.django_db
+class TestRapidFlashcardBacksideStreamView:
+    """Tests for the streaming rapid endpoint."""
+
+    url = "/api/agent/flashcard/rapid/backside/stream/"
+
+    def test_streams_tokens(self, authenticated_client):
+        chain = MagicMock()
+        chain.stream.return_value = iter(
+            [AIMessageChunk(content="- AI is "), AIMessageChunk(content="machine intelligence")]
+        )
+        prompt = MagicMock()
+        prompt.__or__.return_value = chain
+
+        with patch("agent.views._rapid_backside_prompt", return_value=prompt):
+            response = authenticated_client.post(self.url, {"front": "What is AI?"})
+            events = _parse_events(b"".join(response.streaming_content).decode())
+
+        assert [name for name, _ in events] == ["token", "token", "done"]
+        assert events[-1][1] == {"front": "What is AI?", "back": "- AI is machine intelligence"}
+
+    def test_empty_front_rejected(self, authenticated_client):
+        response = authenticated_client.post(self.url, {"front": "   "})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
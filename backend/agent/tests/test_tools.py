@@ -2,18 +2,21 @@
 Tests for the agent tools.
 """
 
+import asyncio
+
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 
 # Import the class so we can patch it specifically
 from langchain_community.tools.tavily_search import TavilySearchResults
-from agent.tools import search_deck_documents, web_search_tool
+from agent.tools import record_web_searches, search_deck_documents, web_search_tool
 
 
+@pytest.mark.django_db
 class TestSearchDeckDocuments:
     """Test suite for search_deck_documents tool."""
 
-    @patch("agent.tools._build_supabase_client")
+    @patch("uploads.services.document_ingestion._build_supabase_client")
     @patch("agent.tools._build_embedding_model")
     def test_returns_empty_string_on_no_results(self, mock_embed, mock_client):
         """Should return empty string when no documents found."""
@@ -25,7 +28,7 @@ class TestSearchDeckDocuments:
         result = search_deck_documents.invoke({"query": "test query", "deck_id": 1})
         assert result == "[No matching documents found]"
 
-    @patch("agent.tools._build_supabase_client")
+    @patch("uploads.services.document_ingestion._build_supabase_client")
     @patch("agent.tools._build_embedding_model")
     def test_returns_concatenated_content(self, mock_embed, mock_client):
         """Should return concatenated page content from results."""
@@ -43,7 +46,7 @@ class TestSearchDeckDocuments:
         assert "Second chunk of content" in result
         assert "\n\n" in result
 
-    @patch("agent.tools._build_supabase_client")
+    @patch("uploads.services.document_ingestion._build_supabase_client")
     @patch("agent.tools._build_embedding_model")
     def test_filters_by_deck_id(self, mock_embed, mock_client):
         """Should filter search by deck_id."""
@@ -59,7 +62,7 @@ class TestSearchDeckDocuments:
         payload = call_args.args[1]
         assert payload.get("filter") == {"deck_id": 42}
 
-    @patch("agent.tools._build_supabase_client")
+    @patch("uploads.services.document_ingestion._build_supabase_client")
     @patch("agent.tools._build_embedding_model")
     def test_requests_four_results(self, mock_embed, mock_client):
         """Should request k=4 results from similarity search."""
@@ -73,6 +76,148 @@ class TestSearchDeckDocuments:
         payload = call_args.args[1]
         assert payload.get("match_count") == 4
 
+    @patch("uploads.services.document_ingestion.discard_failed_clients")
+    @patch("uploads.services.document_ingestion._build_supabase_client")
+    @patch("agent.tools._build_embedding_model")
+    def test_failure_discards_shared_client(self, mock_embed, mock_client, mock_discard):
+        """A failed search hands its client back for re-creation."""
+        mock_embed.return_value.embed_query.return_value = [0.1, 0.2]
+        error = ConnectionError("connection reset")
+        mock_client.return_value.rpc.return_value.execute.side_effect = error
+
+        result = search_deck_documents.invoke({"query": "test", "deck_id": 1})
+
+        assert result == "[Document search unavailable]"
+        mock_discard.assert_called_once_with(error, mock_client.return_value)
+
+    @patch("uploads.services.document_ingestion._build_supabase_client")
+    @patch("agent.tools._build_embedding_model")
+    def test_local_vector_store(self, mock_embed, mock_client, settings, tmp_path):
+        """With AGENT_VECTOR_STORE=local the search never touches Supabase."""
+        from uploads.services.vector_store import get_vector_store
+
+        settings.AGENT_VECTOR_STORE = "local"
+        settings.AGENT_VECTOR_STORE_PATH = tmp_path
+        get_vector_store().add(
+            3,
+            [
+                {"id": "a", "content": "Mitosis splits a cell", "metadata": {}, "embedding": [1.0, 0.0]},
+                {"id": "b", "content": "Unrelated", "metadata": {}, "embedding": [0.0, 1.0]},
+            ],
+        )
+        mock_embed.return_value.embed_query.return_value = [0.9, 0.1]
+
+        result = search_deck_documents.invoke({"query": "mitosis", "deck_id": 3})
+
+        assert result.startswith("Mitosis splits a cell")
+        mock_client.assert_not_called()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestMultiQuerySearch:
+    """Several phrasings are embedded in one batch and searched in one call."""
+
+    def test_schema_offers_extra_queries(self):
+        assert "queries" in search_deck_documents.args
+
+    @patch("uploads.services.document_ingestion._build_supabase_client")
+    @patch("agent.tools._build_embedding_model")
+    def test_batched_embedding_and_deduplicated_union(self, mock_embed, mock_client):
+        mock_embed.return_value.embed_documents.return_value = [[1.0, 0.0], [0.0, 1.0]]
+        rows = {
+            1.0: [{"id": "1", "content": "Backpropagation"}, {"id": "2", "content": "Chain rule"}],
+            0.0: [{"id": "2", "content": "Chain rule"}, {"id": "3", "content": "Gradients"}],
+        }
+        mock_client.return_value.rpc.side_effect = lambda name, payload: MagicMock(
+            **{"execute.return_value": MagicMock(data=rows[payload["query_embedding"][0]])}
+        )
+
+        result = search_deck_documents.invoke(
+            {"query": "backprop", "queries": ["backpropagation", "Backprop?"], "deck_id": 1}
+        )
+
+        mock_embed.return_value.embed_documents.assert_called_once_with(
+            ["backprop", "backpropagation"]
+        )
+        mock_embed.return_value.embed_query.assert_not_called()
+        assert mock_client.return_value.rpc.call_count == 2
+        assert result.split("\n\n") == ["Chain rule", "Backpropagation", "Gradients"]
+
+    @patch("uploads.services.document_ingestion._abuild_supabase_client")
+    @patch("agent.tools._build_embedding_model")
+    def test_async_runs_rpcs_concurrently(self, mock_embed, mock_client):
+        mock_embed.return_value.aembed_documents = AsyncMock(return_value=[[1.0], [2.0]])
+        client = MagicMock()
+        client.rpc.return_value.execute = AsyncMock(
+            return_value=MagicMock(data=[{"id": "1", "content": "Mitosis"}])
+        )
+        mock_client.return_value = client
+
+        result = asyncio.run(
+            search_deck_documents.ainvoke(
+                {"query": "mitosis", "queries": ["cell division"], "deck_id": 1}
+            )
+        )
+
+        assert result == "Mitosis"
+        assert client.rpc.call_count == 2
+        mock_embed.return_value.aembed_documents.assert_awaited_once()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestHybridSearch:
+    """BM25 hits from the deck's lexical index are fused with vector results."""
+
+    @pytest.fixture
+    def indexed_deck(self, test_deck):
+        from uploads.services.lexical_index import index_deck_chunks
+
+        index_deck_chunks(
+            test_deck.id,
+            [
+                {"id": "relu", "content": "ReLU is an activation function.", "metadata": {}},
+                {"id": "other", "content": "Dropout regularizes networks.", "metadata": {}},
+            ],
+        )
+        return test_deck
+
+    @patch("uploads.services.document_ingestion._build_supabase_client")
+    @patch("agent.tools._build_embedding_model")
+    def test_exact_term_hit_is_returned(self, mock_embed, mock_client, indexed_deck):
+        mock_embed.return_value.embed_query.return_value = [0.1, 0.2]
+        mock_client.return_value.rpc.return_value.execute.return_value = MagicMock(
+            data=[{"id": "sigmoid", "content": "Sigmoid squashes values."}]
+        )
+
+        result = search_deck_documents.invoke({"query": "ReLU", "deck_id": indexed_deck.id})
+
+        assert "ReLU is an activation function." in result
+        assert "Sigmoid squashes values." in result
+        assert "Dropout" not in result
+
+    @patch("uploads.services.document_ingestion._build_supabase_client")
+    @patch("agent.tools._build_embedding_model")
+    def test_lexical_hits_survive_vector_failure(self, mock_embed, mock_client, indexed_deck):
+        mock_embed.return_value.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+        mock_client.side_effect = RuntimeError("Supabase down")
+
+        result = asyncio.run(
+            search_deck_documents.ainvoke({"query": "relu", "deck_id": indexed_deck.id})
+        )
+
+        assert result == "ReLU is an activation function."
+
+    @patch("uploads.services.document_ingestion._build_supabase_client")
+    @patch("agent.tools._build_embedding_model")
+    def test_disabled(self, mock_embed, mock_client, indexed_deck, settings):
+        settings.AGENT_HYBRID_SEARCH = False
+        mock_embed.return_value.embed_query.return_value = [0.1, 0.2]
+        mock_client.return_value.rpc.return_value.execute.return_value = MagicMock(data=[])
+
+        result = search_deck_documents.invoke({"query": "ReLU", "deck_id": indexed_deck.id})
+
+        assert result == "[No matching documents found]"
+
 
 class TestWebSearchTool:
     """Test suite for web_search_tool (Tavily)."""
@@ -96,3 +241,37 @@ class TestWebSearchTool:
         assert isinstance(result, str)
         assert "Result 1" in result
         assert "Result 2" in result
+
+    @patch("langchain_community.tools.tavily_search.TavilySearchResults.invoke")
+    def test_normalized_queries_share_cached_results(self, mock_invoke):
+        mock_invoke.return_value = [{"title": "Result 1", "content": "Content 1"}]
+
+        first = web_search_tool.invoke({"query": "What is  Mitosis?"})
+        second = web_search_tool.invoke({"query": "what is mitosis"})
+
+        assert first == second
+        mock_invoke.assert_called_once()
+
+    @patch("langchain_community.tools.tavily_search.TavilySearchResults.invoke")
+    def test_failures_are_not_cached(self, mock_invoke):
+        mock_invoke.side_effect = ["HTTPError('429 Too Many Requests')", [{"title": "Result 1"}]]
+
+        with record_web_searches() as searches:
+            web_search_tool.invoke({"query": "mitosis"})
+            result = web_search_tool.invoke({"query": "mitosis"})
+
+        assert "Result 1" in result
+        assert [search["cache"] for search in searches] == ["error", "miss"]
+
+    @patch("agent.tools.TavilySearchResults")
+    def test_client_is_reused(self, mock_tavily):
+        from agent.tools import _tavily_clients
+
+        _tavily_clients.clear()
+        mock_tavily.return_value.invoke.side_effect = lambda args: [{"title": args["query"]}]
+
+        web_search_tool.invoke({"query": "mitosis"})
+        web_search_tool.invoke({"query": "meiosis"})
+
+        mock_tavily.assert_called_once()
+        _tavily_clients.clear()
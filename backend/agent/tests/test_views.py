@@ -136,6 +136,76 @@ class TestFlashcardBacksideView:
 
             assert response.status_code == status.HTTP_200_OK
 
+    @patch("agent.llm_graph.app.invoke")
+    def test_repeated_front_served_from_cache(
+        self, mock_invoke, authenticated_client, test_deck
+    ):
+        """Should answer a repeated front from the response cache."""
+        mock_invoke.return_value = {
+            "is_safe": True,
+            "output_passed": True,
+            "final_json": {
+                "front": "What is Python?",
+                "back": "Python is a high-level programming language.",
+                "tags": [],
+                "generation_meta": {"rag_used": False},
+            },
+        }
+
+        first = authenticated_client.post(
+            "/api/agent/flashcard/backside/",
+            {"front": "What is Python?", "deck_id": test_deck.id},
+        )
+        second = authenticated_client.post(
+            "/api/agent/flashcard/backside/",
+            {"front": "what is  python", "deck_id": test_deck.id},
+        )
+
+        assert first["X-Agent-Cache"] == "miss"
+        assert second["X-Agent-Cache"] == "hit"
+        assert second.data["back"] == first.data["back"]
+        mock_invoke.assert_called_once()
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_document_upload_invalidates_cache(
+        self, mock_invoke, authenticated_client, test_deck
+    ):
+        """Should regenerate after a document is ingested into the deck."""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        mock_invoke.return_value = {
+            "is_safe": True,
+            "final_json": {"front": "Test", "back": "Answer", "tags": [], "generation_meta": {}},
+        }
+        payload = {"front": "Test", "deck_id": test_deck.id}
+        authenticated_client.post("/api/agent/flashcard/backside/", payload)
+
+        pdf_file = SimpleUploadedFile("notes.pdf", b"%PDF-1.4", content_type="application/pdf")
+        with patch("cards.views.ingest_document", return_value=1):
+            authenticated_client.post(
+                f"/api/decks/{test_deck.id}/upload-document/",
+                {"file": pdf_file},
+                format="multipart",
+            )
+
+        response = authenticated_client.post("/api/agent/flashcard/backside/", payload)
+
+        assert response["X-Agent-Cache"] == "miss"
+        assert mock_invoke.call_count == 2
+
+    @patch("agent.llm_graph.app.invoke")
+    def test_blocked_content_not_cached(
+        self, mock_invoke, authenticated_client, test_deck
+    ):
+        """Should not cache safety rejections."""
+        mock_invoke.return_value = {"is_safe": False, "safety_reason": "Unsafe"}
+        payload = {"front": "bad", "deck_id": test_deck.id}
+
+        authenticated_client.post("/api/agent/flashcard/backside/", payload)
+        authenticated_client.post("/api/agent/flashcard/backside/", payload)
+
+        assert mock_invoke.call_count == 2
+
 @pytest.mark.django_db
 class TestFlashcardBacksideRevisionView:
     """Tests for FlashcardBacksideRevisionView endpoint."""
@@ -199,7 +269,7 @@ class TestRapidFlashcardBacksideView:
         response = authenticated_client.post("/api/agent/flashcard/rapid/backside", {})
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
-    @patch("agent.views.llm")
+    @patch("agent.views.rapid_llm")
     def test_successful_rapid_generation(self, mock_llm, authenticated_client):
         """Should generate flashcard back quickly."""
         mock_response = MagicMock()
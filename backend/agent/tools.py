@@ -1,26 +1,28 @@
+import asyncio
 import logging
 import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 from langchain_community.tools.tavily_search import TavilySearchResults
 
+from common.breakers import embeddings_breaker, supabase_breaker, tavily_breaker
+from uploads.services.clients import SharedClient, is_connection_error
 # Reuse the ingestion utilities from the uploads app
-from uploads.services.document_ingestion import (
-    _build_embedding_model,
-    _build_supabase_client,
-)
-
-logger = logging.getLogger(__name__)
+from uploads.services.document_ingestion import _build_embedding_model, discard_failed_clients
+from uploads.services.lexical_index import fuse_ranked, search_deck_index
+from uploads.services.vector_store import get_vector_store
 
-@tool
-def web_search_tool(query: str) -> str:
-    """Web search via Tavily.
+from .cache import normalize_front, web_search_cache, web_search_key
 
-    If `TAVILY_API_KEY` is missing or invalid, this tool returns an empty string and
-    logs a warning instead of raising, so the agent can continue without web search.
-    """
+logger = logging.getLogger(__name__)
 
+def _tavily_api_key():
     tavily_api_key = getattr(settings, "TAVILY_API_KEY", None) or os.getenv("TAVILY_API_KEY")
     if not tavily_api_key:
         # When running tests we still want the tool pipeline to exercise the LangChain
@@ -30,53 +32,264 @@ def web_search_tool(query: str) -> str:
             tavily_api_key = "test-key"
         else:
             logger.warning("TAVILY_API_KEY not set; web search disabled.")
-            return "[Web search unavailable]"
+    return tavily_api_key
+
+
+# One Tavily tool per process (and API key), reused across calls
+_tavily_clients = SharedClient(
+    "tavily", lambda api_key: TavilySearchResults(max_results=3, tavily_api_key=api_key)
+)
 
+# Web search calls made under record_web_searches(), for generation_meta
+_web_search_log: ContextVar[Optional[list]] = ContextVar("web_search_log", default=None)
+
+
+@contextmanager
+def record_web_searches():
+    """Collect {"cache", "latency_ms", "saved_ms"} for each web search in this context."""
+    log: list = []
+    token = _web_search_log.set(log)
     try:
-        tavily = TavilySearchResults(max_results=3, tavily_api_key=tavily_api_key)
-        result = tavily.invoke({"query": query})
-        return str(result) if result is not None else ""
+        yield log
+    finally:
+        _web_search_log.reset(token)
+
+
+def _record_web_search(cache: str, started: float, saved: float = 0.0) -> None:
+    log = _web_search_log.get()
+    if log is not None:
+        log.append(
+            {
+                "cache": cache,
+                "latency_ms": round((time.monotonic() - started) * 1000, 1),
+                "saved_ms": round(saved * 1000, 1),
+            }
+        )
+
+
+def _cached_web_search(key: str, started: float) -> Optional[str]:
+    cached = web_search_cache.get(key)
+    if cached is None:
+        return None
+    text, cost = cached
+    _record_web_search("hit", started, saved=cost)
+    return text
+
+
+def _store_web_search(key: str, result, started: float) -> str:
+    text = str(result) if result is not None else ""
+    # Tavily reports failures as a string instead of a result list; don't cache those
+    if isinstance(result, list) and result:
+        web_search_cache.set(key, (text, time.monotonic() - started))
+        _record_web_search("miss", started)
+    else:
+        _record_web_search("error", started)
+    return text
+
+
+def _web_search_failed(exc: Exception, tavily, started: float) -> str:
+    logger.warning("Tavily web search failed (%s); continuing without web search.", exc)
+    if tavily is not None and is_connection_error(exc):
+        _tavily_clients.discard(tavily)
+    _record_web_search("error", started)
+    return "[Web search unavailable]"
+
+
+def _web_search(query: str) -> str:
+    """Web search via Tavily.
+
+    If `TAVILY_API_KEY` is missing or invalid, this tool returns an empty string and
+    logs a warning instead of raising, so the agent can continue without web search.
+    """
+
+    tavily_api_key = _tavily_api_key()
+    if not tavily_api_key:
+        return "[Web search unavailable]"
+
+    started = time.monotonic()
+    key = web_search_key(query)
+    cached = _cached_web_search(key, started)
+    if cached is not None:
+        return cached
+
+    tavily = None
+    try:
+        with tavily_breaker.guard() as call:
+            tavily = _tavily_clients.get((tavily_api_key,))
+            result = tavily.invoke({"query": query})
+            if not isinstance(result, list):
+                # Rate limits and bad keys come back as an error string
+                call.failed()
+    except Exception as exc:
+        return _web_search_failed(exc, tavily, started)
+    return _store_web_search(key, result, started)
+
+
+async def _aweb_search(query: str) -> str:
+    tavily_api_key = _tavily_api_key()
+    if not tavily_api_key:
+        return "[Web search unavailable]"
+
+    started = time.monotonic()
+    key = web_search_key(query)
+    cached = _cached_web_search(key, started)
+    if cached is not None:
+        return cached
+
+    tavily = None
+    try:
+        with tavily_breaker.guard() as call:
+            tavily = _tavily_clients.get((tavily_api_key,))
+            result = await tavily.ainvoke({"query": query})
+            if not isinstance(result, list):
+                # Rate limits and bad keys come back as an error string
+                call.failed()
     except Exception as exc:
-        logger.warning("Tavily web search failed (%s); continuing without web search.", exc)
-        return "[Web search unavailable]"  
+        return _web_search_failed(exc, tavily, started)
+    return _store_web_search(key, result, started)
+
 
-@tool
-def search_deck_documents(query: str, deck_id: int) -> str:
+web_search_tool = StructuredTool.from_function(
+    func=_web_search,
+    coroutine=_aweb_search,
+    name="web_search_tool",
+)
+
+
+def web_search_available() -> bool:
+    """False while the Tavily circuit breaker is open."""
+    return tavily_breaker.available()
+
+
+# Chunks returned per search
+MATCH_COUNT = 4
+
+
+def _format_matches(rows) -> str:
+    if rows:
+        content = "\n\n".join(doc.get('content', '') for doc in rows if doc.get('content'))
+        if content.strip():
+            return content
+
+    # Explicit message for empty results so the agent knows to use its own knowledge
+    return "[No matching documents found]"
+
+
+def _search_texts(query: str, queries: Optional[List[str]]) -> List[str]:
+    """The query plus extra phrasings, de-duplicated and capped."""
+    texts: List[str] = []
+    seen = set()
+    for text in [query, *(queries or [])]:
+        key = normalize_front(text)
+        if key and key not in seen:
+            seen.add(key)
+            texts.append(text)
+    return texts[: getattr(settings, "AGENT_SEARCH_MAX_QUERIES", 4)]
+
+
+def _embed_texts(embeddings, texts: List[str]) -> List[List[float]]:
+    # Several phrasings go to the embedding API as one batch
+    if len(texts) == 1:
+        return [embeddings.embed_query(texts[0])]
+    return embeddings.embed_documents(texts)
+
+
+async def _aembed_texts(embeddings, texts: List[str]) -> List[List[float]]:
+    if len(texts) == 1:
+        return [await embeddings.aembed_query(texts[0])]
+    return await embeddings.aembed_documents(texts)
+
+
+def _lexical_matches(texts: List[str], deck_id: int) -> List[List[Dict[str, Any]]]:
+    if not getattr(settings, "AGENT_HYBRID_SEARCH", True):
+        return []
+    try:
+        return [search_deck_index(deck_id, text, k=MATCH_COUNT) for text in texts]
+    except Exception as exc:
+        logger.warning("Lexical deck search failed (%s); using vector results only.", exc)
+        return []
+
+
+def _hybrid_result(vector_rankings, lexical_rankings, query_count: int) -> str:
+    """
+    Fuse the vector and BM25 rankings of every phrasing into one de-duplicated
+    list; None vector rankings means vector search failed.
+    """
+    if vector_rankings is None and not any(lexical_rankings):
+        return "[Document search unavailable]"
+    rrf_k = getattr(settings, "AGENT_RRF_K", 60)
+    fused = fuse_ranked(
+        *(vector_rankings or []), *lexical_rankings, k=MATCH_COUNT * query_count, rrf_k=rrf_k
+    )
+    return _format_matches(fused)
+
+
+def _search_deck_documents(query: str, deck_id: int, queries: Optional[List[str]] = None) -> str:
     """Search deck-specific documents for relevant content.
     
     Args:
         query: The search query. Can be a term, question, or phrase to search for.
-               For best results with abbreviations, also try the full term 
-               (e.g., 'backpropagation' instead of just 'backprop').
+               Matches exact terms (including abbreviations such as 'backprop')
+               as well as meaning.
         deck_id: The deck ID to scope the search.
+        queries: Optional extra phrasings of the same concept (synonyms, the
+                 full form of an abbreviation). They are searched in the same
+                 call, so pass them here instead of calling the tool again.
     
     Returns:
         Relevant document content if found, or a message indicating no results.
     """
+    texts = _search_texts(query, queries)
+    if not texts:
+        return "[No matching documents found]"
+    embeddings = None
+    vector_rankings = None
     try:
         embeddings = _build_embedding_model()
-        client = _build_supabase_client()
-
-        query_name = getattr(settings, "SUPABASE_QUERY_NAME", "match_documents")
-
-        query_embedding = embeddings.embed_query(query)
-
-        payload = {
-            "query_embedding": query_embedding,
-            "match_count": 4,
-            "filter": {"deck_id": int(deck_id)},
-        }
-
-        # supabase-py v2 RPC call
-        response = client.rpc(query_name, payload).execute()
-        if response.data:
-            content = "\n\n".join(doc.get('content', '') for doc in response.data if doc.get('content'))
-            if content.strip():
-                return content
-        
-        # Explicit message for empty results so the agent knows to use its own knowledge
-        return "[No matching documents found]"
-
+        vectors = _embed_texts(embeddings, texts)
+        vector_rankings = get_vector_store().search_many(deck_id, vectors, k=MATCH_COUNT)
     except Exception as exc:
         logger.warning("search_deck_documents failed (%s); continuing without RAG.", exc)
-        return "[Document search unavailable]"
+        discard_failed_clients(exc, embeddings)
+
+    return _hybrid_result(vector_rankings, _lexical_matches(texts, deck_id), len(texts))
+
+
+async def _asearch_deck_documents(
+    query: str, deck_id: int, queries: Optional[List[str]] = None
+) -> str:
+    texts = _search_texts(query, queries)
+    if not texts:
+        return "[No matching documents found]"
+
+    async def vector_search():
+        embeddings = None
+        try:
+            embeddings = _build_embedding_model()
+            vectors = await _aembed_texts(embeddings, texts)
+            return await get_vector_store().asearch_many(deck_id, vectors, k=MATCH_COUNT)
+        except Exception as exc:
+            logger.warning("search_deck_documents failed (%s); continuing without RAG.", exc)
+            discard_failed_clients(exc, embeddings)
+            return None
+
+    vector_rankings, lexical_rankings = await asyncio.gather(
+        vector_search(), sync_to_async(_lexical_matches)(texts, deck_id)
+    )
+    return _hybrid_result(vector_rankings, lexical_rankings, len(texts))
+
+
+search_deck_documents = StructuredTool.from_function(
+    func=_search_deck_documents,
+    coroutine=_asearch_deck_documents,
+    name="search_deck_documents",
+)
+
+
+def deck_search_available() -> bool:
+    """False while the embedding (or, for the Supabase store, Supabase) breaker is open."""
+    if not embeddings_breaker.available():
+        return False
+    return getattr(settings, "AGENT_VECTOR_STORE", "supabase") != "supabase" or (
+        supabase_breaker.available()
+    )
@@ -2,19 +2,65 @@
 
 from django.urls import path
 
+from .async_views import flashcard_backside_async, flashcard_backside_async_stream
 from .views import (
+    AgentHealthView,
+    AgentMetricsView,
+    FlashcardBatchStreamView,
+    FlashcardBatchView,
     FlashcardBacksideRevisionView,
+    FlashcardBacksideStreamView,
     FlashcardBacksideView,
+    FlashcardJobDetailView,
+    FlashcardJobView,
     RapidFlashcardBacksideRevisionView,
+    RapidFlashcardBacksideStreamView,
     RapidFlashcardBacksideView,
 )
 
 urlpatterns = [
+    path("metrics/", AgentMetricsView.as_view(), name="agent-metrics"),
+    path("health/", AgentHealthView.as_view(), name="agent-health"),
     path(
         "flashcard/backside/",
         FlashcardBacksideView.as_view(),
         name="flashcard-backside",
     ),
+    path(
+        "flashcard/backside/stream/",
+        FlashcardBacksideStreamView.as_view(),
+        name="flashcard-backside-stream",
+    ),
+    path(
+        "flashcard/backside/async/",
+        flashcard_backside_async,
+        name="flashcard-backside-async",
+    ),
+    path(
+        "flashcard/backside/async/stream/",
+        flashcard_backside_async_stream,
+        name="flashcard-backside-async-stream",
+    ),
+    path(
+        "flashcard/backside/batch/",
+        FlashcardBatchView.as_view(),
+        name="flashcard-backside-batch",
+    ),
+    path(
+        "flashcard/backside/batch/stream/",
+        FlashcardBatchStreamView.as_view(),
+        name="flashcard-backside-batch-stream",
+    ),
+    path(
+        "flashcard/backside/jobs/",
+        FlashcardJobView.as_view(),
+        name="flashcard-backside-jobs",
+    ),
+    path(
+        "flashcard/backside/jobs/<uuid:job_id>/",
+        FlashcardJobDetailView.as_view(),
+        name="flashcard-backside-job",
+    ),
     path(
         "flashcard/backside/revise/",
         FlashcardBacksideRevisionView.as_view(),
@@ -30,6 +76,11 @@ path(
         RapidFlashcardBacksideView.as_view(),
         name="flashcard-backside-rapid",
     ),
+    path(
+        "flashcard/rapid/backside/stream/",
+        RapidFlashcardBacksideStreamView.as_view(),
+        name="flashcard-backside-rapid-stream",
+    ),
     path(
         "flashcard/rapid/backside/revise",
         RapidFlashcardBacksideRevisionView.as_view(),
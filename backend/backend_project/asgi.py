@@ -1,6 +1,11 @@
 """ASGI config for backend_project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+
+The async agent endpoints (``/api/agent/flashcard/backside/async/...``) only pay
+off when served from here, e.g. ``uvicorn backend_project.asgi:application``.
+The DRF views keep working under ASGI but run serialized on one thread, so
+deployments that only use them should stay on the WSGI gunicorn entry point.
 """
 
 import os
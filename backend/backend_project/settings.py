@@ -143,6 +143,151 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
 SUPABASE_VECTOR_TABLE = "documents"
 SUPABASE_QUERY_NAME = "match_documents"
+# Connection pool of the process-wide Supabase client (keep-alive sockets are
+# reused across tool calls and uploads).
+SUPABASE_HTTP_MAX_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "20"))
+SUPABASE_HTTP_MAX_KEEPALIVE = int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", "10"))
+SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+SUPABASE_HTTP_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_HTTP_TIMEOUT_SECONDS", "30"))
+
+# Vector store for deck documents: "supabase" (pgvector) or "local"
+# (memory-mapped per-deck files under AGENT_VECTOR_STORE_PATH, no network).
+AGENT_VECTOR_STORE = os.getenv("AGENT_VECTOR_STORE", "supabase")
+AGENT_VECTOR_STORE_PATH = Path(os.getenv("AGENT_VECTOR_STORE_PATH", BASE_DIR / "vector_store"))
+# Hybrid deck search: a per-deck BM25 index built at upload time, fused with
+# the vector results by reciprocal-rank fusion (score = sum 1 / (RRF_K + rank)).
+AGENT_HYBRID_SEARCH = os.getenv("AGENT_HYBRID_SEARCH", "True").lower() == "true"
+AGENT_RRF_K = int(os.getenv("AGENT_RRF_K", "60"))
+AGENT_LEXICAL_INDEX_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_LEXICAL_INDEX_CACHE_MAX_ENTRIES", "128"))
+# Phrasings search_deck_documents accepts per call (embedded in one batch,
+# searched concurrently).
+AGENT_SEARCH_MAX_QUERIES = int(os.getenv("AGENT_SEARCH_MAX_QUERIES", "4"))
+
+# Agent pipeline tuning
+# Response cache for generated backsides; set max entries to 0 to disable.
+AGENT_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_RESPONSE_CACHE_MAX_ENTRIES", "512"))
+AGENT_RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("AGENT_RESPONSE_CACHE_TTL_SECONDS", "3600"))
+# Per (user, deck) profile, deck name and rendered style used by
+# context_builder_node; checked against UserProfile.updated_at and a per-deck
+# version in CACHES on every read, so edits made by other workers are seen.
+AGENT_PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_PROFILE_CACHE_MAX_ENTRIES", "2048"))
+AGENT_PROFILE_CACHE_TTL_SECONDS = int(os.getenv("AGENT_PROFILE_CACHE_TTL_SECONDS", "900"))
+# Embedding cache shared by deck search and document ingestion: an in-process
+# LRU of MAX_ENTRIES vectors in front of a database table (PERSIST). Rows older
+# than RETENTION_DAYS are removed by `manage.py prune_embedding_cache`.
+AGENT_EMBEDDING_CACHE = os.getenv("AGENT_EMBEDDING_CACHE", "True").lower() == "true"
+AGENT_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_EMBEDDING_CACHE_MAX_ENTRIES", "2048"))
+AGENT_EMBEDDING_CACHE_PERSIST = os.getenv("AGENT_EMBEDDING_CACHE_PERSIST", "True").lower() == "true"
+AGENT_EMBEDDING_CACHE_RETENTION_DAYS = int(os.getenv("AGENT_EMBEDDING_CACHE_RETENTION_DAYS", "30"))
+# Worker threads for work that overlaps inside a graph node.
+AGENT_THREAD_POOL_SIZE = int(os.getenv("AGENT_THREAD_POOL_SIZE", "16"))
+# Run the guardrail concurrently with the first agent step instead of before it.
+AGENT_SPECULATIVE_GUARDRAIL = os.getenv("AGENT_SPECULATIVE_GUARDRAIL", "False").lower() == "true"
+# Worker threads for tool calls, kept apart from the pool above. Per-call tool
+# timeouts (seconds) start when a worker runs the call; a slow call is
+# answered with a timeout note.
+AGENT_TOOL_POOL_SIZE = int(os.getenv("AGENT_TOOL_POOL_SIZE", "8"))
+AGENT_TOOL_TIMEOUT_SECONDS = float(os.getenv("AGENT_TOOL_TIMEOUT_SECONDS", "20"))
+AGENT_TOOL_TIMEOUTS = {
+    "web_search_tool": float(os.getenv("AGENT_WEB_SEARCH_TIMEOUT_SECONDS", "10")),
+}
+# Web search results by normalized query; set max entries to 0 to disable.
+AGENT_WEB_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_WEB_SEARCH_CACHE_MAX_ENTRIES", "512"))
+AGENT_WEB_SEARCH_CACHE_TTL_SECONDS = int(os.getenv("AGENT_WEB_SEARCH_CACHE_TTL_SECONDS", "21600"))
+# Circuit breakers for Gemini, Supabase and Tavily (common/breakers.py): open
+# when FAILURE_RATE of at least MIN_CALLS calls in the window failed (or took
+# longer than SLOW_CALL_SECONDS), then fail fast for OPEN_SECONDS.
+AGENT_BREAKERS_ENABLED = os.getenv("AGENT_BREAKERS_ENABLED", "True").lower() == "true"
+AGENT_BREAKER_WINDOW_SECONDS = float(os.getenv("AGENT_BREAKER_WINDOW_SECONDS", "60"))
+AGENT_BREAKER_MIN_CALLS = int(os.getenv("AGENT_BREAKER_MIN_CALLS", "5"))
+AGENT_BREAKER_FAILURE_RATE = float(os.getenv("AGENT_BREAKER_FAILURE_RATE", "0.5"))
+AGENT_BREAKER_OPEN_SECONDS = float(os.getenv("AGENT_BREAKER_OPEN_SECONDS", "30"))
+AGENT_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("AGENT_BREAKER_SLOW_CALL_SECONDS", "8"))
+# Search the deck for the front in parallel with the guardrail and put the
+# matches in the agent prompt, saving the agent's first search round-trip.
+# With AGENT_SPECULATIVE_GUARDRAIL the search runs inside the speculative
+# step, before the first agent call and alongside the guardrail.
+AGENT_PREFETCH_RAG = os.getenv("AGENT_PREFETCH_RAG", "True").lower() == "true"
+# Batch generation: max fronts per request and how many run at once.
+AGENT_BATCH_MAX_ITEMS = int(os.getenv("AGENT_BATCH_MAX_ITEMS", "50"))
+AGENT_BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "4"))
+# Local pre-check that lets clear drafts skip the LLM critic. Drafts scoring at
+# least PASS_SCORE (share of style checks passed) are accepted; AUDIT_RATE of
+# decisive drafts still go to the LLM to measure agreement.
+AGENT_PRECRITIC_ENABLED = os.getenv("AGENT_PRECRITIC_ENABLED", "True").lower() == "true"
+AGENT_PRECRITIC_PASS_SCORE = float(os.getenv("AGENT_PRECRITIC_PASS_SCORE", "1.0"))
+AGENT_PRECRITIC_AUDIT_RATE = float(os.getenv("AGENT_PRECRITIC_AUDIT_RATE", "0.05"))
+# Local guardrail tier: blocks clear harm patterns and allows only recognized
+# study questions without the LLM. Off until validated against LLM verdicts.
+# Inputs longer than MAX_CHARS always escalate. Verdicts are memoized per front.
+AGENT_LOCAL_GUARDRAIL = os.getenv("AGENT_LOCAL_GUARDRAIL", "False").lower() == "true"
+AGENT_LOCAL_GUARDRAIL_MAX_CHARS = int(os.getenv("AGENT_LOCAL_GUARDRAIL_MAX_CHARS", "200"))
+AGENT_GUARDRAIL_MEMO_MAX_ENTRIES = int(os.getenv("AGENT_GUARDRAIL_MEMO_MAX_ENTRIES", "4096"))
+AGENT_GUARDRAIL_MEMO_TTL_SECONDS = int(os.getenv("AGENT_GUARDRAIL_MEMO_TTL_SECONDS", "86400"))
+# Per-node latency/token instrumentation (read when the graph is built, so a
+# restart is needed to toggle). IN_META also returns the per-run trace in
+# generation_meta["trace"]; WINDOW is the samples kept per histogram.
+AGENT_METRICS_ENABLED = os.getenv("AGENT_METRICS_ENABLED", "False").lower() == "true"
+AGENT_METRICS_IN_META = os.getenv("AGENT_METRICS_IN_META", "False").lower() == "true"
+AGENT_METRICS_WINDOW = int(os.getenv("AGENT_METRICS_WINDOW", "1024"))
+
+# Agent prompt compaction: superseded drafts/feedback are dropped and older
+# tool results truncated so each agent call stays under this token estimate.
+AGENT_PROMPT_COMPACTION = os.getenv("AGENT_PROMPT_COMPACTION", "True").lower() == "true"
+AGENT_PROMPT_TOKEN_BUDGET = int(os.getenv("AGENT_PROMPT_TOKEN_BUDGET", "6000"))
+
+# Generation checkpoints (final graph state per generation_id, used to resume
+# revisions). Older checkpoints are ignored and removed by
+# `manage.py prune_agent_checkpoints`; revisions append to the same thread.
+AGENT_CHECKPOINT_TTL_SECONDS = int(os.getenv("AGENT_CHECKPOINT_TTL_SECONDS", str(7 * 86400)))
+AGENT_CHECKPOINT_MAX_PER_THREAD = int(os.getenv("AGENT_CHECKPOINT_MAX_PER_THREAD", "5"))
+
+# Per-request deadlines (deadline_ms body field or X-Agent-Deadline-Ms header):
+# a stage is skipped once less than its reserve (seconds) is left.
+AGENT_DEADLINE_RESERVES = {
+    "web_search": float(os.getenv("AGENT_DEADLINE_WEB_SEARCH_RESERVE", "8")),
+    "tools": float(os.getenv("AGENT_DEADLINE_TOOLS_RESERVE", "5")),
+    "critic": float(os.getenv("AGENT_DEADLINE_CRITIC_RESERVE", "3")),
+}
+
+# Queued generations (agent/flashcard/backside/jobs/, run by
+# `manage.py run_agent_worker`). A claimed job is invisible to other workers
+# for VISIBILITY_TIMEOUT seconds; failures retry with doubling backoff.
+AGENT_JOB_MAX_ATTEMPTS = int(os.getenv("AGENT_JOB_MAX_ATTEMPTS", "3"))
+AGENT_JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.getenv("AGENT_JOB_VISIBILITY_TIMEOUT_SECONDS", "300"))
+AGENT_JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("AGENT_JOB_RETRY_BACKOFF_SECONDS", "5"))
+AGENT_JOB_POLL_SECONDS = float(os.getenv("AGENT_JOB_POLL_SECONDS", "1"))
+
+# Chat model per LLM call site (see agent/llm_routing.py). Classification
+# routes run on the lite model and fall back to the main model on errors.
+AGENT_LLM_MODEL = os.getenv("AGENT_LLM_MODEL", "gemini-2.0-flash")
+AGENT_LLM_LITE_MODEL = os.getenv("AGENT_LLM_LITE_MODEL", "gemini-2.0-flash-lite")
+AGENT_LLM_ROUTES = {
+    "agent": {"model": AGENT_LLM_MODEL, "temperature": 0.3, "timeout": 60, "fallback": None},
+    "guardrail": {"model": AGENT_LLM_LITE_MODEL, "temperature": 0.0, "timeout": 15, "fallback": AGENT_LLM_MODEL},
+    "critic": {"model": AGENT_LLM_LITE_MODEL, "temperature": 0.0, "timeout": 20, "fallback": AGENT_LLM_MODEL},
+    "rapid": {"model": AGENT_LLM_MODEL, "temperature": 0.3, "timeout": 30, "fallback": None},
+    "preference_tuning": {"model": AGENT_LLM_LITE_MODEL, "temperature": 0.0, "timeout": 20, "fallback": AGENT_LLM_MODEL},
+}
+
+# Django cache. Local memory is per process; point CACHE_BACKEND at a shared
+# backend (e.g. django.core.cache.backends.db.DatabaseCache after
+# `manage.py createcachetable`, or Redis) so locks work across workers.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "genki-default"),
+    }
+}
+
+# Single-flight: identical in-flight generations (same cache key) share one
+# graph run. CROSS_PROCESS also coordinates workers through the cache above.
+# Waiters give up after WAIT_SECONDS and run the graph themselves.
+AGENT_SINGLEFLIGHT = os.getenv("AGENT_SINGLEFLIGHT", "True").lower() == "true"
+AGENT_SINGLEFLIGHT_CROSS_PROCESS = os.getenv("AGENT_SINGLEFLIGHT_CROSS_PROCESS", "True").lower() == "true"
+AGENT_SINGLEFLIGHT_WAIT_SECONDS = float(os.getenv("AGENT_SINGLEFLIGHT_WAIT_SECONDS", "90"))
+AGENT_SINGLEFLIGHT_POLL_SECONDS = float(os.getenv("AGENT_SINGLEFLIGHT_POLL_SECONDS", "0.1"))
+AGENT_SINGLEFLIGHT_RESULT_TTL_SECONDS = int(os.getenv("AGENT_SINGLEFLIGHT_RESULT_TTL_SECONDS", "30"))
 
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
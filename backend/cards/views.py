@@ -4,6 +4,8 @@ from datetime import timedelta
 
 from accounts.models import UserProfile
 from accounts.services.preferences import update_profile_from_review
+from agent.cache import invalidate_deck_profile_context, invalidate_deck_responses
+from common.breakers import CircuitOpenError
 from django.utils import timezone
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
@@ -12,7 +14,7 @@ from rest_framework.decorators import action
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from uploads.serializers import DeckDocumentUploadSerializer
+from uploads.serializers import DeckDocumentSerializer, DeckDocumentUploadSerializer
 from uploads.services.document_ingestion import DocumentIngestionError, ingest_document
 
 from .models import Card, Deck
@@ -72,6 +74,8 @@ class DeckViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_409_CONFLICT,
             )
         self.perform_update(serializer)
+        # Generations show the deck name to the agent
+        invalidate_deck_profile_context(instance.id)
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -99,6 +103,9 @@ class DeckViewSet(viewsets.ModelViewSet):
                     },
                 ),
             ),
+            503: openapi.Response(
+                description="Gemini or Supabase is failing and its circuit breaker is open.",
+            ),
         },
         operation_description=(
             "Upload a PDF, split it into chunks, embed the content, and store vectors in Supabase."
@@ -125,6 +132,15 @@ class DeckViewSet(viewsets.ModelViewSet):
                 {"error": "INGESTION_FAILED", "reason": str(exc)},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except CircuitOpenError as exc:
+            return Response(
+                {"error": "SERVICE_UNAVAILABLE", "reason": str(exc)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(max(1, round(exc.retry_in)))},
+            )
+
+        # New source material can change answers for this deck
+        invalidate_deck_responses(deck.id)
 
         return Response(
             {
@@ -135,6 +151,18 @@ class DeckViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED,
         )
 
+    @swagger_auto_schema(
+        method="get",
+        responses={200: DeckDocumentSerializer(many=True)},
+        operation_description="List the documents ingested into a deck, newest first.",
+    )
+    @action(detail=True, methods=["get"], url_path="documents")
+    def documents(self, request, pk=None):
+        """List the documents uploaded to a deck."""
+        deck = self.get_object()
+        serializer = DeckDocumentSerializer(deck.documents.all(), many=True)
+        return Response(serializer.data)
+
 
 class CardViewSet(viewsets.ModelViewSet):
     """CRUD for the cards scoped to the authenticated user."""
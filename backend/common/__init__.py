@@ -0,0 +1,6 @@
+"""
+Infrastructure shared by the apps (circuit breakers, in-process caches).
+
+Nothing here imports an app, so uploads, cards and agent can all depend on it
+without importing each other.
+"""
@@ -0,0 +1,236 @@
+"""
+Circuit breakers for the external services (Gemini, Supabase, Tavily).
+
+Without them, every call during an outage waits for its own timeout before
+failing, and the ReAct loop repeats that for each tool turn. A breaker counts
+the outcomes of recent calls in a sliding window (AGENT_BREAKER_WINDOW_SECONDS)
+and opens once at least AGENT_BREAKER_MIN_CALLS calls were made and the
+failure rate reaches AGENT_BREAKER_FAILURE_RATE. Calls slower than
+AGENT_BREAKER_SLOW_CALL_SECONDS count as failures, so a service that hangs
+trips the breaker as well as one that errors.
+
+- closed: calls go through.
+- open: calls fail immediately with CircuitOpenError for
+  AGENT_BREAKER_OPEN_SECONDS.
+- half_open: one probe call is let through; success closes the breaker,
+  failure opens it again.
+
+The agent unbinds tools whose breaker is open (see agent.llm_graph._offered_tools)
+and `breaker_stats()` is served by the agent health endpoint. State is per
+process.
+AGENT_BREAKER_OVERRIDES adjusts the settings per breaker name, e.g.
+{"tavily": {"open_seconds": 60}}.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULTS = {
+    "window_seconds": 60.0,
+    "min_calls": 5,
+    "failure_rate": 0.5,
+    "open_seconds": 30.0,
+    "slow_call_seconds": 8.0,
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit is open; retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class _Call:
+    """An admitted call; mark it failed when the service answered with an error value."""
+
+    def __init__(self, probe: bool):
+        self.probe = probe
+        self.started = time.monotonic()
+        self.ok = True
+
+    def failed(self) -> None:
+        self.ok = False
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        # (finished_at, failed) for calls inside the window
+        self._outcomes: deque = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self.counts = {"opened": 0, "rejected": 0}
+
+    def _config(self) -> Dict[str, Any]:
+        overrides = (getattr(settings, "AGENT_BREAKER_OVERRIDES", {}) or {}).get(self.name, {})
+        config = {
+            key: getattr(settings, f"AGENT_BREAKER_{key.upper()}", default)
+            for key, default in DEFAULTS.items()
+        }
+        return {**config, **overrides}
+
+    @staticmethod
+    def enabled() -> bool:
+        return getattr(settings, "AGENT_BREAKERS_ENABLED", True)
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self._config()["open_seconds"]:
+            return HALF_OPEN
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def available(self) -> bool:
+        """False while open; half-open counts as available so a probe can go out."""
+        return not self.enabled() or self.state != OPEN
+
+    def admit(self) -> _Call:
+        """Admit a call or raise CircuitOpenError."""
+        if not self.enabled():
+            return _Call(probe=False)
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == CLOSED:
+                return _Call(probe=False)
+            if state == HALF_OPEN and not self._probe_pending(now):
+                self._state = HALF_OPEN
+                self._probe_started = now
+                return _Call(probe=True)
+            self.counts["rejected"] += 1
+            retry_in = max(0.0, self._opened_at + self._config()["open_seconds"] - now)
+        raise CircuitOpenError(self.name, retry_in)
+
+    def _probe_pending(self, now: float) -> bool:
+        # A probe that never reported back (e.g. an abandoned stream) stops blocking after a while
+        return (
+            self._probe_started is not None
+            and now - self._probe_started < self._config()["window_seconds"]
+        )
+
+    def record(self, call: _Call, count_slow: bool = True) -> None:
+        if not self.enabled():
+            return
+        config = self._config()
+        now = time.monotonic()
+        failed = not call.ok or (count_slow and now - call.started > config["slow_call_seconds"])
+        with self._lock:
+            if call.probe:
+                self._probe_started = None
+                if failed:
+                    self._open(now)
+                else:
+                    logger.info("Circuit %s closed after a successful probe.", self.name)
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            if self._state != CLOSED:
+                # Finished after the breaker opened; the probe decides
+                return
+            self._outcomes.append((now, failed))
+            while self._outcomes and now - self._outcomes[0][0] > config["window_seconds"]:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            failures = sum(1 for _, outcome in self._outcomes if outcome)
+            if calls >= config["min_calls"] and failures / calls >= config["failure_rate"]:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        logger.warning("Circuit %s opened; failing fast.", self.name)
+        self._state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self.counts["opened"] += 1
+
+    @contextmanager
+    def guard(self, count_slow: bool = True):
+        """
+        with breaker.guard() as call: ... -- raises CircuitOpenError when open,
+        records an exception (re-raised) or call.failed() as a failure.
+        """
+        call = self.admit()
+        try:
+            yield call
+        except Exception:
+            call.failed()
+            raise
+        finally:
+            self.record(call, count_slow=count_slow)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._outcomes.clear()
+            self._state = CLOSED
+            self._probe_started = None
+            self.counts = {"opened": 0, "rejected": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, failed in self._outcomes if failed)
+            retry_in: Optional[float] = None
+            if state == OPEN:
+                retry_in = round(self._opened_at + self._config()["open_seconds"] - now, 1)
+            return {
+                "state": state,
+                "calls": calls,
+                "failures": failures,
+                "failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "retry_in_seconds": retry_in,
+                **self.counts,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+# Chat models get one breaker per model name ("gemini:<model>", see agent.llm_routing)
+supabase_breaker = get_breaker("supabase")
+embeddings_breaker = get_breaker("gemini_embeddings")
+tavily_breaker = get_breaker("tavily")
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in sorted(breakers, key=lambda b: b.name)}
+
+
+def reset_breakers() -> None:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    for breaker in breakers:
+        breaker.reset()
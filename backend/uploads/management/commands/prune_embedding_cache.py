@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from uploads.services.embedding_cache import prune_embedding_cache
+
+
+class Command(BaseCommand):
+    help = "Delete stored embeddings older than AGENT_EMBEDDING_CACHE_RETENTION_DAYS."
+
+    def handle(self, *args, **options):
+        deleted = prune_embedding_cache()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} stored embeddings."))
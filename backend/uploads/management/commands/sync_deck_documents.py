@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from cards.models import Deck
+from uploads.services.document_registry import record_document
+from uploads.services.vector_store import get_vector_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Register documents for decks that have chunks in the vector store but no "
+        "DeckDocument rows (uploads from before the document registry)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--deck", type=int, action="append", help="Only sync these deck ids.")
+
+    def handle(self, *args, **options):
+        decks = Deck.objects.filter(documents__isnull=True)
+        if options["deck"]:
+            decks = decks.filter(id__in=options["deck"])
+        store = get_vector_store()
+
+        synced = 0
+        for deck_id in decks.values_list("id", flat=True):
+            chunks = store.count(deck_id)
+            if chunks:
+                record_document(deck_id, "", "", chunks, 0)
+                synced += 1
+        self.stdout.write(self.style.SUCCESS(f"Registered documents for {synced} decks."))
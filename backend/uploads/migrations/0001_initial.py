@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=128)),
+                ('dimensions', models.PositiveIntegerField()),
+                ('vector', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
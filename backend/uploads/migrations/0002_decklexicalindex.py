@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0006_unique_deck_name_per_user'),
+        ('uploads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeckLexicalIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.JSONField(default=dict)),
+                ('chunk_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deck', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='lexical_index', to='cards.deck')),
+            ],
+        ),
+    ]
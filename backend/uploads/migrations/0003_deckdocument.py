@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0006_unique_deck_name_per_user'),
+        ('uploads', '0002_decklexicalindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeckDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(blank=True, max_length=255)),
+                ('content_hash', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('chunk_count', models.PositiveIntegerField(default=0)),
+                ('bytes', models.PositiveBigIntegerField(default=0)),
+                ('ingested_at', models.DateTimeField(auto_now_add=True)),
+                ('deck', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='cards.deck')),
+            ],
+            options={
+                'ordering': ['-ingested_at', '-id'],
+            },
+        ),
+    ]
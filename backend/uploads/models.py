@@ -0,0 +1,56 @@
+from django.db import models
+
+
+class EmbeddingCacheEntry(models.Model):
+    """
+    A stored embedding, keyed by a hash of the model, task type and text.
+    The vector is packed little-endian float32 (4 bytes per dimension).
+    """
+
+    key = models.CharField(max_length=64, primary_key=True)
+    model = models.CharField(max_length=128)
+    dimensions = models.PositiveIntegerField()
+    vector = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Embedding({self.model}, {self.key[:12]})"
+
+
+class DeckLexicalIndex(models.Model):
+    """
+    BM25 index over a deck's document chunks, built at ingest time and
+    queried next to the vector store (see services/lexical_index.py).
+    """
+
+    deck = models.OneToOneField(
+        "cards.Deck", on_delete=models.CASCADE, related_name="lexical_index"
+    )
+    index = models.JSONField(default=dict)
+    chunk_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"LexicalIndex(deck={self.deck_id}, chunks={self.chunk_count})"
+
+
+class DeckDocument(models.Model):
+    """
+    One ingested upload. Decks known to have no (chunk_count > 0) rows have
+    nothing to retrieve, so the agent skips deck search for them (see
+    services/document_registry.py).
+    """
+
+    deck = models.ForeignKey("cards.Deck", on_delete=models.CASCADE, related_name="documents")
+    filename = models.CharField(max_length=255, blank=True)
+    # sha256 of the uploaded file; empty for rows backfilled from the vector store
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    chunk_count = models.PositiveIntegerField(default=0)
+    bytes = models.PositiveBigIntegerField(default=0)
+    ingested_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-ingested_at", "-id"]
+
+    def __str__(self):
+        return f"DeckDocument(deck={self.deck_id}, {self.filename!r}, chunks={self.chunk_count})"
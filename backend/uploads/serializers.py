@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from uploads.models import DeckDocument
+
 
 class DeckDocumentUploadSerializer(serializers.Serializer):
     """Serializer to validate uploaded deck documents."""
@@ -11,3 +13,12 @@ class DeckDocumentUploadSerializer(serializers.Serializer):
         if not name.lower().endswith(".pdf"):
             raise serializers.ValidationError("Only PDF uploads are supported.")
         return uploaded
+
+
+class DeckDocumentSerializer(serializers.ModelSerializer):
+    """Read-only view of a document ingested into a deck."""
+
+    class Meta:
+        model = DeckDocument
+        fields = ["id", "deck", "filename", "content_hash", "chunk_count", "bytes", "ingested_at"]
+        read_only_fields = fields
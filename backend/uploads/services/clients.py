@@ -0,0 +1,165 @@
+"""
+Process-wide holders for long-lived API clients.
+
+Building a Supabase client (plus its httpx connection pool) or an embedding
+model on every tool call costs several milliseconds and a fresh TLS handshake
+per request. `SharedClient` keeps one instance per process instead:
+
+- Lazy: the factory runs on first use, not at import time.
+- Keyed: the instance is rebuilt when its configuration key changes
+  (e.g. credentials overridden in tests).
+- Fork-safe: a child process never reuses its parent's instance, whose
+  sockets it shares; it builds its own on first use.
+- Health re-creation: callers `discard()` an instance after a connection-level
+  failure, and the next `get()` builds a fresh one.
+
+`SharedAsyncClient` does the same per event loop, since async httpx pools
+are bound to the loop that created them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_holders: "weakref.WeakSet[_Holder]" = weakref.WeakSet()
+
+
+class _Holder:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+        _holders.add(self)
+
+    def reset(self) -> None:
+        self._counts = {"created": 0, "reused": 0, "discarded": 0}
+
+    def _record(self, name: str) -> None:
+        self._counts[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, **self._counts}
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+
+class SharedClient(_Holder):
+    """One lazily built client per process; `factory(*key)` builds it."""
+
+    def __init__(self, name: str, factory: Callable[..., Any]):
+        self.factory = factory
+        self._instance: Any = None
+        self._key: Optional[tuple] = None
+        self._pid = os.getpid()
+        super().__init__(name)
+
+    def get(self, key: tuple = ()) -> Any:
+        pid = os.getpid()
+        with self._lock:
+            if self._instance is not None and self._pid == pid and self._key == key:
+                self._record("reused")
+                return self._instance
+            self._instance = self.factory(*key)
+            self._key, self._pid = key, pid
+            self._record("created")
+            logger.debug("Created shared %s client (pid %s)", self.name, pid)
+            return self._instance
+
+    def discard(self, instance: Any = None) -> None:
+        """Drop the current instance (only if it is `instance`, when given)."""
+        with self._lock:
+            if self._instance is None or (instance is not None and instance is not self._instance):
+                return
+            self._instance = None
+            self._record("discarded")
+        logger.info("Discarded shared %s client; it will be rebuilt on next use", self.name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._instance = None
+            self._key = None
+        self.reset()
+
+    def _after_fork(self) -> None:
+        super()._after_fork()
+        self._instance = None
+
+
+class SharedAsyncClient(_Holder):
+    """One lazily built client per event loop and configuration key."""
+
+    def __init__(self, name: str, factory: Callable[..., Awaitable[Any]]):
+        self.factory = factory
+        self._instances: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._loop_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = (
+            weakref.WeakKeyDictionary()
+        )
+        super().__init__(name)
+
+    async def aget(self, key: tuple = ()) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            lock = self._loop_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            current = self._instances.get(loop)
+            if current is not None and current[0] == key:
+                self._record("reused")
+                return current[1]
+            instance = await self.factory(*key)
+            self._instances[loop] = (key, instance)
+            self._record("created")
+            return instance
+
+    def discard(self, instance: Any = None) -> None:
+        with self._lock:
+            for loop, (_key, current) in list(self._instances.items()):
+                if instance is None or current is instance:
+                    del self._instances[loop]
+                    self._record("discarded")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._instances.clear()
+            self._loop_locks.clear()
+        self.reset()
+
+    def _after_fork(self) -> None:
+        super()._after_fork()
+        self._instances = weakref.WeakKeyDictionary()
+        self._loop_locks = weakref.WeakKeyDictionary()
+
+
+def _reset_after_fork() -> None:
+    for holder in list(_holders):
+        holder._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """True when `exc` (or anything it was raised from) is a transport failure."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, (httpx.TransportError, ConnectionError)):
+            return True
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def shared_client_stats() -> Dict[str, Dict[str, Any]]:
+    return {holder.name: holder.stats() for holder in list(_holders)}
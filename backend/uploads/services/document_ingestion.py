@@ -6,12 +6,30 @@ import uuid
 import logging
 from typing import Iterable, List, Dict, Any
 
+import httpx
 from django.conf import settings
+from django.db import DatabaseError
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from pypdf import PdfReader
-from supabase import Client, create_client
+from supabase import (
+    AsyncClient,
+    AsyncClientOptions,
+    Client,
+    ClientOptions,
+    acreate_client,
+    create_client,
+)
+
+from common.breakers import embeddings_breaker
+
+from .clients import SharedAsyncClient, SharedClient, is_connection_error
+from .document_registry import file_digest, record_document
+from .embedding_cache import CachedEmbeddings
+from .lexical_index import index_deck_chunks
+from .vector_store import get_vector_store
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +42,7 @@ def _batched(items: List[Any], batch_size: int) -> Iterable[List[Any]]:
     for i in range(0, len(items), batch_size):
         yield items[i : i + batch_size]
 
-def _build_supabase_client() -> Client:
+def _supabase_credentials() -> tuple:
     url = getattr(settings, "SUPABASE_URL", "")
     key = getattr(settings, "SUPABASE_KEY", "")
 
@@ -32,20 +50,109 @@ def _build_supabase_client() -> Client:
         raise DocumentIngestionError(
             "Supabase credentials are not configured. Set SUPABASE_URL and SUPABASE_KEY."
         )
+    return url, key
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=getattr(settings, "SUPABASE_HTTP_MAX_CONNECTIONS", 20),
+        max_keepalive_connections=getattr(settings, "SUPABASE_HTTP_MAX_KEEPALIVE", 10),
+        keepalive_expiry=getattr(settings, "SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS", 60),
+    )
+
+
+def _http_timeout() -> float:
+    return getattr(settings, "SUPABASE_HTTP_TIMEOUT_SECONDS", 30)
+
+
+def _create_supabase_client(url: str, key: str) -> Client:
+    http_client = httpx.Client(limits=_http_limits(), timeout=_http_timeout())
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client))
+
+
+async def _acreate_supabase_client(url: str, key: str) -> AsyncClient:
+    http_client = httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout())
+    return await acreate_client(url, key, options=AsyncClientOptions(httpx_client=http_client))
+
+
+class GuardedEmbeddings(Embeddings):
+    """
+    Routes embedding API calls through the "gemini_embeddings" circuit breaker.
+    Document batches (ingestion) are slow by nature, so only their errors count.
+    Other attributes (model, task_type) are the wrapped model's, so cache keys
+    are unchanged.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with embeddings_breaker.guard(count_slow=False):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with embeddings_breaker.guard():
+            return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with embeddings_breaker.guard(count_slow=False):
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        with embeddings_breaker.guard():
+            return await self.embeddings.aembed_query(text)
+
+
+def _create_embedding_model(api_key: str, cached: bool) -> Embeddings:
+    model = GuardedEmbeddings(
+        GoogleGenerativeAIEmbeddings(
+            model="models/gemini-embedding-001",
+            task_type="RETRIEVAL_DOCUMENT",
+            google_api_key=api_key,
+        )
+    )
+    if cached:
+        # Shared with search_deck_documents: repeated chunks and queries are not re-embedded
+        return CachedEmbeddings(model)
+    return model
+
+
+# One pooled instance per process (per event loop for the async client), shared
+# by ingestion and the agent tools. See clients.py.
+supabase_clients = SharedClient("supabase", _create_supabase_client)
+async_supabase_clients = SharedAsyncClient("supabase_async", _acreate_supabase_client)
+embedding_models = SharedClient("embeddings", _create_embedding_model)
+
+
+def _build_supabase_client() -> Client:
+    return supabase_clients.get(_supabase_credentials())
 
-    return create_client(url, key)
 
+async def _abuild_supabase_client() -> AsyncClient:
+    """Async client for callers running on an event loop (ASGI views)."""
+    return await async_supabase_clients.aget(_supabase_credentials())
 
-def _build_embedding_model() -> GoogleGenerativeAIEmbeddings:
+
+def _build_embedding_model() -> Embeddings:
     api_key = getattr(settings, "GEMINI_API_KEY", "")
     if not api_key:
         raise DocumentIngestionError("GEMINI_API_KEY is not configured for embeddings.")
+    return embedding_models.get((api_key, bool(getattr(settings, "AGENT_EMBEDDING_CACHE", True))))
 
-    return GoogleGenerativeAIEmbeddings(
-        model="models/gemini-embedding-001",
-        task_type="RETRIEVAL_DOCUMENT",
-        google_api_key=api_key,
-    )
+
+def discard_failed_clients(exc: BaseException, *clients) -> None:
+    """Drop shared clients after a connection-level failure so the next call reconnects."""
+    if not is_connection_error(exc):
+        return
+    for client in clients:
+        if client is None:
+            continue
+        supabase_clients.discard(client)
+        async_supabase_clients.discard(client)
+        embedding_models.discard(client)
 
 
 def _extract_pdf_text(uploaded_file) -> str:
@@ -74,13 +181,15 @@ def _split_text(text: str) -> List[str]:
 
 def ingest_document(deck, uploaded_file) -> int:
     """
-    Ingest a PDF document into Supabase (pgvector)
+    Ingest a PDF document into the configured vector store (Supabase pgvector
+    by default, see vector_store.py)
 
     Returns:
         Number of chunks inserted.
     """
 
     # 1) Extract + split
+    content_hash, size = file_digest(uploaded_file)
     text = _extract_pdf_text(uploaded_file)
     chunks = _split_text(text)
     if not chunks:
@@ -88,9 +197,7 @@ def ingest_document(deck, uploaded_file) -> int:
 
     # 2) Build clients/models
     embedding_model = _build_embedding_model()
-    supabase_client = _build_supabase_client()
-
-    table_name = getattr(settings, "SUPABASE_VECTOR_TABLE", "documents")
+    store = get_vector_store()
 
     # 3) Prepare Documents
     documents = [
@@ -107,22 +214,26 @@ def ingest_document(deck, uploaded_file) -> int:
     ]
 
     logger.info(
-        "Uploading %s document chunks to Supabase table '%s' for deck %s",
+        "Uploading %s document chunks to the %s vector store for deck %s",
         len(documents),
-        table_name,
+        store.name,
         deck.id,
     )
 
     # 4) Embed
     texts = [doc.page_content for doc in documents]
-    vectors = embedding_model.embed_documents(texts)
+    try:
+        vectors = embedding_model.embed_documents(texts)
+    except Exception as exc:
+        discard_failed_clients(exc, embedding_model)
+        raise
 
     if len(vectors) != len(documents):
         raise DocumentIngestionError(
             f"Embedding count mismatch: got {len(vectors)} vectors for {len(documents)} chunks."
         )
 
-    # 5) Build rows for Supabase insert
+    # 5) Build rows for the vector store
     rows = []
     for doc, vec in zip(documents, vectors):
         rows.append(
@@ -134,12 +245,20 @@ def ingest_document(deck, uploaded_file) -> int:
             }
         )
 
-    # 6) Insert in batches (payload safety)
-    inserted = 0
-    for batch in _batched(rows, batch_size=200):
-        resp = supabase_client.table(table_name).insert(batch).execute()
-        # supabase-py returns resp.data when available; we count by batch size regardless
-        inserted += len(batch)
+    # 6) Insert (the Supabase store batches for payload safety)
+    inserted = store.add(int(deck.id), rows)
 
-    return inserted
+    # 7) Add to the deck's BM25 index for exact-term search
+    if getattr(settings, "AGENT_HYBRID_SEARCH", True):
+        try:
+            index_deck_chunks(int(deck.id), rows)
+        except DatabaseError as exc:
+            # The chunks are searchable by vector already; only exact-term recall suffers
+            logger.warning("Lexical indexing failed for deck %s (%s).", deck.id, exc)
+
+    # 8) Register the upload; the agent only searches decks with documents
+    record_document(
+        int(deck.id), getattr(uploaded_file, "name", ""), content_hash, inserted, size
+    )
 
+    return inserted
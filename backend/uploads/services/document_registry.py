@@ -0,0 +1,76 @@
+"""
+Registry of the documents ingested into each deck.
+
+`ingest_document` records every upload as a DeckDocument row. The agent reads
+`deck_has_documents` (through the cached profile context) to skip retrieval
+and stop offering search_deck_documents on decks with nothing to search, and
+the deck documents API lists the rows. The agent app drops its cached
+profile contexts when rows change (agent/signals.py).
+
+Decks created before the registry existed may have chunks but no rows, so
+for them "no rows" means unknown and the agent keeps searching; only decks
+created after the registry (every upload to them is recorded) or with rows
+that all hold zero chunks count as empty. Older decks are backfilled from the
+vector store with `python manage.py sync_deck_documents`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from functools import lru_cache
+from typing import Tuple
+
+from django.db.migrations.recorder import MigrationRecorder
+
+from cards.models import Deck
+from uploads.models import DeckDocument
+
+_READ_BLOCK = 1 << 20
+
+
+def file_digest(uploaded_file) -> Tuple[str, int]:
+    """sha256 hex digest and size in bytes of an uploaded file (rewound afterwards)."""
+    digest = hashlib.sha256()
+    size = 0
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(_READ_BLOCK), b""):
+        digest.update(block)
+        size += len(block)
+    uploaded_file.seek(0)
+    return digest.hexdigest(), size
+
+
+def record_document(
+    deck_id: int, filename: str, content_hash: str, chunk_count: int, size: int
+) -> DeckDocument:
+    return DeckDocument.objects.create(
+        deck_id=deck_id,
+        filename=(filename or "")[:255],
+        content_hash=content_hash,
+        chunk_count=chunk_count,
+        bytes=size,
+    )
+
+
+@lru_cache(maxsize=1)
+def _registry_started():
+    """When the DeckDocument table was created; None if unknown."""
+    return (
+        MigrationRecorder.Migration.objects.filter(app="uploads", name="0003_deckdocument")
+        .values_list("applied", flat=True)
+        .first()
+    )
+
+
+def deck_has_documents(deck_id: int) -> bool:
+    """False only for decks known to have nothing to search."""
+    chunk_counts = list(
+        DeckDocument.objects.filter(deck_id=deck_id).values_list("chunk_count", flat=True)
+    )
+    if chunk_counts:
+        return any(chunk_counts)
+    started = _registry_started()
+    if started is None:
+        return True
+    # Uploads to older decks may predate the registry
+    return not Deck.objects.filter(id=deck_id, created_at__gte=started).exists()
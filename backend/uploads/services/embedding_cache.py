@@ -0,0 +1,227 @@
+"""
+Two-tier cache for text embeddings.
+
+Embeddings are deterministic for a (model, task type, text), so repeated
+search queries and re-uploaded chunks need not be sent to the embedding API
+again. Lookups go through:
+
+1. an in-process LRU (AGENT_EMBEDDING_CACHE_MAX_ENTRIES vectors), then
+2. the EmbeddingCacheEntry table,
+
+and only the remaining misses are embedded, in one batch. Both tiers hold
+vectors packed as float32 (12 KB for a 3072-dimension vector instead of
+~70 KB as a list of Python floats) and unpack them on read. `CachedEmbeddings`
+wraps any LangChain Embeddings with this cache; `embedding_cache.stats()`
+reports hit rates per tier and `prune_embedding_cache()` removes rows older
+than AGENT_EMBEDDING_CACHE_RETENTION_DAYS.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sys
+import threading
+from array import array
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from langchain_core.embeddings import Embeddings
+
+from common.cache import TTLCache
+from uploads.models import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    packed = array("f", vector)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    unpacked = array("f")
+    unpacked.frombytes(bytes(data))
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+def embedding_key(model: str, task_type: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{task_type}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Memory LRU in front of the database store, with per-tier hit counts."""
+
+    def __init__(self, max_entries: int, persist: bool = True):
+        self.memory = TTLCache("embeddings", max_entries=max_entries)
+        self.persist = persist
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    def _record(self, **deltas: int) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                self.counts[name] += delta
+
+    def get_memory(self, key: str) -> Optional[List[float]]:
+        packed = self.memory.get(key)
+        return unpack_vector(packed) if packed is not None else None
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        for key in keys:
+            vector = self.get_memory(key)
+            if vector is not None:
+                found[key] = vector
+        memory_hits = len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.persist:
+            try:
+                rows = EmbeddingCacheEntry.objects.filter(key__in=missing).values_list(
+                    "key", "vector"
+                )
+                for key, data in rows:
+                    packed = bytes(data)
+                    found[key] = unpack_vector(packed)
+                    self.memory.set(key, packed)
+            except DatabaseError as exc:
+                logger.warning("Embedding cache lookup failed (%s); embedding instead.", exc)
+
+        self._record(
+            memory_hits=memory_hits,
+            db_hits=len(found) - memory_hits,
+            misses=len(set(keys) - set(found)),
+        )
+        return found
+
+    def set_many(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        packed = {key: pack_vector(vector) for key, vector in vectors.items()}
+        for key, data in packed.items():
+            self.memory.set(key, data)
+        if not vectors or not self.persist:
+            return
+        try:
+            EmbeddingCacheEntry.objects.bulk_create(
+                [
+                    EmbeddingCacheEntry(
+                        key=key,
+                        model=model,
+                        dimensions=len(vectors[key]),
+                        vector=data,
+                    )
+                    for key, data in packed.items()
+                ],
+                ignore_conflicts=True,
+                batch_size=200,
+            )
+        except DatabaseError as exc:
+            logger.warning("Embedding cache store failed (%s).", exc)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.reset()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = sum(counts.values())
+        hits = counts["memory_hits"] + counts["db_hits"]
+        return {
+            **counts,
+            "size": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_hit_rate": round(counts["memory_hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+def prune_embedding_cache() -> int:
+    """Delete stored embeddings past the retention window; returns the number removed."""
+    days = getattr(settings, "AGENT_EMBEDDING_CACHE_RETENTION_DAYS", 30)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = EmbeddingCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+    logger.info("Pruned %d stored embeddings older than %d days", deleted, days)
+    return deleted
+
+
+embedding_cache = EmbeddingCache(
+    max_entries=getattr(settings, "AGENT_EMBEDDING_CACHE_MAX_ENTRIES", 2048),
+    persist=getattr(settings, "AGENT_EMBEDDING_CACHE_PERSIST", True),
+)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated texts from `embedding_cache`."""
+
+    def __init__(self, model: Embeddings, cache: Optional[EmbeddingCache] = None):
+        self.model = model
+        self.cache = cache or embedding_cache
+        self.model_name = str(getattr(model, "model", type(model).__name__))
+        # The wrapped model applies its task type to queries and documents alike
+        self.task_type = str(getattr(model, "task_type", None) or "")
+
+    def _keys(self, texts: Sequence[str]) -> List[str]:
+        return [embedding_key(self.model_name, self.task_type, text) for text in texts]
+
+    def _missing(self, texts: Sequence[str], keys: List[str], found: Dict[str, List[float]]):
+        """Unique (key, text) pairs that still need embedding."""
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                pending.setdefault(key, text)
+        return pending
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = self._keys(texts)
+        found = self.cache.get_many(keys)
+        pending = self._missing(texts, keys, found)
+        if pending:
+            fresh = dict(zip(pending, self.model.embed_documents(list(pending.values()))))
+            self.cache.set_many(self.model_name, fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._keys([text])[0]
+        found = self.cache.get_many([key])
+        if key not in found:
+            found[key] = self.model.embed_query(text)
+            self.cache.set_many(self.model_name, {key: found[key]})
+        return found[key]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = self._keys(texts)
+        found = await sync_to_async(self.cache.get_many)(keys)
+        pending = self._missing(texts, keys, found)
+        if pending:
+            vectors = await self.model.aembed_documents(list(pending.values()))
+            fresh = dict(zip(pending, vectors))
+            await sync_to_async(self.cache.set_many)(self.model_name, fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._keys([text])[0]
+        vector = self.cache.get_memory(key)
+        if vector is not None:
+            # Warm path without a thread hop for the database tier
+            self.cache._record(memory_hits=1)
+            return vector
+        found = await sync_to_async(self.cache.get_many)([key])
+        if key not in found:
+            found[key] = await self.model.aembed_query(text)
+            await sync_to_async(self.cache.set_many)(self.model_name, {key: found[key]})
+        return found[key]
@@ -0,0 +1,180 @@
+"""
+Per-deck BM25 index for exact-term retrieval.
+
+Vector search misses abbreviations, course-specific jargon and other rare
+terms that the embedding model has no good representation for. Each upload
+therefore also adds its chunks to a BM25 inverted index stored on the deck
+(DeckLexicalIndex), and search_deck_documents fuses its hits with the vector
+results using reciprocal-rank fusion (`fuse_ranked`).
+
+Query terms of 4+ characters that are not in the vocabulary also match the
+terms they prefix ("backprop" -> "backpropagation"), at reduced weight.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import transaction
+
+from common.cache import TTLCache
+from uploads.models import DeckLexicalIndex
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what "
+    "when where which who why with".split()
+)
+
+# Weight of a prefix expansion relative to an exact term match
+PREFIX_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 4
+MAX_PREFIX_EXPANSIONS = 8
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a list of chunk records ({"id", "content", "metadata"})."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: List[Dict[str, Any]] = []
+        self.lengths: List[int] = []
+        # term -> {doc index: term frequency}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            doc_id = len(self.docs)
+            tokens = tokenize(record.get("content") or "")
+            self.docs.append({key: record.get(key) for key in ("id", "content", "metadata")})
+            self.lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            for term, count in Counter(tokens).items():
+                self.postings.setdefault(term, {})[doc_id] = count
+
+    def _query_terms(self, query: str) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for term in tokenize(query):
+            if term in self.postings:
+                weights[term] = max(weights.get(term, 0.0), 1.0)
+            elif len(term) >= MIN_PREFIX_LENGTH:
+                expansions = [known for known in self.postings if known.startswith(term)]
+                for known in expansions[:MAX_PREFIX_EXPANSIONS]:
+                    weights[known] = max(weights.get(known, 0.0), PREFIX_WEIGHT)
+        return weights
+
+    def search(self, query: str, k: int = 4) -> List[Dict[str, Any]]:
+        if not self.docs or k <= 0:
+            return []
+        count = len(self.docs)
+        avg_length = self.total_length / count or 1.0
+        scores: Dict[int, float] = {}
+        for term, weight in self._query_terms(query).items():
+            postings = self.postings[term]
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [{**self.docs[doc_id], "score": round(score, 4)} for doc_id, score in ranked]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "docs": self.docs,
+            "lengths": self.lengths,
+            "postings": {
+                term: [[doc_id, tf] for doc_id, tf in postings.items()]
+                for term, postings in self.postings.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        index.docs = list(data.get("docs", []))
+        index.lengths = list(data.get("lengths", []))
+        index.total_length = sum(index.lengths)
+        index.postings = {
+            term: {doc_id: tf for doc_id, tf in postings}
+            for term, postings in data.get("postings", {}).items()
+        }
+        return index
+
+
+# deck_id -> (updated_at, BM25Index); the timestamp check picks up uploads
+# handled by other processes.
+lexical_indexes = TTLCache(
+    "lexical_index", max_entries=getattr(settings, "AGENT_LEXICAL_INDEX_CACHE_MAX_ENTRIES", 128)
+)
+
+
+def index_deck_chunks(deck_id: int, records: Sequence[Dict[str, Any]]) -> int:
+    """Add ingested chunks to the deck's BM25 index; returns the deck's chunk count."""
+    with transaction.atomic():
+        row, _ = DeckLexicalIndex.objects.select_for_update().get_or_create(deck_id=deck_id)
+        index = BM25Index.from_dict(row.index) if row.index else BM25Index()
+        index.add(records)
+        row.index = index.to_dict()
+        row.chunk_count = len(index)
+        row.save()
+    lexical_indexes.set(int(deck_id), (row.updated_at, index))
+    return len(index)
+
+
+def load_deck_index(deck_id: int) -> Optional[BM25Index]:
+    updated_at = (
+        DeckLexicalIndex.objects.filter(deck_id=deck_id).values_list("updated_at", flat=True).first()
+    )
+    if updated_at is None:
+        return None
+    cached = lexical_indexes.get(int(deck_id))
+    if cached is not None and cached[0] == updated_at:
+        return cached[1]
+    row = DeckLexicalIndex.objects.get(deck_id=deck_id)
+    index = BM25Index.from_dict(row.index)
+    lexical_indexes.set(int(deck_id), (row.updated_at, index))
+    return index
+
+
+def search_deck_index(deck_id: int, query: str, k: int = 4) -> List[Dict[str, Any]]:
+    index = load_deck_index(deck_id)
+    return index.search(query, k=k) if index is not None else []
+
+
+def _row_key(row: Dict[str, Any]) -> str:
+    return str(row.get("id") or row.get("content"))
+
+
+def fuse_ranked(*rankings: Sequence[Dict[str, Any]], k: int = 4, rrf_k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Reciprocal-rank fusion: each row scores sum(1 / (rrf_k + rank)) over the
+    rankings it appears in; rows are matched by id (or content).
+    """
+    scores: Dict[str, float] = {}
+    rows: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            key = _row_key(row)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            rows.setdefault(key, row)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [rows[key] for key in ranked]
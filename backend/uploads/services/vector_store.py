@@ -0,0 +1,363 @@
+"""
+Vector stores for deck document chunks.
+
+`ingest_document` writes chunks and `search_deck_documents` queries them
+through `get_vector_store()`, selected by AGENT_VECTOR_STORE:
+
+- "supabase" (default): the pgvector `documents` table and the
+  `match_documents` RPC (see README). Calls go through the "supabase"
+  circuit breaker, so they fail fast with CircuitOpenError during an outage.
+- "local": one float32 matrix per deck in a memory-mapped file under
+  AGENT_VECTOR_STORE_PATH, searched with a vectorized cosine top-k. Needs no
+  network, so retrieval works offline, in CI and on small installs.
+
+Rows are dicts with "id", "content", "metadata" and "embedding"; search
+results have "id", "content", "metadata" and "similarity", best first.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from common.breakers import supabase_breaker
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStore:
+    name = ""
+
+    def add(self, deck_id: int, rows: List[Dict[str, Any]]) -> int:
+        """Store rows for a deck; returns the number stored."""
+        raise NotImplementedError
+
+    def search(self, deck_id: int, embedding: Sequence[float], k: int = 4) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def count(self, deck_id: int) -> int:
+        """Number of rows stored for a deck."""
+        raise NotImplementedError
+
+    async def asearch(
+        self, deck_id: int, embedding: Sequence[float], k: int = 4
+    ) -> List[Dict[str, Any]]:
+        return await sync_to_async(self.search, thread_sensitive=False)(deck_id, embedding, k)
+
+    def search_many(
+        self, deck_id: int, embeddings: Sequence[Sequence[float]], k: int = 4
+    ) -> List[List[Dict[str, Any]]]:
+        """One ranking per query embedding, in order."""
+        return [self.search(deck_id, embedding, k) for embedding in embeddings]
+
+    async def asearch_many(
+        self, deck_id: int, embeddings: Sequence[Sequence[float]], k: int = 4
+    ) -> List[List[Dict[str, Any]]]:
+        return list(
+            await asyncio.gather(*(self.asearch(deck_id, embedding, k) for embedding in embeddings))
+        )
+
+
+# Concurrent match RPCs for multi-query searches
+_rpc_pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, "AGENT_SEARCH_MAX_QUERIES", 4), thread_name_prefix="vector-rpc"
+)
+
+
+class SupabaseVectorStore(VectorStore):
+    name = "supabase"
+    batch_size = 200
+
+    @staticmethod
+    def _table_name() -> str:
+        return getattr(settings, "SUPABASE_VECTOR_TABLE", "documents")
+
+    @staticmethod
+    def _query_name() -> str:
+        return getattr(settings, "SUPABASE_QUERY_NAME", "match_documents")
+
+    @staticmethod
+    def _match_payload(deck_id: int, embedding: Sequence[float], k: int) -> Dict[str, Any]:
+        return {
+            "query_embedding": list(embedding),
+            "match_count": k,
+            "filter": {"deck_id": int(deck_id)},
+        }
+
+    def add(self, deck_id: int, rows: List[Dict[str, Any]]) -> int:
+        from . import document_ingestion as ingestion
+
+        client = ingestion._build_supabase_client()
+        inserted = 0
+        try:
+            for batch in ingestion._batched(rows, self.batch_size):
+                # Large inserts are slow without the service being unhealthy
+                with supabase_breaker.guard(count_slow=False):
+                    client.table(self._table_name()).insert(batch).execute()
+                # supabase-py returns resp.data when available; we count by batch size regardless
+                inserted += len(batch)
+        except Exception as exc:
+            ingestion.discard_failed_clients(exc, client)
+            raise
+        return inserted
+
+    def count(self, deck_id: int) -> int:
+        from . import document_ingestion as ingestion
+
+        client = ingestion._build_supabase_client()
+        try:
+            with supabase_breaker.guard():
+                response = (
+                    client.table(self._table_name())
+                    .select("id", count="exact")
+                    .eq("metadata->>deck_id", str(int(deck_id)))
+                    .limit(1)
+                    .execute()
+                )
+        except Exception as exc:
+            ingestion.discard_failed_clients(exc, client)
+            raise
+        return response.count or 0
+
+    def search(self, deck_id: int, embedding: Sequence[float], k: int = 4) -> List[Dict[str, Any]]:
+        from . import document_ingestion as ingestion
+
+        client = ingestion._build_supabase_client()
+        try:
+            with supabase_breaker.guard():
+                response = client.rpc(
+                    self._query_name(), self._match_payload(deck_id, embedding, k)
+                ).execute()
+        except Exception as exc:
+            ingestion.discard_failed_clients(exc, client)
+            raise
+        return response.data or []
+
+    def search_many(
+        self, deck_id: int, embeddings: Sequence[Sequence[float]], k: int = 4
+    ) -> List[List[Dict[str, Any]]]:
+        if len(embeddings) <= 1:
+            return super().search_many(deck_id, embeddings, k)
+        # One RPC per query, concurrently over the shared connection pool
+        return list(_rpc_pool.map(lambda embedding: self.search(deck_id, embedding, k), embeddings))
+
+    async def asearch(
+        self, deck_id: int, embedding: Sequence[float], k: int = 4
+    ) -> List[Dict[str, Any]]:
+        from . import document_ingestion as ingestion
+
+        client = await ingestion._abuild_supabase_client()
+        try:
+            with supabase_breaker.guard():
+                response = await client.rpc(
+                    self._query_name(), self._match_payload(deck_id, embedding, k)
+                ).execute()
+        except Exception as exc:
+            ingestion.discard_failed_clients(exc, client)
+            raise
+        return response.data or []
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Per-deck files under `root`:
+
+    - deck_<id>.f32: row-major float32 matrix of unit-normalized embeddings
+    - deck_<id>.jsonl: one {"row", "id", "content", "metadata"} line per row
+    - deck_<id>.lock: flock target; writers hold it exclusively, loads shared
+
+    Several processes (web workers, the job worker, management commands) may
+    write the same deck. A writer first trims whatever an earlier writer left
+    behind when it died mid-append (a partial matrix row, or rows that only one
+    of the files has), then appends the matrix rows and after them the records.
+    Records carry their row index, and loads keep only the prefix where the
+    two files agree.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        # deck_id -> (matrix size in bytes, dims, memmap, records)
+        self._loaded: Dict[int, tuple] = {}
+
+    def _paths(self, deck_id: int):
+        base = self.root / f"deck_{int(deck_id)}"
+        return base.with_suffix(".f32"), base.with_suffix(".jsonl"), base.with_suffix(".json")
+
+    @contextmanager
+    def _file_lock(self, deck_id: int, exclusive: bool):
+        self.root.mkdir(parents=True, exist_ok=True)
+        lock_path = self.root / f"deck_{int(deck_id)}.lock"
+        with lock_path.open("a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    def add(self, deck_id: int, rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        matrix = self._normalize(np.asarray([row["embedding"] for row in rows], dtype="<f4"))
+        vectors_path, records_path, meta_path = self._paths(deck_id)
+
+        with self._lock, self._file_lock(deck_id, exclusive=True):
+            dims = self._dimensions(meta_path)
+            if dims is None:
+                meta_path.write_text(json.dumps({"dimensions": matrix.shape[1]}))
+            elif dims != matrix.shape[1]:
+                raise ValueError(
+                    f"Deck {deck_id} stores {dims}-dimension vectors, got {matrix.shape[1]}."
+                )
+            start = self._repair(vectors_path, records_path, matrix.shape[1])
+            with vectors_path.open("ab") as vectors:
+                vectors.write(matrix.astype("<f4", copy=False).tobytes())
+                vectors.flush()
+                os.fsync(vectors.fileno())
+            with records_path.open("a", encoding="utf-8") as records:
+                for offset, row in enumerate(rows):
+                    record = {"row": start + offset}
+                    record.update({key: row.get(key) for key in ("id", "content", "metadata")})
+                    records.write(json.dumps(record) + "\n")
+            self._loaded.pop(int(deck_id), None)
+        return len(rows)
+
+    @staticmethod
+    def _repair(vectors_path: Path, records_path: Path, dims: int) -> int:
+        """Trim both files to the rows they agree on (caller holds the exclusive lock)."""
+        row_bytes = 4 * dims
+        rows = vectors_path.stat().st_size // row_bytes if vectors_path.exists() else 0
+        kept_bytes = 0
+        kept = 0
+        if records_path.exists():
+            with records_path.open("rb") as handle:
+                for line in handle:
+                    if kept == rows or not line.endswith(b"\n"):
+                        break
+                    kept_bytes += len(line)
+                    kept += 1
+        if vectors_path.exists() and vectors_path.stat().st_size != kept * row_bytes:
+            logger.warning("Trimming %s to %s rows after an interrupted write", vectors_path, kept)
+            os.truncate(vectors_path, kept * row_bytes)
+        if records_path.exists() and records_path.stat().st_size != kept_bytes:
+            logger.warning("Trimming %s to %s rows after an interrupted write", records_path, kept)
+            os.truncate(records_path, kept_bytes)
+        return kept
+
+    @staticmethod
+    def _dimensions(meta_path: Path) -> Optional[int]:
+        if not meta_path.exists():
+            return None
+        return int(json.loads(meta_path.read_text())["dimensions"])
+
+    def _load(self, deck_id: int):
+        """Memory-mapped matrix and records for a deck, reloaded when the files grow."""
+        vectors_path, records_path, meta_path = self._paths(deck_id)
+        try:
+            size = vectors_path.stat().st_size
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            loaded = self._loaded.get(int(deck_id))
+            if loaded is not None and loaded[0] == size:
+                return loaded[2], loaded[3]
+            with self._file_lock(deck_id, exclusive=False):
+                size = vectors_path.stat().st_size
+                dims = self._dimensions(meta_path)
+                records = self._read_records(records_path, size // (4 * dims))
+            if not records:
+                return None
+            matrix = np.memmap(vectors_path, dtype="<f4", mode="r", shape=(len(records), dims))
+            self._loaded[int(deck_id)] = (size, dims, matrix, records)
+            return matrix, records
+
+    @staticmethod
+    def _read_records(records_path: Path, rows: int) -> List[Dict[str, Any]]:
+        """Records for the first `rows` matrix rows, cut at the first one out of step."""
+        records = []
+        if not records_path.exists():
+            return records
+        with records_path.open(encoding="utf-8") as handle:
+            for index, line in zip(range(rows), handle):
+                if not line.endswith("\n"):
+                    break
+                record = json.loads(line)
+                # Files written before row indexes were recorded have none
+                if record.pop("row", index) != index:
+                    logger.warning("%s is out of step at row %s", records_path, index)
+                    break
+                records.append(record)
+        return records
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, records: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**records[i], "similarity": float(scores[i])} for i in top]
+
+    def search(self, deck_id: int, embedding: Sequence[float], k: int = 4) -> List[Dict[str, Any]]:
+        return self.search_many(deck_id, [embedding], k)[0]
+
+    def search_many(
+        self, deck_id: int, embeddings: Sequence[Sequence[float]], k: int = 4
+    ) -> List[List[Dict[str, Any]]]:
+        loaded = self._load(deck_id)
+        if loaded is None or k <= 0:
+            return [[] for _ in embeddings]
+        matrix, records = loaded
+        # All queries in one matrix product: (rows, dims) @ (dims, queries)
+        queries = self._normalize(np.asarray(embeddings, dtype="<f4"))
+        scores = matrix @ queries.T
+        return [self._top_k(scores[:, column], records, k) for column in range(scores.shape[1])]
+
+    def count(self, deck_id: int) -> int:
+        loaded = self._load(deck_id)
+        return 0 if loaded is None else len(loaded[1])
+
+    def delete_deck(self, deck_id: int) -> None:
+        with self._lock, self._file_lock(deck_id, exclusive=True):
+            for path in self._paths(deck_id):
+                path.unlink(missing_ok=True)
+            self._loaded.pop(int(deck_id), None)
+
+
+_stores: Dict[tuple, VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """The configured store (one instance per backend and location)."""
+    backend = getattr(settings, "AGENT_VECTOR_STORE", "supabase")
+    if backend == "supabase":
+        key = (backend,)
+    elif backend == "local":
+        key = (backend, os.fspath(getattr(settings, "AGENT_VECTOR_STORE_PATH")))
+    else:
+        raise ValueError(f"Unknown AGENT_VECTOR_STORE: {backend!r} (use 'supabase' or 'local')")
+
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = SupabaseVectorStore() if backend == "supabase" else LocalVectorStore(key[1])
+            _stores[key] = store
+        return store
@@ -1,17 +1,43 @@
-from io import BytesIO
+import hashlib
+import json
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
 from types import SimpleNamespace
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import SimpleTestCase, override_settings
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
 from cards.models import Deck
+from uploads.models import DeckDocument, DeckLexicalIndex, EmbeddingCacheEntry
 from uploads.services import document_ingestion
+from uploads.services.clients import SharedAsyncClient, SharedClient
 from uploads.services.document_ingestion import DocumentIngestionError, ingest_document
+from uploads.services.document_registry import deck_has_documents, record_document
+from uploads.services.embedding_cache import (
+    CachedEmbeddings,
+    EmbeddingCache,
+    pack_vector,
+    prune_embedding_cache,
+    unpack_vector,
+)
+from uploads.services.lexical_index import (
+    BM25Index,
+    fuse_ranked,
+    index_deck_chunks,
+    search_deck_index,
+)
+from uploads.services.vector_store import LocalVectorStore, get_vector_store
 
 
 class DeckDocumentUploadApiTests(APITestCase):
@@ -152,7 +178,10 @@ class DocumentIngestionTests(SimpleTestCase):
         )
 
         with override_settings(
-                GEMINI_API_KEY="key", SUPABASE_URL="url", SUPABASE_KEY="key"
+                GEMINI_API_KEY="key",
+                SUPABASE_URL="url",
+                SUPABASE_KEY="key",
+                AGENT_HYBRID_SEARCH=False,
         ):
             with (
                 patch(
@@ -170,7 +199,8 @@ class DocumentIngestionTests(SimpleTestCase):
                 patch(
                     "uploads.services.document_ingestion._build_supabase_client",
                     return_value=supabase_client,
-                )
+                ),
+                patch("uploads.services.document_ingestion.record_document") as mock_record,
             ):
                 count = ingest_document(deck, uploaded_file)
 
@@ -189,3 +219,424 @@ class DocumentIngestionTests(SimpleTestCase):
         self.assertEqual(inserted_rows[0]["metadata"]["deck_name"], deck.name)
         self.assertEqual(inserted_rows[0]["metadata"]["user_id"], deck.user_id)
         self.assertEqual(inserted_rows[0]["metadata"]["source"], "upload.pdf")
+        mock_record.assert_called_once_with(
+            5,
+            "upload.pdf",
+            hashlib.sha256(b"%PDF-1.4 test content").hexdigest(),
+            len(chunks),
+            len(b"%PDF-1.4 test content"),
+        )
+
+
+class EmbeddingCacheTests(TestCase):
+    def setUp(self):
+        self.cache = EmbeddingCache(max_entries=10)
+        self.model = MagicMock(model="models/test-embedding", task_type="RETRIEVAL_DOCUMENT")
+        self.model.embed_query.side_effect = lambda text: [float(len(text)), 0.5]
+        self.model.embed_documents.side_effect = lambda texts: [
+            [float(len(text)), 0.25] for text in texts
+        ]
+        self.embeddings = CachedEmbeddings(self.model, cache=self.cache)
+
+    def test_pack_round_trip_is_float32(self):
+        packed = pack_vector([0.1, -2.5, 3.0])
+
+        self.assertEqual(len(packed), 12)
+        self.assertEqual(unpack_vector(packed), [0.10000000149011612, -2.5, 3.0])
+
+    def test_repeated_query_hits_memory(self):
+        first = self.embeddings.embed_query("mitosis")
+        second = self.embeddings.embed_query("mitosis")
+
+        self.assertEqual(first, second)
+        self.model.embed_query.assert_called_once_with("mitosis")
+        stats = self.cache.stats()
+        self.assertEqual((stats["misses"], stats["memory_hits"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_database_tier_survives_a_cold_process(self):
+        self.embeddings.embed_query("mitosis")
+        cold = CachedEmbeddings(self.model, cache=EmbeddingCache(max_entries=10))
+
+        self.assertEqual(cold.embed_query("mitosis"), [7.0, 0.5])
+        self.model.embed_query.assert_called_once()
+        self.assertEqual(cold.cache.stats()["db_hits"], 1)
+        self.assertEqual(EmbeddingCacheEntry.objects.get().dimensions, 2)
+
+    def test_documents_embed_only_new_unique_texts(self):
+        self.embeddings.embed_query("known")
+
+        vectors = self.embeddings.embed_documents(["known", "new", "new"])
+
+        self.model.embed_documents.assert_called_once_with(["new"])
+        self.assertEqual(vectors, [[5.0, 0.5], [3.0, 0.25], [3.0, 0.25]])
+
+    def test_key_includes_model_and_task_type(self):
+        other = MagicMock(model="models/other", task_type="RETRIEVAL_DOCUMENT")
+        other.embed_query.return_value = [1.0]
+        self.embeddings.embed_query("mitosis")
+
+        CachedEmbeddings(other, cache=self.cache).embed_query("mitosis")
+
+        other.embed_query.assert_called_once()
+
+    def test_async_query_uses_cache(self):
+        self.model.aembed_query = AsyncMock(return_value=[1.0, 2.0])
+
+        first = async_to_sync(self.embeddings.aembed_query)("mitosis")
+        second = async_to_sync(self.embeddings.aembed_query)("mitosis")
+
+        self.assertEqual(first, second)
+        self.model.aembed_query.assert_awaited_once()
+
+    def test_memory_tier_holds_packed_vectors(self):
+        self.embeddings.embed_query("mitosis")
+
+        key = self.embeddings._keys(["mitosis"])[0]
+        self.assertEqual(self.cache.memory.get(key), pack_vector([7.0, 0.5]))
+        self.assertEqual(self.embeddings.embed_query("mitosis"), [7.0, 0.5])
+
+    @override_settings(AGENT_EMBEDDING_CACHE_RETENTION_DAYS=30)
+    def test_prune_removes_rows_past_retention(self):
+        self.embeddings.embed_documents(["old", "new"])
+        old_key = self.embeddings._keys(["old"])[0]
+        EmbeddingCacheEntry.objects.filter(key=old_key).update(
+            created_at=timezone.now() - timedelta(days=31)
+        )
+
+        call_command("prune_embedding_cache", stdout=StringIO())
+
+        self.assertEqual(prune_embedding_cache(), 0)
+        self.assertFalse(EmbeddingCacheEntry.objects.filter(key=old_key).exists())
+        self.assertEqual(EmbeddingCacheEntry.objects.count(), 1)
+
+    def test_build_embedding_model_is_cached(self):
+        with override_settings(GEMINI_API_KEY="key", AGENT_EMBEDDING_CACHE=True):
+            self.assertIsInstance(document_ingestion._build_embedding_model(), CachedEmbeddings)
+        with override_settings(GEMINI_API_KEY="key", AGENT_EMBEDDING_CACHE=False):
+            self.assertNotIsInstance(
+                document_ingestion._build_embedding_model(), CachedEmbeddings
+            )
+
+
+class SharedClientTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = MagicMock(side_effect=lambda *key: object())
+        self.clients = SharedClient("test", self.factory)
+
+    def tearDown(self):
+        document_ingestion.supabase_clients.clear()
+        document_ingestion.async_supabase_clients.clear()
+        document_ingestion.embedding_models.clear()
+
+    def test_instance_is_reused_until_key_changes(self):
+        first = self.clients.get(("url", "key"))
+
+        self.assertIs(self.clients.get(("url", "key")), first)
+        self.assertIsNot(self.clients.get(("url", "other")), first)
+        self.assertEqual(self.factory.call_count, 2)
+        self.assertEqual(self.clients.stats()["reused"], 1)
+
+    def test_discard_only_drops_the_failed_instance(self):
+        first = self.clients.get()
+        self.clients.discard(object())
+        self.assertIs(self.clients.get(), first)
+
+        self.clients.discard(first)
+
+        self.assertIsNot(self.clients.get(), first)
+        self.assertEqual(self.clients.stats()["discarded"], 1)
+
+    def test_forked_child_builds_its_own_instance(self):
+        parent = self.clients.get()
+
+        with patch("uploads.services.clients.os.getpid", return_value=-1):
+            child = self.clients.get()
+
+        self.assertIsNot(child, parent)
+
+    def test_async_instance_is_per_event_loop(self):
+        clients = SharedAsyncClient("test_async", AsyncMock(side_effect=lambda: object()))
+
+        async def twice():
+            return await clients.aget(), await clients.aget()
+
+        first, second = async_to_sync(twice)()
+        other_loop, _ = async_to_sync(twice)()
+
+        self.assertIs(first, second)
+        self.assertIsNot(other_loop, first)
+
+    def test_supabase_client_is_pooled_and_shared(self):
+        with override_settings(SUPABASE_URL="https://x.supabase.co", SUPABASE_KEY="key"):
+            client = document_ingestion._build_supabase_client()
+            self.assertIs(document_ingestion._build_supabase_client(), client)
+
+        self.assertIsInstance(client.options.httpx_client, httpx.Client)
+
+    def test_connection_errors_discard_shared_clients(self):
+        with override_settings(GEMINI_API_KEY="key"):
+            model = document_ingestion._build_embedding_model()
+
+            document_ingestion.discard_failed_clients(ValueError("bad input"), model)
+            self.assertIs(document_ingestion._build_embedding_model(), model)
+
+            try:
+                raise RuntimeError("search failed") from httpx.ConnectError("reset")
+            except RuntimeError as exc:
+                document_ingestion.discard_failed_clients(exc, model)
+            self.assertIsNot(document_ingestion._build_embedding_model(), model)
+
+
+class LocalVectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = LocalVectorStore(Path(self.tmp.name))
+
+    def rows(self, *items):
+        return [
+            {"id": str(i), "content": content, "metadata": {"deck_id": 1}, "embedding": vector}
+            for i, (content, vector) in enumerate(items)
+        ]
+
+    def test_top_k_by_cosine_similarity(self):
+        self.store.add(
+            1,
+            self.rows(
+                ("orthogonal", [0.0, 1.0, 0.0]),
+                ("same direction", [10.0, 0.0, 0.0]),
+                ("close", [1.0, 0.5, 0.0]),
+            ),
+        )
+
+        results = self.store.search(1, [2.0, 0.0, 0.0], k=2)
+
+        self.assertEqual([row["content"] for row in results], ["same direction", "close"])
+        self.assertAlmostEqual(results[0]["similarity"], 1.0, places=5)
+        self.assertEqual(results[0]["metadata"], {"deck_id": 1})
+
+    def test_decks_are_isolated_and_appends_are_visible(self):
+        self.store.add(1, self.rows(("first", [1.0, 0.0])))
+        self.assertEqual(len(self.store.search(1, [1.0, 0.0], k=5)), 1)
+
+        self.store.add(1, self.rows(("second", [0.0, 1.0])))
+
+        self.assertEqual(len(self.store.search(1, [1.0, 0.0], k=5)), 2)
+        self.assertEqual(self.store.search(2, [1.0, 0.0]), [])
+
+    def test_search_many_scores_all_queries_at_once(self):
+        self.store.add(1, self.rows(("x", [1.0, 0.0]), ("y", [0.0, 1.0])))
+
+        rankings = self.store.search_many(1, [[1.0, 0.1], [0.1, 1.0]], k=1)
+
+        self.assertEqual([ranking[0]["content"] for ranking in rankings], ["x", "y"])
+        self.assertEqual(self.store.search_many(2, [[1.0, 0.0]]), [[]])
+
+    def test_interrupted_write_is_trimmed_before_the_next_append(self):
+        self.store.add(1, self.rows(("first", [1.0, 0.0])))
+        vectors_path, records_path, _ = self.store._paths(1)
+        # A writer died after its matrix rows (plus half a row) but before its records
+        with vectors_path.open("ab") as vectors:
+            vectors.write(b"\x00" * 12)
+
+        self.assertEqual(self.store.count(1), 1)
+        self.store.add(1, self.rows(("second", [0.0, 1.0])))
+
+        self.assertEqual(vectors_path.stat().st_size, 2 * 2 * 4)
+        results = self.store.search(1, [0.0, 1.0], k=2)
+        self.assertEqual([row["content"] for row in results], ["second", "first"])
+        self.assertNotIn("row", results[0])
+
+    def test_records_out_of_step_are_not_served(self):
+        self.store.add(1, self.rows(("first", [1.0, 0.0]), ("second", [0.0, 1.0])))
+        _, records_path, _ = self.store._paths(1)
+        lines = records_path.read_text().splitlines(keepends=True)
+        records_path.write_text(lines[0] + lines[0])
+
+        self.assertEqual(self.store.count(1), 1)
+
+    def test_rejects_mismatched_dimensions(self):
+        self.store.add(1, self.rows(("first", [1.0, 0.0])))
+
+        with self.assertRaises(ValueError):
+            self.store.add(1, self.rows(("second", [1.0, 0.0, 0.0])))
+
+    def test_ingest_and_search_through_local_store(self):
+        deck = SimpleNamespace(id=7, name="Offline", user_id=3)
+        embedding_model = MagicMock()
+        embedding_model.embed_documents.return_value = [[1.0, 0.0], [0.0, 1.0]]
+
+        with override_settings(
+            AGENT_VECTOR_STORE="local",
+            AGENT_VECTOR_STORE_PATH=self.tmp.name,
+            AGENT_HYBRID_SEARCH=False,
+        ):
+            with (
+                patch(
+                    "uploads.services.document_ingestion._extract_pdf_text",
+                    return_value="some text",
+                ),
+                patch(
+                    "uploads.services.document_ingestion._split_text",
+                    return_value=["mitosis", "meiosis"],
+                ),
+                patch(
+                    "uploads.services.document_ingestion._build_embedding_model",
+                    return_value=embedding_model,
+                ),
+                patch(
+                    "uploads.services.document_ingestion._build_supabase_client"
+                ) as mock_client,
+                patch("uploads.services.document_ingestion.record_document"),
+            ):
+                count = ingest_document(deck, BytesIO(b"data"))
+            store = get_vector_store()
+            results = async_to_sync(store.asearch)(7, [0.1, 0.9], k=1)
+
+        self.assertEqual(count, 2)
+        self.assertIsInstance(store, LocalVectorStore)
+        self.assertEqual(results[0]["content"], "meiosis")
+        mock_client.assert_not_called()
+
+    def test_unknown_backend(self):
+        with override_settings(AGENT_VECTOR_STORE="faiss"):
+            with self.assertRaises(ValueError):
+                get_vector_store()
+
+
+class LexicalIndexTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="lex", password="pass1234")
+        self.deck = Deck.objects.create(user=user, name="ML")
+        self.records = [
+            {"id": "1", "content": "Backpropagation computes gradients layer by layer."},
+            {"id": "2", "content": "ReLU is an activation function."},
+            {"id": "3", "content": "Gradient descent updates the weights."},
+        ]
+
+    def test_exact_term_ranks_first(self):
+        index = BM25Index()
+        index.add(self.records)
+
+        results = index.search("What is ReLU?", k=2)
+
+        self.assertEqual(results[0]["id"], "2")
+        self.assertEqual(len(results), 1)
+
+    def test_abbreviation_matches_by_prefix(self):
+        index = BM25Index()
+        index.add(self.records)
+
+        self.assertEqual(index.search("backprop")[0]["id"], "1")
+
+    def test_round_trip(self):
+        index = BM25Index()
+        index.add(self.records)
+
+        restored = BM25Index.from_dict(json.loads(json.dumps(index.to_dict())))
+
+        self.assertEqual(restored.search("gradients"), index.search("gradients"))
+
+    def test_ingest_batches_extend_the_deck_index(self):
+        index_deck_chunks(self.deck.id, self.records[:2])
+        self.assertEqual(index_deck_chunks(self.deck.id, self.records[2:]), 3)
+
+        self.assertEqual(search_deck_index(self.deck.id, "weights")[0]["id"], "3")
+        self.assertEqual(DeckLexicalIndex.objects.get(deck=self.deck).chunk_count, 3)
+        self.assertEqual(search_deck_index(self.deck.id + 1, "weights"), [])
+
+    def test_fusion_rewards_agreement(self):
+        vector = [{"id": "a", "content": "A"}, {"id": "b", "content": "B"}]
+        lexical = [{"id": "b", "content": "B"}, {"id": "c", "content": "C"}]
+
+        fused = fuse_ranked(vector, lexical, k=3)
+
+        self.assertEqual([row["id"] for row in fused], ["b", "a", "c"])
+
+
+class DeckDocumentRegistryTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="reg", password="pass1234")
+        self.deck = Deck.objects.create(user=self.user, name="Physics")
+        self.client.force_authenticate(user=self.user)
+
+    def test_ingest_records_the_upload(self):
+        embedding_model = MagicMock()
+        embedding_model.embed_documents.return_value = [[1.0, 0.0], [0.0, 1.0]]
+        content = b"%PDF-1.4 physics"
+
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            AGENT_VECTOR_STORE="local", AGENT_VECTOR_STORE_PATH=root, AGENT_HYBRID_SEARCH=False
+        ):
+            with (
+                patch(
+                    "uploads.services.document_ingestion._extract_pdf_text",
+                    return_value="some text",
+                ),
+                patch(
+                    "uploads.services.document_ingestion._split_text",
+                    return_value=["force", "mass"],
+                ),
+                patch(
+                    "uploads.services.document_ingestion._build_embedding_model",
+                    return_value=embedding_model,
+                ),
+            ):
+                self.assertFalse(deck_has_documents(self.deck.id))
+                ingest_document(self.deck, SimpleUploadedFile("physics.pdf", content))
+
+        document = DeckDocument.objects.get(deck=self.deck)
+        self.assertEqual(document.filename, "physics.pdf")
+        self.assertEqual(document.content_hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual(document.chunk_count, 2)
+        self.assertEqual(document.bytes, len(content))
+        self.assertTrue(deck_has_documents(self.deck.id))
+
+    def test_list_documents_newest_first(self):
+        record_document(self.deck.id, "first.pdf", "a" * 64, 3, 100)
+        record_document(self.deck.id, "second.pdf", "b" * 64, 5, 200)
+        other_deck = Deck.objects.create(user=self.user, name="Chemistry")
+        record_document(other_deck.id, "other.pdf", "c" * 64, 1, 10)
+
+        response = self.client.get(reverse("deck-documents", args=[self.deck.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([doc["filename"] for doc in response.data], ["second.pdf", "first.pdf"])
+        self.assertEqual(response.data[0]["chunk_count"], 5)
+        self.assertEqual(response.data[0]["bytes"], 200)
+
+    def test_list_documents_rejects_other_users_deck(self):
+        other = get_user_model().objects.create_user(username="other", password="pass1234")
+        other_deck = Deck.objects.create(user=other, name="Private")
+
+        response = self.client.get(reverse("deck-documents", args=[other_deck.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sync_backfills_decks_from_the_vector_store(self):
+        empty_deck = Deck.objects.create(user=self.user, name="Empty")
+
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            AGENT_VECTOR_STORE="local", AGENT_VECTOR_STORE_PATH=root
+        ):
+            get_vector_store().add(
+                self.deck.id,
+                [{"id": "1", "content": "force", "metadata": {}, "embedding": [1.0, 0.0]}],
+            )
+            call_command("sync_deck_documents", stdout=StringIO())
+            call_command("sync_deck_documents", stdout=StringIO())
+
+        self.assertEqual(DeckDocument.objects.get(deck=self.deck).chunk_count, 1)
+        self.assertTrue(deck_has_documents(self.deck.id))
+        self.assertFalse(deck_has_documents(empty_deck.id))
+
+    def test_decks_from_before_the_registry_are_still_searched(self):
+        Deck.objects.filter(id=self.deck.id).update(
+            created_at=timezone.now() - timedelta(days=365 * 10)
+        )
+        emptied_deck = Deck.objects.create(user=self.user, name="Emptied")
+        record_document(emptied_deck.id, "blank.pdf", "d" * 64, 0, 10)
+
+        self.assertTrue(deck_has_documents(self.deck.id))
+        self.assertFalse(deck_has_documents(emptied_deck.id))